@@ -0,0 +1,973 @@
+# ============================================================================
+# SISTEMA DE GESTIÓN DE ALMACÉN - Modelo y lógica de negocio
+# ============================================================================
+# Producto y Almacen sin dependencias de la interfaz gráfica: los importan la GUI
+# (tareaFinal.py), la consola (consola.py), el servicio y el resto de utilidades
+# sin necesidad de tkinter ni de una pantalla.
+import fnmatch, heapq, math, threading
+from collections import Counter
+from itertools import repeat
+from contextlib import contextmanager
+from pathlib import Path
+
+from almacenamiento import MODOS, PUNTO_REORDEN, EscritorSegundoPlano, crear_almacenamiento, fila_completa
+from indices import CAMPOS_INDICE, IndicesOrdenados
+
+# Ruta del archivo JSON que persiste los datos del almacén
+ARCHIVO_DATOS = Path(__file__).parent / "almacen_datos.json"
+
+# Nº de candados por franja: productos con id en franjas distintas se modifican en paralelo
+FRANJAS_CANDADOS = 64
+
+# Similitud mínima de buscar_similares: fracción de los trigramas del texto buscado que
+# tiene que contener el nombre
+UMBRAL_SIMILITUD = 0.3
+
+def _trigramas(texto):
+    """Conjunto de subcadenas de 3 caracteres de un texto (ya normalizado con casefold)."""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _mantener_mejores(mejores, k, entrada):
+    """Añade entrada al montículo de mínimos mejores si está entre las k mayores."""
+    if len(mejores) < k:
+        heapq.heappush(mejores, entrada)
+    elif entrada > mejores[0]:
+        heapq.heapreplace(mejores, entrada)
+
+
+def orden_similar(prod, similitud):
+    """Clave de orden de buscar_similares: más similitud, después el nombre con menos
+    trigramas que sobran (el más corto) y después el menor id."""
+    return (similitud, -len(_trigramas(prod.nombre.casefold())), -prod.id)
+
+# ============================================================================
+# CLASE MODELO - Representa un producto en el almacén
+# ============================================================================
+class Producto:
+    """Modelo que encapsula los datos de un producto (ID, nombre, precio, stock).
+    Usa __slots__ en lugar de un __dict__ por instancia para ocupar menos memoria con
+    catálogos grandes (ver medicion_memoria.py)."""
+    
+    __slots__ = ("id", "nombre", "precio", "precio_original", "cantidad", "punto_reorden")
+    
+    def __init__(self, id, nombre, precio, cantidad, punto_reorden=PUNTO_REORDEN):
+        self.id = id
+        self.nombre = nombre
+        self.precio = precio
+        self.precio_original = precio  # Se mantiene para restaurar después de descuentos
+        self.cantidad = cantidad
+        self.punto_reorden = punto_reorden  # Con este stock o menos hay que reponer
+    def __str__(self):
+        return f"ID: {self.id} | {self.nombre} | ${self.precio} | Stock: {self.cantidad}"
+    
+    def a_reponer(self):
+        """Indica si el stock ha bajado hasta el punto de reorden."""
+        return self.cantidad <= self.punto_reorden
+    
+    def to_dict(self):
+        """Convierte el producto a diccionario para guardar en JSON."""
+        return {"id": self.id, "nombre": self.nombre, "precio": self.precio, "cantidad": self.cantidad,
+                "precio_original": self.precio_original, "punto_reorden": self.punto_reorden}
+    
+    def to_fila(self):
+        """Representación compacta [id, nombre, precio, precio_original, cantidad, punto_reorden] usada en el diario."""
+        return [self.id, self.nombre, self.precio, self.precio_original, self.cantidad, self.punto_reorden]
+    
+    @staticmethod
+    def from_dict(data):
+        """Factory method que crea un producto desde datos cargados del JSON."""
+        prod = Producto(data["id"], data["nombre"], data["precio"], data["cantidad"],
+                        data.get("punto_reorden", PUNTO_REORDEN))
+        prod.precio_original = data.get("precio_original", data["precio"])
+        return prod
+    
+    @staticmethod
+    def from_fila(fila):
+        """Crea un producto desde una fila compacta del diario (las de 5 columnas no traen punto de reorden)."""
+        prod = Producto(fila[0], fila[1], fila[2], fila[4], fila[5] if len(fila) > 5 else PUNTO_REORDEN)
+        prod.precio_original = fila[3]
+        return prod
+
+# ============================================================================
+# CLASE DE LÓGICA DE NEGOCIOS - Gestión del almacén
+# ============================================================================
+class Almacen:
+    """Controla la lógica de operaciones del almacén: CRUD, búsquedas, descuentos y persistencia.
+    
+    Modos de persistencia (ver almacenamiento.py):
+      - "completo": cada cambio reescribe el JSON entero (comportamiento original).
+      - "diario": cada cambio añade un registro compacto al diario y, cada COMPACTAR_CADA
+        registros, se vuelca una instantánea completa y se vacía el diario.
+      - "sqlite": base SQLite que escribe solo la fila modificada; migra el JSON existente.
+      - "binario": instantánea binaria abierta con mmap más el diario. Los productos se crean
+        perezosamente al consultarlos; las operaciones sobre el catálogo entero (listar,
+        buscar por nombre, crear, eliminar...) los materializan todos la primera vez.
+    También se puede pasar directamente un backend con el parámetro almacenamiento.
+    Con segundo_plano=True las escrituras del backend se hacen en otro hilo y se agrupan.
+    Si se pasa un libro_ventas (ventas.LibroVentas), cada venta se anota en él con su hora.
+    Con instrumentacion (instrumentacion.Instrumentacion) se miden los métodos públicos.
+    Con compartido=True varios procesos pueden usar el mismo archivo: cada operación toma
+    el candado del archivo, incorpora antes lo que hayan escrito los demás (solo los
+    registros nuevos del diario, o los productos que difieren si alguien ha compactado) y
+    escribe antes de soltarlo. Con segundo_plano además, el hilo escritor se queda el
+    candado hasta tener escrito en disco lo de la ráfaga (ver EscritorSegundoPlano).
+    Cada producto tiene un punto de reorden: las operaciones mantienen un montículo con los
+    que han bajado hasta él (productos_a_reponer) y, si se pasa al_cruzar_umbral, la llaman
+    con el producto cada vez que uno lo alcanza (desde el hilo de la operación, con los
+    candados de su producto tomados: debe ser rápida y no usar el almacén).
+    
+    Concurrencia (orden de adquisición para evitar interbloqueos):
+      compartido -> catálogo -> franjas (en orden ascendente) -> perezoso -> totales -> disco.
+    Las ventas, cambios de stock y descuentos solo bloquean la franja de su producto;
+    crear, eliminar y compactar bloquean el catálogo completo. En modo compartido las
+    operaciones que modifican se serializan además dentro del proceso."""
+    
+    MODOS = MODOS
+    
+    def __init__(self, archivo=None, modo="completo", depurar=False, almacenamiento=None, segundo_plano=False,
+                 libro_ventas=None, instrumentacion=None, compartido=False, al_cruzar_umbral=None):
+        self.almacenamiento = almacenamiento or crear_almacenamiento(modo, archivo or ARCHIVO_DATOS)
+        if segundo_plano:  # Las escrituras a disco pasan a otro hilo (ver EscritorSegundoPlano)
+            self.almacenamiento = EscritorSegundoPlano(self.almacenamiento)
+        self.modo = self.almacenamiento.modo
+        self.libro_ventas = libro_ventas
+        self._tabla = None  # Instantánea binaria aún no materializada del todo (modo perezoso)
+        self._por_id = {}  # Índice id -> Producto, en orden de id (es también la lista de productos)
+        self._por_nombre = {}  # Índice nombre (casefold) -> id, para unicidad de nombres
+        self._clave_nombre = {}  # id -> nombre ya normalizado, para no recalcularlo en cada búsqueda
+        self._indice_trigramas = {}  # Índice invertido trigrama -> conjunto de ids
+        self._num_trigramas = {}  # id -> nº de trigramas del nombre, calculado al buscar similares
+        self._indices = None  # Índices ordenados por precio, stock y valor; se crean al consultar por rango
+        self._previos = {}  # id -> (precio, cantidad, stock - punto) entre _antes_ y _despues_de_modificar
+        self._valor_total = 0  # Totales acumulados, actualizados en O(1) en cada cambio
+        self._a_reponer = {}  # id -> stock - punto de reorden de los productos a reponer (None: sin calcular)
+        self._reorden = []  # Montículo (stock - punto de reorden, id); las entradas viejas se descartan
+        self.al_cruzar_umbral = None  # No se avisa de lo que ya estaba bajo mínimos al cargar
+        self._unidades = 0
+        self.depurar = depurar  # Si es True, contrasta los totales con un recálculo completo tras cada cambio
+        self.proximo_id = 1
+        self.dinero_vendido = 0  # Acumula dinero total de todas las ventas
+        self._agrupando = 0  # Profundidad de persistencia_agrupada(): >0 difiere las escrituras
+        self._pendientes = []  # Registros de operación a la espera de persistirse
+        self._cambios = None  # Ids modificados desde la última consulta (None: sin seguimiento)
+        self._todo_cambiado = True  # Tras cargar, quien siga los cambios debe releerlo todo
+        self._candado_catalogo = threading.RLock()  # Lista de productos e índices
+        self._franjas = [threading.RLock() for _ in range(FRANJAS_CANDADOS)]  # Campos de cada producto
+        self._candado_perezoso = threading.Lock()  # Materialización de productos desde la instantánea
+        self._candado_totales = threading.Lock()  # Totales acumulados y dinero vendido
+        self._candado_disco = threading.RLock()  # Serializa toda escritura a disco
+        self.compartido = compartido
+        self._candado_compartido = threading.RLock()  # Operaciones con el archivo bloqueado
+        self._archivo_bloqueado = False  # Este proceso tiene el candado del archivo
+        if instrumentacion:
+            instrumentacion.envolver(self)  # Antes de cargar, para medir también la carga
+        self.cargar_datos()  # Cargar datos existentes al inicializar
+        self.al_cruzar_umbral = al_cruzar_umbral
+    
+    def cargar_datos(self):
+        """Carga todos los productos existentes, dinero acumulado y próximo ID desde el backend.
+        Después reproduce los registros del diario posteriores a la instantánea."""
+        with self._seccion_compartida(sincronizar=False):
+            filas, dinero_vendido, registros = self.almacenamiento.cargar()
+        if self._tabla is not None:
+            self._tabla.cerrar()
+            self._tabla = None
+        if getattr(filas, "perezosa", False):
+            self._cargar_perezosa(filas)
+        else:
+            self._reconstruir_indices(Producto.from_fila(f) for f in filas)
+            # Obtener el máximo ID y asignar el siguiente
+            self.proximo_id = max(self._por_id, default=0) + 1
+        # Cargar el dinero acumulado de ventas
+        self.dinero_vendido = dinero_vendido
+        for reg in registros:
+            self._aplicar_registro(reg)
+        self._todo_cambiado = True
+        if self.almacenamiento.necesita_compactar():
+            self.compactar()
+        if self.depurar:
+            self._verificar_totales()
+    
+    def _cargar_perezosa(self, tabla):
+        """Adopta una instantánea binaria sin crear productos: totales y próximo ID salen de la
+        cabecera y cada producto se materializa la primera vez que se consulta."""
+        self._reconstruir_indices()
+        self._tabla = tabla
+        self._valor_total, self._unidades = tabla.valor_total, tabla.unidades
+        self._a_reponer = None  # Se calcula de las columnas la primera vez que se consulte
+        self.proximo_id = tabla.ids[-1] + 1 if len(tabla) else 1
+    
+    def _materializar(self, id):
+        """Crea (una sola vez) el producto de un id a partir de la instantánea perezosa."""
+        with self._candado_perezoso:
+            prod = self._por_id.get(id)
+            if prod is None and self._tabla is not None:
+                i = self._tabla.posicion(id)
+                if i is not None:
+                    prod = self._por_id[id] = Producto.from_fila(self._tabla.fila(i))
+            return prod
+    
+    def _materializar_todo(self):
+        """Sale del modo perezoso: crea los productos que falten, en orden de id, reutilizando
+        los ya materializados, construye los índices y libera la instantánea."""
+        if self._tabla is None:
+            return
+        with self._candado_catalogo, self._candado_perezoso:
+            tabla = self._tabla
+            if tabla is None:
+                return
+            por_id = {}
+            for i in range(len(tabla)):
+                prod = self._por_id.get(tabla.ids[i]) or Producto.from_fila(tabla.fila(i))
+                por_id[prod.id] = prod
+            self._por_id = por_id
+            for prod in por_id.values():
+                self._indexar(prod)
+            with self._candado_totales:
+                self._vigilancia()  # Aún sale de la instantánea, que se va a liberar
+            self._tabla = None
+            tabla.cerrar()
+    
+    @property
+    def productos(self):
+        """Los productos en orden de id, como vista de los valores del índice por id (se
+        itera y se mide como una lista, pero quitar uno no la recorre); en modo perezoso,
+        pedirla materializa el catálogo entero."""
+        self._materializar_todo()
+        return self._por_id.values()
+    
+    def _aplicar_registro(self, reg):
+        """Reproduce en memoria un registro del diario (filas nuevas/modificadas, borrados y dinero)."""
+        for fila in reg.get("filas", ()):
+            prod = self.buscar_por_id(fila[0])
+            if prod:
+                with self._modificando(prod):
+                    prod.precio, prod.precio_original, prod.cantidad, prod.punto_reorden = fila_completa(fila)[2:]
+            else:
+                self._agregar(Producto.from_fila(fila))
+                self.proximo_id = max(self.proximo_id, fila[0] + 1)
+        for id in reg.get("borrar", ()):
+            prod = self.buscar_por_id(id)
+            if prod:
+                self._quitar(prod)
+        self.dinero_vendido += reg.get("monto", 0)
+    
+    def _reconstruir_indices(self, productos=()):
+        """Regenera los índices por id y por nombre a partir de los productos dados."""
+        self._por_id, self._por_nombre, self._clave_nombre, self._indice_trigramas = {}, {}, {}, {}
+        self._num_trigramas = {}
+        self._indices, self._previos = None, {}
+        self._valor_total = self._unidades = 0
+        self._a_reponer, self._reorden = {}, []
+        for p in productos:
+            self._indexar(p)
+            self._despues_de_modificar(p)
+    
+    def _indexar(self, prod):
+        """Registra un producto en los índices por id, nombre y trigramas."""
+        clave = prod.nombre.casefold()
+        self._por_id[prod.id] = prod
+        self._por_nombre[clave] = prod.id
+        self._clave_nombre[prod.id] = clave
+        for t in _trigramas(clave):
+            self._indice_trigramas.setdefault(t, set()).add(prod.id)
+    
+    def _agregar(self, prod):
+        """Añade un producto a los índices (los ids nuevos son siempre mayores, así que el
+        índice por id sigue en orden)."""
+        self._materializar_todo()
+        self._indexar(prod)
+        self._despues_de_modificar(prod)
+    
+    def _quitar(self, prod):
+        """Retira un producto de los índices."""
+        self._antes_de_modificar(prod)
+        self._materializar_todo()
+        del self._por_id[prod.id]
+        clave = self._clave_nombre.pop(prod.id)
+        self._por_nombre.pop(clave, None)
+        self._num_trigramas.pop(prod.id, None)
+        for t in _trigramas(clave):
+            ids = self._indice_trigramas[t]
+            ids.discard(prod.id)
+            if not ids:
+                del self._indice_trigramas[t]
+        with self._candado_totales:
+            self._vigilancia().pop(prod.id, None)
+            precio, cantidad, _ = self._previos.pop(prod.id)
+            if self._indices is not None:
+                self._indices.quitar(prod.id, precio, cantidad)
+    
+    def _antes_de_modificar(self, prod):
+        """Descuenta la aportación de un producto a los totales (y a los índices ordenados)
+        antes de cambiarlo o retirarlo."""
+        with self._candado_totales:
+            self._valor_total -= prod.precio * prod.cantidad
+            self._unidades -= prod.cantidad
+            # Estado anterior, para recolocarlo en los índices y saber si cruza el punto de reorden
+            self._previos[prod.id] = (prod.precio, prod.cantidad, prod.cantidad - prod.punto_reorden)
+    
+    @contextmanager
+    def _modificando(self, prod):
+        """Cambia un producto entre _antes_de_modificar y _despues_de_modificar. El después se
+        ejecuta aunque el cambio lance (p. ej. una cantidad que no es un número): el producto
+        queda como estaba y los totales recuperan su aportación. Si lo que falla es recolocarlo
+        en los índices ordenados, se deshace el cambio antes de propagar el error, para que
+        memoria y disco no discrepen."""
+        estado = (prod.precio, prod.precio_original, prod.cantidad, prod.punto_reorden)
+        self._antes_de_modificar(prod)
+        try:
+            yield prod
+        finally:
+            try:
+                self._despues_de_modificar(prod)
+            except Exception:
+                prod.precio, prod.precio_original, prod.cantidad, prod.punto_reorden = estado
+                self._despues_de_modificar(prod)
+                raise
+    
+    def _despues_de_modificar(self, prod):
+        """Suma la aportación de un producto a los totales (y a los índices ordenados) tras
+        añadirlo o cambiarlo, y lo vigila por si ha alcanzado su punto de reorden."""
+        with self._candado_totales:
+            previo = self._previos.get(prod.id)
+            if self._indices is not None:  # Lo primero, porque es lo único que puede fallar
+                if previo is None:
+                    self._indices.anadir(prod.id, prod.precio, prod.cantidad)
+                else:
+                    self._indices.mover(prod.id, previo[:2], (prod.precio, prod.cantidad))
+            self._previos.pop(prod.id, None)
+            self._valor_total += prod.precio * prod.cantidad
+            self._unidades += prod.cantidad
+            cruzado = self._vigilar(prod, previo)
+        if cruzado and self.al_cruzar_umbral:
+            self.al_cruzar_umbral(prod)
+    
+    def _vigilancia(self):
+        """Productos a reponer (id -> stock - punto de reorden). En modo perezoso se calculan
+        la primera vez que se consultan, de las columnas de la instantánea (sin crear los
+        productos) corregidas con los ya materializados, que pueden haber cambiado; los que
+        están a medio cambiar cuentan con su estado anterior, que _vigilar actualizará. Se
+        llama con los candados perezoso y de totales tomados (o sin instantánea, solo el de
+        totales)."""
+        if self._a_reponer is None:
+            tabla = self._tabla
+            puntos = tabla.puntos if tabla.puntos is not None else repeat(PUNTO_REORDEN)
+            a_reponer = {tabla.ids[i]: c - p for i, (c, p) in enumerate(zip(tabla.cantidades, puntos)) if c <= p}
+            for id, prod in self._por_id.items():
+                previo = self._previos.get(id)
+                margen = previo[2] if previo else prod.cantidad - prod.punto_reorden
+                if margen <= 0:
+                    a_reponer[id] = margen
+                else:
+                    a_reponer.pop(id, None)
+            self._a_reponer = a_reponer
+            self._reorden = [(margen, id) for id, margen in a_reponer.items()]
+            heapq.heapify(self._reorden)
+        return self._a_reponer
+    
+    def _vigilar(self, prod, previo=None):
+        """Actualiza la lista de reposición con el estado de un producto (candado de totales
+        tomado). Las entradas del montículo no se borran: dejan de valer cuando su margen ya
+        no coincide con el de _a_reponer, y se purgan cuando superan al doble de las vigentes.
+        Devuelve True si el producto acaba de alcanzar su punto de reorden. En modo perezoso,
+        mientras nadie consulte la lista, basta con compararlo con su estado anterior."""
+        if self._a_reponer is None:
+            return prod.cantidad <= prod.punto_reorden and not (previo and previo[2] <= 0)
+        a_reponer = self._vigilancia()
+        if prod.cantidad > prod.punto_reorden:
+            a_reponer.pop(prod.id, None)
+            return False
+        margen = prod.cantidad - prod.punto_reorden
+        anterior = a_reponer.get(prod.id)
+        if anterior != margen:
+            a_reponer[prod.id] = margen
+            heapq.heappush(self._reorden, (margen, prod.id))
+            if len(self._reorden) > 2 * len(a_reponer) + 64:
+                self._reorden = [(m, id) for id, m in a_reponer.items()]
+                heapq.heapify(self._reorden)
+        return anterior is None
+    
+    def _sumar_dinero(self, monto):
+        with self._candado_totales:
+            self.dinero_vendido += monto
+    
+    def _candados(self, ids=None):
+        """Candados a tomar (en orden) para operar sobre los ids dados; sin ids, el catálogo entero."""
+        if ids is None:
+            return [self._candado_catalogo] + self._franjas
+        return [self._franjas[i] for i in sorted({hash(id) % FRANJAS_CANDADOS for id in ids})]
+    
+    @contextmanager
+    def _bloquear(self, ids=None):
+        """Sección crítica de una operación; al salir compacta el diario si hace falta."""
+        candados = self._candados(ids)
+        with self._seccion_compartida():
+            for c in candados:
+                c.acquire()
+            try:
+                yield
+            finally:
+                for c in reversed(candados):
+                    c.release()
+            self._tras_operacion()
+    
+    @contextmanager
+    def _seccion_compartida(self, sincronizar=True):
+        """Modo compartido: mantiene tomado el candado del archivo (una vez por proceso, aunque
+        se anide) y, al tomarlo, incorpora lo escrito por otros procesos. Sin él no hace nada."""
+        if not self.compartido:
+            yield
+            return
+        with self._candado_compartido:
+            if self._archivo_bloqueado:  # Sección anidada: el candado ya es nuestro
+                yield
+                return
+            self.almacenamiento.bloquear()
+            self._archivo_bloqueado = True
+            try:
+                if sincronizar:
+                    self._sincronizar()
+                yield
+            finally:
+                self._archivo_bloqueado = False
+                self.almacenamiento.desbloquear()
+    
+    def _sincronizar(self):
+        """Aplica lo que otros procesos han escrito desde la última lectura o escritura de este.
+        Se llama con el candado del archivo tomado. Devuelve True si había algo."""
+        instantanea, registros = self.almacenamiento.cambios_ajenos()
+        if instantanea is None and not registros:
+            return False
+        candados = self._candados()
+        for c in candados:
+            c.acquire()
+        try:
+            if instantanea is not None:
+                registros = [self._diferencias(*instantanea)] + registros
+            for reg in registros:
+                self._aplicar_registro(reg)
+                if self._cambios is not None:
+                    self._cambios.update(fila[0] for fila in reg.get("filas", ()))
+                    self._cambios.update(reg.get("borrar", ()))
+        finally:
+            for c in reversed(candados):
+                c.release()
+        return True
+    
+    def _diferencias(self, filas, dinero_vendido):
+        """Registro que lleva la memoria al estado de una instantánea escrita por otro proceso:
+        solo las filas que difieren, los ids que ya no están y la diferencia de dinero."""
+        self._materializar_todo()
+        vistas, cambiadas = set(), []
+        for fila in filas:
+            vistas.add(fila[0])
+            prod = self._por_id.get(fila[0])
+            if prod is None or [prod.precio, prod.precio_original, prod.cantidad, prod.punto_reorden] != \
+                    fila_completa(fila)[2:]:
+                cambiadas.append(fila)
+        borrar = [id for id in self._por_id if id not in vistas]
+        return {"filas": cambiadas, "borrar": borrar, "monto": dinero_vendido - self.dinero_vendido}
+    
+    def sincronizar(self):
+        """Modo compartido: incorpora ya lo escrito por otros procesos (las operaciones que
+        modifican lo hacen solas antes de empezar). Devuelve True si había cambios. Si no los
+        hay solo mira el tamaño y la fecha de los archivos, sin tomar el candado, así que se
+        puede llamar a menudo (la GUI lo hace cada 200 ms)."""
+        if not self.compartido or not self.almacenamiento.hay_cambios_ajenos():
+            return False
+        with self._seccion_compartida(sincronizar=False):
+            return self._sincronizar()
+    
+    def _tras_operacion(self):
+        """Trabajo diferido hasta soltar los candados de la operación: compactación y depuración."""
+        if self.almacenamiento.necesita_compactar():
+            self.compactar()
+        if self.depurar:
+            candados = self._candados()
+            for c in candados:
+                c.acquire()
+            try:
+                self._verificar_totales()
+            finally:
+                for c in reversed(candados):
+                    c.release()
+    
+    def _verificar_totales(self):
+        """Modo depuración: compara los totales acumulados con un recálculo completo."""
+        valor = sum(p.precio * p.cantidad for p in self.productos)
+        unidades = sum(p.cantidad for p in self.productos)
+        a_reponer = {p.id: p.cantidad - p.punto_reorden for p in self.productos if p.a_reponer()}
+        if self._indices is not None:
+            nuevos = IndicesOrdenados(self._valores_actuales())
+            if any(list(self._indices.lista(c)) != list(nuevos.lista(c)) for c in CAMPOS_INDICE):
+                raise AssertionError("Índices ordenados desincronizados")
+        # Con precios no finitos el valor acumulado no se puede comparar (inf - inf es NaN)
+        if math.isfinite(valor) and not math.isclose(self._valor_total, valor, rel_tol=1e-9, abs_tol=1e-6) \
+                or self._unidades != unidades \
+                or list(self._por_id) != sorted(self._por_id) or self._a_reponer != a_reponer:
+            raise AssertionError(f"Totales desincronizados: valor {self._valor_total} != {valor}, "
+                                 f"unidades {self._unidades} != {unidades}, "
+                                 f"productos en orden de id: {list(self._por_id) == sorted(self._por_id)}, "
+                                 f"a reponer {len(self._a_reponer)} != {len(a_reponer)}")
+    
+    def existe_nombre(self, nombre):
+        """Indica si ya hay un producto con ese nombre (sin distinguir mayúsculas)."""
+        self._materializar_todo()
+        return nombre.casefold() in self._por_nombre
+    
+    def guardar_datos(self):
+        """Persiste el estado completo: todos los productos, dinero acumulado y próximo ID."""
+        with self._seccion_compartida(), self._candado_disco:
+            return self.almacenamiento.guardar(list(self.productos), self.dinero_vendido, self.proximo_id)
+    
+    def _persistir(self, op, filas=(), borrar=(), monto=0):
+        """Persiste una operación como registro compacto (o reescritura completa si el backend
+        no es incremental). Se llama con los candados de la operación tomados, así el orden
+        en disco respeta el de memoria."""
+        with self._candado_disco:
+            reg = {"op": op}
+            if filas:
+                reg["filas"] = [p.to_fila() for p in filas]
+            if borrar:
+                reg["borrar"] = list(borrar)
+            if monto:
+                reg["monto"] = monto
+            if self._cambios is not None:
+                self._cambios.update(p.id for p in filas)
+                self._cambios.update(borrar)
+            self._pendientes.append(reg)
+            if not self._agrupando:
+                self._volcar_pendientes()
+    
+    def _volcar_pendientes(self):
+        """Persiste de una vez todo lo pendiente: los registros o una única instantánea completa."""
+        with self._candado_disco:
+            pendientes, self._pendientes = self._pendientes, []
+            if not pendientes:
+                return
+            if self.almacenamiento.incremental:
+                self.almacenamiento.registrar(pendientes)
+            else:
+                self.guardar_datos()
+    
+    @contextmanager
+    def persistencia_agrupada(self):
+        """Agrupa la persistencia de todas las operaciones del bloque en una sola escritura
+        (group commit): útil para pedidos por lotes o para servir muchas peticiones seguidas.
+        En modo compartido el archivo queda bloqueado para los demás procesos todo el bloque."""
+        with self._seccion_compartida():
+            with self._candado_disco:
+                self._agrupando += 1
+            try:
+                yield
+            finally:
+                with self._candado_disco:
+                    self._agrupando -= 1
+                    if not self._agrupando:
+                        self._volcar_pendientes()
+    
+    def registrar_cambios(self):
+        """Activa el seguimiento de los ids que cambian, para refrescos parciales (p. ej. la GUI)."""
+        with self._candado_disco:
+            if self._cambios is None:
+                self._cambios = set()
+    
+    def cambios_pendientes(self):
+        """Ids creados, modificados o eliminados desde la última llamada, o None si hay que
+        releerlo todo (primera consulta o datos recargados). Requiere registrar_cambios()."""
+        with self._candado_disco:
+            cambios, self._cambios = self._cambios, set()
+            if self._todo_cambiado:
+                self._todo_cambiado = False
+                return None
+            return cambios
+    
+    def compactar(self):
+        """Vuelca una instantánea completa; en modo diario también vacía el diario.
+        Bloquea todo el catálogo para que ningún cambio quede a medio camino entre ambos."""
+        with self._seccion_compartida():
+            candados = self._candados()
+            for c in candados:
+                c.acquire()
+            try:
+                with self._candado_disco:
+                    if self.guardar_datos():
+                        self._pendientes = []  # Ya incluidos en la instantánea
+            finally:
+                for c in reversed(candados):
+                    c.release()
+    
+    def cerrar(self, compactar=True):
+        """Persiste lo pendiente, compacta el diario y libera el backend; llamar al terminar.
+        Con compactar=False el diario se deja para la próxima compactación por tamaño (lo usa
+        la consola, que abre y cierra el almacén en cada orden)."""
+        with self._seccion_compartida():
+            self._volcar_pendientes()
+            if compactar and self.almacenamiento.necesita_compactar(al_cerrar=True):
+                self.compactar()
+        if self._tabla is not None:
+            self._tabla.cerrar()
+        if self.libro_ventas:
+            self.libro_ventas.cerrar()
+        self.almacenamiento.cerrar()
+    
+    def crear_producto(self, nombre, precio, cantidad):
+        """Valida y crea un nuevo producto con ID único. Persiste con el backend configurado."""
+        with self._bloquear():
+            if not nombre or precio <= 0 or cantidad < 0 or self.existe_nombre(nombre):
+                return (False, "✗ Datos inválidos o producto existente")
+            prod = Producto(self.proximo_id, nombre, precio, cantidad)
+            self._agregar(prod)
+            self.proximo_id += 1
+            self._persistir("crear", filas=[prod])
+            return (True, f"✓ Producto '{nombre}' creado con ID {prod.id}")
+
+    def crear_productos(self, datos):
+        """Alta masiva de (nombre, precio, cantidad): valida como crear_producto, asigna ids
+        consecutivos y persiste una sola vez. Devuelve (ids creados, [(posición, motivo)])."""
+        creados, rechazados = [], []
+        with self._bloquear():
+            for i, (nombre, precio, cantidad) in enumerate(datos):
+                if not nombre or precio <= 0 or cantidad < 0:
+                    rechazados.append((i, "✗ Datos inválidos"))
+                elif self.existe_nombre(nombre):  # También detecta repetidos dentro del lote
+                    rechazados.append((i, "✗ Producto existente"))
+                else:
+                    prod = Producto(self.proximo_id, nombre, precio, cantidad)
+                    self._agregar(prod)
+                    self.proximo_id += 1
+                    creados.append(prod)
+            if creados:
+                self._persistir("crear", filas=creados)
+        return ([p.id for p in creados], rechazados)
+
+    def buscar_por_id(self, id):
+        prod = self._por_id.get(id)
+        if prod is None and self._tabla is not None:
+            prod = self._materializar(id)
+        return prod
+    
+    def vender(self, id, cantidad):
+        """Reduce el stock de un producto e incrementa dinero acumulado por venta."""
+        with self._bloquear([id]):  # Comprobar y descontar stock de forma atómica
+            prod = self.buscar_por_id(id)
+            if prod and prod.cantidad >= cantidad and cantidad > 0:
+                monto_venta = cantidad * prod.precio
+                with self._modificando(prod):
+                    prod.cantidad -= cantidad
+                self._sumar_dinero(monto_venta)  # Acumular dinero de la venta
+                self._persistir("venta", filas=[prod], monto=monto_venta)
+                if self.libro_ventas:
+                    self.libro_ventas.registrar([(id, cantidad, prod.precio, monto_venta)])
+                return (True, f"✓ Venta: {cantidad}x {prod.nombre} = ${monto_venta:.2f}", monto_venta)
+        return (False, "✗ Stock insuficiente o cantidad inválida", 0)
+    
+    def vender_lote(self, lineas):
+        """Vende un pedido de varias líneas (id, cantidad) como una sola operación.
+        Valida todas las líneas antes de tocar nada: o se aplican todas o ninguna.
+        Actualiza el dinero vendido y persiste una única vez."""
+        pedido = {}  # id -> cantidad total pedida (las líneas repetidas se acumulan)
+        for id, cantidad in lineas:
+            if cantidad <= 0:
+                return (False, f"✗ Cantidad inválida para ID {id}", 0)
+            pedido[id] = pedido.get(id, 0) + cantidad
+        if not pedido:
+            return (False, "✗ Pedido vacío", 0)
+        with self._bloquear(pedido):
+            for id, cantidad in pedido.items():
+                prod = self.buscar_por_id(id)
+                if not prod:
+                    return (False, f"✗ Producto {id} no encontrado", 0)
+                if prod.cantidad < cantidad:
+                    return (False, f"✗ Stock insuficiente de {prod.nombre}: {prod.cantidad} < {cantidad}", 0)
+            monto_total, vendidos, lineas_libro = 0, [], []
+            for id, cantidad in pedido.items():
+                prod = self._por_id[id]
+                monto_total += cantidad * prod.precio
+                lineas_libro.append((id, cantidad, prod.precio, cantidad * prod.precio))
+                with self._modificando(prod):
+                    prod.cantidad -= cantidad
+                vendidos.append(prod)
+            self._sumar_dinero(monto_total)
+            self._persistir("lote", filas=vendidos, monto=monto_total)
+            if self.libro_ventas:
+                self.libro_ventas.registrar(lineas_libro)
+        return (True, f"✓ Pedido: {len(vendidos)} producto(s), {sum(pedido.values())} unidades = ${monto_total:.2f}", monto_total)
+    
+    def listar_productos(self):
+        return "El almacén está vacío" if not self.productos else "\n--- INVENTARIO ---\n" + "\n".join(str(p) for p in self.productos)
+    
+    def valor_total_almacen(self):
+        return self._valor_total
+    
+    def unidades_totales(self):
+        return self._unidades
+    
+    def cantidad_productos(self):
+        tabla = self._tabla
+        return len(tabla) if tabla is not None else len(self._por_id)
+    
+    def buscar_por_nombre(self, nombre, limite=None):
+        """Busca productos cuyo nombre contiene el texto (sin distinguir mayúsculas).
+        Con 3 o más caracteres solo se comprueban los candidatos del índice de trigramas.
+        Con limite se detiene al alcanzar ese número de resultados (los de menor id)."""
+        clave = nombre.casefold()
+        self._materializar_todo()
+        with self._candado_catalogo:  # Los índices no pueden cambiar mientras se recorren
+            if len(clave) < 3:
+                candidatos = self._por_id  # Consulta demasiado corta para el índice: orden de inserción
+            else:
+                listas = sorted((self._indice_trigramas.get(t, set()) for t in _trigramas(clave)), key=len)
+                if not listas[0]:
+                    return []
+                if limite and len(listas[0]) * 8 >= len(self._por_id):
+                    # Consulta amplia: en orden de id por el catálogo, sin ordenar los candidatos
+                    candidatos = (id for id in self._por_id if all(id in ids for ids in listas))
+                else:
+                    candidatos = sorted(listas[0].intersection(*listas[1:]))
+            encontrados = []
+            for id in candidatos:
+                if clave in self._clave_nombre[id]:
+                    encontrados.append(self._por_id[id])
+                    if limite and len(encontrados) >= limite:
+                        break
+            return encontrados
+    
+    def buscar_similares(self, texto, k=10, umbral=UMBRAL_SIMILITUD):
+        """Los k productos cuyo nombre más se parece al texto, aunque tenga erratas. La
+        similitud es la fracción de los trigramas del texto que aparecen en el nombre: no
+        depende de lo largo que sea el nombre, así "teclaod" encuentra "Teclado mecánico
+        inalámbrico". Devuelve [(producto, similitud)] de mayor a menor similitud (a igualdad,
+        el nombre más corto y luego el menor id; ver orden_similar), solo con similitud >=
+        umbral. Textos de menos de 3 caracteres buscan la subcadena.
+
+        Con c trigramas comunes la similitud es c / |consulta|, así que hacen falta al menos
+        `minimo` comunes: un candidato tiene que aparecer en alguna de las |consulta| -
+        minimo + 1 listas más cortas del índice invertido (filtro de prefijo). Las listas
+        largas solo se cruzan con esos candidatos y el recuento se hace en C (Counter y
+        sets). Los candidatos se recorren de más a menos comunes y se corta en cuanto no
+        alcanzan al peor de los k mejores, que se guardan en un montículo acotado. En modo
+        perezoso no se crea el índice: se recorren los nombres de la instantánea."""
+        clave = texto.casefold()
+        consulta = _trigramas(clave)
+        if not consulta:
+            return [(p, 1.0) for p in self.buscar_por_nombre(texto, k)]
+        q = len(consulta)
+        with self._candado_catalogo:
+            if self._tabla is not None:
+                mejores = self._similares_en_tabla(consulta, k, umbral)
+            else:
+                minimo = max(1, math.ceil(umbral * q - 1e-9))  # Comunes necesarios para el umbral
+                listas = sorted((self._indice_trigramas.get(t, set()) for t in consulta), key=len)
+                cortas, largas = listas[:q - minimo + 1], listas[q - minimo + 1:]
+                candidatos = set().union(*cortas)
+                comunes = Counter()
+                for lista in cortas:
+                    comunes.update(lista)
+                for lista in largas:
+                    comunes.update(candidatos.intersection(lista))
+                mejores = []  # Montículo de mínimos con los k mejores: (similitud, -nº de trigramas, -id)
+                cota = umbral
+                for id in sorted(comunes, key=comunes.__getitem__, reverse=True):  # Primero los que más comparten
+                    similitud = comunes[id] / q
+                    if similitud < cota:
+                        break  # Ni este candidato ni los siguientes (con menos comunes) pueden entrar
+                    n = self._num_trigramas.get(id)
+                    if n is None:
+                        n = self._num_trigramas[id] = len(_trigramas(self._clave_nombre[id]))
+                    _mantener_mejores(mejores, k, (similitud, -n, -id))
+                    if len(mejores) == k:
+                        cota = max(umbral, mejores[0][0])
+            return [(self.buscar_por_id(-menos_id), similitud) for similitud, _, menos_id in sorted(mejores, reverse=True)]
+    
+    def _similares_en_tabla(self, consulta, k, umbral):
+        """buscar_similares en modo perezoso (con el candado del catálogo, que impide salir de
+        él): cuenta los trigramas de la consulta que contiene cada nombre de la instantánea
+        (un trigrama está en el nombre si es una subcadena suya), sin crear los productos ni
+        el índice de trigramas, que a 500.000 productos costaría varios segundos."""
+        tabla, q, mejores = self._tabla, len(consulta), []
+        cota = umbral
+        for i, id in enumerate(tabla.ids):
+            clave = tabla.nombre(i).casefold()
+            similitud = sum(t in clave for t in consulta) / q
+            if similitud >= cota:
+                _mantener_mejores(mejores, k, (similitud, -len(_trigramas(clave)), -id))
+                if len(mejores) == k:
+                    cota = max(umbral, mejores[0][0])
+        return mejores
+    
+    def actualizar_stock(self, id, cantidad):
+        with self._bloquear([id]):
+            prod = self.buscar_por_id(id)
+            if prod:
+                with self._modificando(prod):
+                    prod.cantidad += cantidad
+                self._persistir("stock", filas=[prod])
+                return f"✓ Stock: {prod.nombre} -> {prod.cantidad} unidades"
+        return "✗ Producto no encontrado"
+    
+    def fijar_punto_reorden(self, id, punto):
+        """Cambia el stock con el que un producto pasa a la lista de reposición."""
+        if punto < 0:
+            return "✗ Punto de reorden inválido"
+        with self._bloquear([id]):
+            prod = self.buscar_por_id(id)
+            if prod:
+                with self._modificando(prod):
+                    prod.punto_reorden = punto
+                self._persistir("reorden", filas=[prod])
+                return f"✓ Punto de reorden: {prod.nombre} -> {punto} unidades"
+        return "✗ Producto no encontrado"
+    
+    def productos_a_reponer(self, limite=None):
+        """Productos con el stock en su punto de reorden o por debajo, del más urgente (más
+        unidades por debajo del punto) al que menos; a igualdad, por id. Se leen del montículo
+        que mantienen las operaciones, sin recorrer el catálogo: se visita en orden de
+        prioridad (cada nodo antes que sus hijos), así que con limite solo se tocan las
+        entradas más urgentes, O(limite · log limite) más las entradas viejas que aparezcan."""
+        with self._candado_perezoso, self._candado_totales:
+            a_reponer, monticulo = self._vigilancia(), self._reorden
+            ids, vistos = [], set()
+            frontera = [(monticulo[0], 0)] if monticulo else []
+            while frontera and not (limite and len(ids) >= limite):
+                (margen, id), i = heapq.heappop(frontera)
+                if a_reponer.get(id) == margen and id not in vistos:  # Entrada vigente y no repetida
+                    vistos.add(id)
+                    ids.append(id)
+                for hijo in (2*i + 1, 2*i + 2):
+                    if hijo < len(monticulo):
+                        heapq.heappush(frontera, (monticulo[hijo], hijo))
+        return [p for p in map(self.buscar_por_id, ids) if p]
+    
+    def aplicar_descuento(self, id, porcentaje):
+        """Aplica un descuento porcentual al precio, manteniendo el precio original para restauración."""
+        with self._bloquear([id]):
+            prod = self.buscar_por_id(id)
+            if prod and 0 <= porcentaje <= 100:
+                with self._modificando(prod):
+                    prod.precio = prod.precio_original * (1 - porcentaje/100)
+                self._persistir("precio", filas=[prod])
+                return f"✓ Descuento aplicado: {prod.nombre} = ${prod.precio:.2f}"
+        return "✗ Producto no encontrado" if not prod else "✗ Porcentaje inválido"
+    
+    def resetear_descuento(self, id):
+        """Restaura el precio original del producto removiendo cualquier descuento."""
+        with self._bloquear([id]):
+            prod = self.buscar_por_id(id)
+            if prod:
+                if prod.precio != prod.precio_original:
+                    with self._modificando(prod):
+                        prod.precio = prod.precio_original
+                    self._persistir("precio", filas=[prod])
+                    return f"✓ Descuento removido: {prod.nombre} = ${prod.precio:.2f}"
+                return f"⚠️ {prod.nombre} sin descuento"
+        return "✗ Producto no encontrado"
+    
+    def _valores_actuales(self):
+        """(id, precio, cantidad) de cada producto. En modo perezoso sale de las columnas de la
+        instantánea, salvo los productos ya materializados (que pueden haber cambiado)."""
+        tabla = self._tabla
+        if tabla is None:
+            return [(p.id, p.precio, p.cantidad) for p in self._por_id.values()]
+        return [(id, p.precio, p.cantidad) if (p := self._por_id.get(id)) else (id, precio, cantidad)
+                for id, precio, cantidad in zip(tabla.ids, tabla.precios, tabla.cantidades)]
+    
+    def _indices_ordenados(self):
+        """Los índices ordenados, creados la primera vez con todo el catálogo bloqueado
+        (O(n log n)); desde entonces cada cambio los actualiza en O(log n)."""
+        if self._indices is None:
+            candados = self._candados()
+            for c in candados:
+                c.acquire()
+            try:
+                with self._candado_perezoso, self._candado_totales:
+                    if self._indices is None:
+                        self._indices = IndicesOrdenados(self._valores_actuales())
+            finally:
+                for c in reversed(candados):
+                    c.release()
+        return self._indices
+    
+    def por_rango(self, campo, minimo=None, maximo=None, desde=0, limite=None, descendente=False):
+        """Productos con campo ("precio", "cantidad" o "valor" = precio·cantidad) entre minimo y
+        maximo, ambos incluidos (None = sin límite), en orden de ese campo y, a igualdad, de
+        id (al revés con descendente). desde y limite eligen una ventana de ese orden, como
+        una página. Sale de los índices ordenados: O(log n + limite), sin recorrer el catálogo."""
+        indices = self._indices_ordenados()
+        with self._candado_totales:
+            ids = indices.ids(campo, minimo, maximo, desde, limite, descendente)
+        return [p for p in map(self.buscar_por_id, ids) if p]
+    
+    def contar_rango(self, campo, minimo=None, maximo=None):
+        """Nº de productos con campo entre minimo y maximo (ver por_rango), en O(log n)."""
+        indices = self._indices_ordenados()
+        with self._candado_totales:
+            return indices.contar(campo, minimo, maximo)
+    
+    def mas_valiosos(self, n=10):
+        """Los n productos con más valor en stock (precio · cantidad), de mayor a menor."""
+        return self.por_rango("valor", limite=n, descendente=True)
+    
+    def filtrar(self, id_desde=None, id_hasta=None, patron=None, precio_min=None, precio_max=None,
+                stock_min=None, stock_max=None):
+        """Genera los productos que cumplen todos los predicados indicados (None = sin filtro).
+        patron admite comodines (*, ?) sobre el nombre sin distinguir mayúsculas; sin comodines
+        busca la subcadena. La franja de precio se evalúa sobre el precio original, para que
+        aplicar y quitar un descuento con los mismos filtros afecte a los mismos productos."""
+        if patron is not None:
+            patron = patron.casefold()
+            if not any(c in patron for c in "*?["):
+                patron = f"*{patron}*"
+        for p in list(self.productos):  # Copia: otro hilo puede crear o eliminar mientras se recorre
+            if (id_desde is not None and p.id < id_desde) or (id_hasta is not None and p.id > id_hasta):
+                continue
+            if (precio_min is not None and p.precio_original < precio_min) or \
+                    (precio_max is not None and p.precio_original > precio_max):
+                continue
+            if (stock_min is not None and p.cantidad < stock_min) or (stock_max is not None and p.cantidad > stock_max):
+                continue
+            if patron is not None and not fnmatch.fnmatchcase(self._clave_nombre[p.id], patron):
+                continue
+            yield p
+    
+    def aplicar_descuento_masivo(self, porcentaje, **filtros):
+        """Aplica un descuento a todos los productos que cumplen los filtros (ver filtrar),
+        en una sola pasada y con una sola persistencia. Devuelve (nº de cambios, mensaje)."""
+        if not 0 <= porcentaje <= 100:
+            return (0, "✗ Porcentaje inválido")
+        with self._bloquear():
+            cambiados = []
+            for prod in self.filtrar(**filtros):
+                nuevo = prod.precio_original * (1 - porcentaje/100)
+                if prod.precio != nuevo:
+                    with self._modificando(prod):
+                        prod.precio = nuevo
+                    cambiados.append(prod)
+            if cambiados:
+                self._persistir("precio", filas=cambiados)
+        return (len(cambiados), f"✓ Descuento del {porcentaje:g}% aplicado a {len(cambiados)} producto(s)")
+    
+    def resetear_descuento_masivo(self, **filtros):
+        """Restaura el precio original de todos los productos que cumplen los filtros.
+        Devuelve (nº de cambios, mensaje)."""
+        with self._bloquear():
+            cambiados = []
+            for prod in self.filtrar(**filtros):
+                if prod.precio != prod.precio_original:
+                    with self._modificando(prod):
+                        prod.precio = prod.precio_original
+                    cambiados.append(prod)
+            if cambiados:
+                self._persistir("precio", filas=cambiados)
+        return (len(cambiados), f"✓ Descuento removido de {len(cambiados)} producto(s)")
+    
+    def eliminar_producto(self, id):
+        with self._bloquear():
+            prod = self.buscar_por_id(id)
+            if prod:
+                self._quitar(prod)
+                self._persistir("eliminar", borrar=[prod.id])
+                return f"✓ {prod.nombre} eliminado"
+        return "✗ Producto no encontrado"
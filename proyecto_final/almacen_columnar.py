@@ -0,0 +1,523 @@
+# ============================================================================
+# ALMACÉN COLUMNAR - Variante con NumPy para catálogos de millones de productos
+# ============================================================================
+# Guarda ids, precios, precios originales y cantidades en arrays contiguos de NumPy
+# y los nombres en una tabla de cadenas aparte, en lugar de un objeto Producto por
+# fila. Ofrece la misma API pública que Almacen (y usa los mismos backends de
+# almacenamiento), pero los totales, filtros, consultas por rango y cambios masivos
+# son operaciones vectorizadas. No tiene modo compartido entre procesos (compartido),
+# escritura en segundo plano (segundo_plano) ni aviso al cruzar el punto de reorden
+# (al_cruzar_umbral); sincronizar() existe pero nunca hay nada que incorporar.
+# Requiere NumPy, que no es necesario para el resto del programa:
+#
+#     from almacen_columnar import AlmacenColumnar
+#     almacen = AlmacenColumnar(modo="diario")
+import fnmatch, heapq, threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from almacen import ARCHIVO_DATOS, UMBRAL_SIMILITUD, Producto, _trigramas
+from almacenamiento import MODOS, PUNTO_REORDEN, crear_almacenamiento
+from indices import CAMPOS_INDICE
+
+# Capacidad inicial de los arrays; se duplica cuando se llenan
+CAPACIDAD_INICIAL = 1024
+
+
+class AlmacenColumnar:
+    """Almacén con columnas NumPy. Los productos que devuelve (buscar_por_id, productos,
+    buscar_por_nombre) son copias: para modificar hay que usar los métodos del almacén.
+    Un único candado serializa las operaciones; las masivas compensan al ser vectorizadas."""
+
+    MODOS = MODOS
+
+    def __init__(self, archivo=None, modo="completo", almacenamiento=None):
+        self.almacenamiento = almacenamiento or crear_almacenamiento(modo, archivo or ARCHIVO_DATOS)
+        self.modo = self.almacenamiento.modo
+        self.proximo_id = 1
+        self.dinero_vendido = 0
+        self._candado = threading.RLock()
+        self._agrupando = 0
+        self._pendientes = []
+        self._cambios = None  # Ids modificados desde la última consulta (None: sin seguimiento)
+        self._todo_cambiado = True
+        self._reiniciar(CAPACIDAD_INICIAL)
+        self.cargar_datos()
+
+    def _reiniciar(self, capacidad):
+        self._ids = np.zeros(capacidad, np.int64)
+        self._precios = np.zeros(capacidad, np.float64)
+        self._originales = np.zeros(capacidad, np.float64)
+        self._cantidades = np.zeros(capacidad, np.int64)
+        self._puntos = np.zeros(capacidad, np.int64)  # Puntos de reorden
+        self._activos = np.zeros(capacidad, bool)  # False = fila libre o producto eliminado
+        self._nombres = []  # Tabla de cadenas, una por fila
+        self._n = 0  # Filas ocupadas (incluidas las eliminadas hasta que se compacten)
+        self._fila = {}  # id -> nº de fila
+        self._por_nombre = {}  # nombre (casefold) -> id
+
+    # ------------------------------------------------------------------ columnas
+    def _crecer(self, minimo):
+        capacidad = len(self._ids)
+        if minimo <= capacidad:
+            return
+        while capacidad < minimo:
+            capacidad *= 2
+        for campo in ("_ids", "_precios", "_originales", "_cantidades", "_puntos", "_activos"):
+            viejo = getattr(self, campo)
+            nuevo = np.zeros(capacidad, viejo.dtype)
+            nuevo[:self._n] = viejo[:self._n]
+            setattr(self, campo, nuevo)
+
+    def _anadir_filas(self, filas):
+        """Añade filas [id, nombre, precio, precio_original, cantidad, punto_reorden] al final de las columnas."""
+        k = len(filas)
+        self._crecer(self._n + k)
+        i, j = self._n, self._n + k
+        self._ids[i:j] = [f[0] for f in filas]
+        self._precios[i:j] = [f[2] for f in filas]
+        self._originales[i:j] = [f[3] for f in filas]
+        self._cantidades[i:j] = [f[4] for f in filas]
+        self._puntos[i:j] = [f[5] if len(f) > 5 else PUNTO_REORDEN for f in filas]
+        self._activos[i:j] = True
+        for fila, f in enumerate(filas, i):
+            self._nombres.append(f[1])
+            self._fila[f[0]] = fila
+            self._por_nombre[f[1].casefold()] = f[0]
+        self._n = j
+
+    def _quitar_fila(self, fila):
+        id = int(self._ids[fila])
+        self._activos[fila] = False
+        del self._fila[id]
+        self._por_nombre.pop(self._nombres[fila].casefold(), None)
+        self._nombres[fila] = None
+        if len(self._fila) < self._n // 2:  # Más de la mitad eliminadas: recompactar columnas
+            self._recompactar()
+
+    def _recompactar(self):
+        vivas = np.flatnonzero(self._activos[:self._n])
+        for campo in ("_ids", "_precios", "_originales", "_cantidades", "_puntos", "_activos"):
+            col = getattr(self, campo)
+            col[:len(vivas)] = col[vivas]
+            col[len(vivas):self._n] = 0
+        self._nombres = [self._nombres[i] for i in vivas]
+        self._n = len(vivas)
+        self._fila = {int(id): i for i, id in enumerate(self._ids[:self._n])}
+
+    def _fila_de(self, fila):
+        return [int(self._ids[fila]), self._nombres[fila], float(self._precios[fila]),
+                float(self._originales[fila]), int(self._cantidades[fila]), int(self._puntos[fila])]
+
+    def _producto(self, fila):
+        return Producto.from_fila(self._fila_de(fila))
+
+    def _vivas(self):
+        """Índices de las filas con producto, en orden de alta."""
+        return np.flatnonzero(self._activos[:self._n])
+
+    # ------------------------------------------------------------------ persistencia
+    def cargar_datos(self):
+        filas, dinero_vendido, registros = self.almacenamiento.cargar()
+        with self._candado:
+            self._reiniciar(max(CAPACIDAD_INICIAL, len(filas)))
+            if getattr(filas, "perezosa", False):
+                self._cargar_tabla(filas)
+            else:
+                self._anadir_filas(filas)
+            self.proximo_id = int(self._ids[:self._n].max(initial=0)) + 1
+            self.dinero_vendido = dinero_vendido
+            for reg in registros:
+                nuevas = []
+                for f in reg.get("filas", ()):
+                    if f[0] in self._fila:
+                        self._escribir_fila(self._fila[f[0]], f)
+                    else:
+                        nuevas.append(f)
+                        self.proximo_id = max(self.proximo_id, f[0] + 1)
+                self._anadir_filas(nuevas)
+                for id in reg.get("borrar", ()):
+                    if id in self._fila:
+                        self._quitar_fila(self._fila[id])
+                self.dinero_vendido += reg.get("monto", 0)
+            self._todo_cambiado = True
+        if self.almacenamiento.necesita_compactar():
+            self.compactar()
+
+    def _cargar_tabla(self, tabla):
+        """Copia las columnas de una instantánea binaria directamente a los arrays."""
+        n = len(tabla)
+        for campo, columna in (("_ids", tabla.ids), ("_precios", tabla.precios),
+                               ("_originales", tabla.originales), ("_cantidades", tabla.cantidades)):
+            getattr(self, campo)[:n] = np.frombuffer(columna, getattr(self, campo).dtype)
+        self._puntos[:n] = np.frombuffer(tabla.puntos, np.int64) if tabla.puntos is not None else PUNTO_REORDEN
+        self._activos[:n] = True
+        self._nombres = [tabla.nombre(i) for i in range(n)]
+        self._fila = {int(id): i for i, id in enumerate(self._ids[:n])}
+        self._por_nombre = {nombre.casefold(): int(id) for nombre, id in zip(self._nombres, self._ids[:n])}
+        self._n = n
+        tabla.cerrar()
+
+    def _escribir_fila(self, fila, f):
+        self._precios[fila], self._originales[fila], self._cantidades[fila] = f[2], f[3], f[4]
+        self._puntos[fila] = f[5] if len(f) > 5 else PUNTO_REORDEN
+
+    def guardar_datos(self):
+        with self._candado:
+            return self.almacenamiento.guardar(self.productos, self.dinero_vendido, self.proximo_id)
+
+    def _persistir(self, op, filas=(), borrar=(), monto=0):
+        """Como Almacen._persistir, pero recibe números de fila en lugar de productos."""
+        reg = {"op": op}
+        if len(filas):
+            reg["filas"] = [self._fila_de(i) for i in filas]
+        if borrar:
+            reg["borrar"] = list(borrar)
+        if monto:
+            reg["monto"] = monto
+        if self._cambios is not None:
+            self._cambios.update(self._ids[filas].tolist() if len(filas) else ())
+            self._cambios.update(borrar)
+        self._pendientes.append(reg)
+        if not self._agrupando:
+            self._volcar_pendientes()
+        if self.almacenamiento.necesita_compactar():
+            self.compactar()
+
+    def _volcar_pendientes(self):
+        pendientes, self._pendientes = self._pendientes, []
+        if not pendientes:
+            return
+        if self.almacenamiento.incremental:
+            self.almacenamiento.registrar(pendientes)
+        else:
+            self.guardar_datos()
+
+    @contextmanager
+    def persistencia_agrupada(self):
+        with self._candado:
+            self._agrupando += 1
+            try:
+                yield
+            finally:
+                self._agrupando -= 1
+                if not self._agrupando:
+                    self._volcar_pendientes()
+
+    def registrar_cambios(self):
+        with self._candado:
+            if self._cambios is None:
+                self._cambios = set()
+
+    def cambios_pendientes(self):
+        """Como Almacen.cambios_pendientes."""
+        with self._candado:
+            cambios, self._cambios = self._cambios, set()
+            if self._todo_cambiado:
+                self._todo_cambiado = False
+                return None
+            return cambios
+
+    def compactar(self):
+        with self._candado:
+            if self.guardar_datos():
+                self._pendientes = []
+
+    def sincronizar(self):
+        """Como Almacen.sincronizar sin modo compartido: no hay cambios de otros procesos."""
+        return False
+
+    def cerrar(self):
+        with self._candado:
+            self._volcar_pendientes()
+            if self.almacenamiento.necesita_compactar(al_cerrar=True):
+                self.compactar()
+            self.almacenamiento.cerrar()
+
+    # ------------------------------------------------------------------ API de Almacen
+    @property
+    def productos(self):
+        """Lista de copias de todos los productos (se materializa en cada acceso)."""
+        return [self._producto(i) for i in self._vivas()]
+
+    def existe_nombre(self, nombre):
+        return nombre.casefold() in self._por_nombre
+
+    def crear_producto(self, nombre, precio, cantidad):
+        with self._candado:
+            if not nombre or precio <= 0 or cantidad < 0 or self.existe_nombre(nombre):
+                return (False, "✗ Datos inválidos o producto existente")
+            id = self.proximo_id
+            self._anadir_filas([[id, nombre, precio, precio, cantidad]])
+            self.proximo_id += 1
+            self._persistir("crear", filas=[self._fila[id]])
+            return (True, f"✓ Producto '{nombre}' creado con ID {id}")
+
+    def crear_productos(self, datos):
+        """Como Almacen.crear_productos: las filas válidas se añaden a las columnas de una vez."""
+        nuevas, rechazados, vistos = [], [], set()
+        with self._candado:
+            for i, (nombre, precio, cantidad) in enumerate(datos):
+                if not nombre or precio <= 0 or cantidad < 0:
+                    rechazados.append((i, "✗ Datos inválidos"))
+                elif self.existe_nombre(nombre) or nombre.casefold() in vistos:
+                    rechazados.append((i, "✗ Producto existente"))
+                else:
+                    vistos.add(nombre.casefold())
+                    nuevas.append([self.proximo_id + len(nuevas), nombre, precio, precio, cantidad])
+            if nuevas:
+                inicio = self._n
+                self._anadir_filas(nuevas)
+                self.proximo_id += len(nuevas)
+                self._persistir("crear", filas=np.arange(inicio, self._n))
+        return ([f[0] for f in nuevas], rechazados)
+
+    def buscar_por_id(self, id):
+        fila = self._fila.get(id)
+        return None if fila is None else self._producto(fila)
+
+    def vender(self, id, cantidad):
+        with self._candado:
+            fila = self._fila.get(id)
+            if fila is not None and self._cantidades[fila] >= cantidad and cantidad > 0:
+                monto_venta = cantidad * float(self._precios[fila])
+                self._cantidades[fila] -= cantidad
+                self.dinero_vendido += monto_venta
+                self._persistir("venta", filas=[fila], monto=monto_venta)
+                return (True, f"✓ Venta: {cantidad}x {self._nombres[fila]} = ${monto_venta:.2f}", monto_venta)
+        return (False, "✗ Stock insuficiente o cantidad inválida", 0)
+
+    def vender_lote(self, lineas):
+        """Pedido de varias líneas: validación y descuento de stock vectorizados, todo o nada."""
+        pedido = {}
+        for id, cantidad in lineas:
+            if cantidad <= 0:
+                return (False, f"✗ Cantidad inválida para ID {id}", 0)
+            pedido[id] = pedido.get(id, 0) + cantidad
+        if not pedido:
+            return (False, "✗ Pedido vacío", 0)
+        with self._candado:
+            filas = np.fromiter((self._fila.get(id, -1) for id in pedido), np.int64, len(pedido))
+            cantidades = np.fromiter(pedido.values(), np.int64, len(pedido))
+            invalidas = np.flatnonzero((filas < 0) | (self._cantidades[filas] < cantidades))
+            if len(invalidas):  # Se informa de la primera línea inválida, en el orden del pedido
+                k = invalidas[0]
+                if filas[k] < 0:
+                    return (False, f"✗ Producto {list(pedido)[k]} no encontrado", 0)
+                i = filas[k]
+                return (False, f"✗ Stock insuficiente de {self._nombres[i]}: {self._cantidades[i]} < {cantidades[k]}", 0)
+            monto_total = float(np.dot(cantidades, self._precios[filas]))
+            self._cantidades[filas] -= cantidades
+            self.dinero_vendido += monto_total
+            self._persistir("lote", filas=filas, monto=monto_total)
+        return (True, f"✓ Pedido: {len(filas)} producto(s), {int(cantidades.sum())} unidades = ${monto_total:.2f}", monto_total)
+
+    def listar_productos(self):
+        vivas = self._vivas()
+        return "El almacén está vacío" if not len(vivas) else "\n--- INVENTARIO ---\n" + "\n".join(str(self._producto(i)) for i in vivas)
+
+    def valor_total_almacen(self):
+        n, act = self._n, self._activos[:self._n]
+        return float(np.dot(self._precios[:n][act], self._cantidades[:n][act]))
+
+    def unidades_totales(self):
+        return int(self._cantidades[:self._n][self._activos[:self._n]].sum())
+
+    def cantidad_productos(self):
+        return len(self._fila)
+
+    def buscar_por_nombre(self, nombre, limite=None):
+        clave = nombre.casefold()
+        encontrados = []
+        for i, n in enumerate(self._nombres):
+            if n is not None and clave in n.casefold():
+                encontrados.append(self._producto(i))
+                if limite and len(encontrados) >= limite:
+                    break
+        return encontrados
+
+    def buscar_similares(self, texto, k=10, umbral=UMBRAL_SIMILITUD):
+        """Como Almacen.buscar_similares (misma similitud y mismo orden), pero sin índice de
+        trigramas: compara con cada nombre y se queda con los k mejores (heapq.nlargest)."""
+        consulta = _trigramas(texto.casefold())
+        if not consulta:
+            return [(p, 1.0) for p in self.buscar_por_nombre(texto, k)]
+        with self._candado:
+            similares = []
+            for i, n in enumerate(self._nombres):
+                if n is not None:
+                    nombre = _trigramas(n.casefold())
+                    similitud = len(consulta & nombre) / len(consulta)
+                    if similitud >= umbral:
+                        similares.append((similitud, -len(nombre), -int(self._ids[i]), i))
+            return [(self._producto(i), similitud) for similitud, _, _, i in heapq.nlargest(k, similares)]
+
+    def _filas_en_rango(self, campo, minimo, maximo):
+        """Filas vivas con campo entre minimo y maximo y su clave (NaN cuenta como +inf, como
+        en indices.claves)."""
+        if campo not in CAMPOS_INDICE:
+            raise ValueError(f"Campo sin índice: {campo}")
+        filas = self._vivas()
+        if campo == "cantidad":
+            clave = self._cantidades[filas]
+        else:
+            clave = self._precios[filas] * (self._cantidades[filas] if campo == "valor" else 1)
+            clave = np.where(np.isnan(clave), np.inf, clave)
+        dentro = np.ones(len(filas), bool)
+        if minimo is not None:
+            dentro &= clave >= minimo
+        if maximo is not None:
+            dentro &= clave <= maximo
+        return filas[dentro], clave[dentro]
+
+    def por_rango(self, campo, minimo=None, maximo=None, desde=0, limite=None, descendente=False):
+        """Como Almacen.por_rango (mismo orden y misma ventana), pero sin índices ordenados:
+        filtra y ordena las columnas en cada consulta."""
+        with self._candado:
+            filas, clave = self._filas_en_rango(campo, minimo, maximo)
+            orden = np.lexsort((self._ids[filas], clave))
+            if descendente:
+                orden = orden[::-1]
+            fin = None if limite is None else desde + limite
+            return [self._producto(i) for i in filas[orden[desde:fin]]]
+
+    def contar_rango(self, campo, minimo=None, maximo=None):
+        with self._candado:
+            return len(self._filas_en_rango(campo, minimo, maximo)[0])
+
+    def mas_valiosos(self, n=10):
+        return self.por_rango("valor", limite=n, descendente=True)
+
+    def actualizar_stock(self, id, cantidad):
+        with self._candado:
+            fila = self._fila.get(id)
+            if fila is not None:
+                self._cantidades[fila] += cantidad
+                self._persistir("stock", filas=[fila])
+                return f"✓ Stock: {self._nombres[fila]} -> {self._cantidades[fila]} unidades"
+        return "✗ Producto no encontrado"
+
+    def fijar_punto_reorden(self, id, punto):
+        if punto < 0:
+            return "✗ Punto de reorden inválido"
+        with self._candado:
+            fila = self._fila.get(id)
+            if fila is not None:
+                self._puntos[fila] = punto
+                self._persistir("reorden", filas=[fila])
+                return f"✓ Punto de reorden: {self._nombres[fila]} -> {punto} unidades"
+        return "✗ Producto no encontrado"
+
+    def productos_a_reponer(self, limite=None):
+        """Como Almacen.productos_a_reponer, pero sin montículo: una comparación vectorizada de
+        las columnas de stock y punto de reorden, ordenada por margen y id. No avisa al cruzar
+        el umbral (no hay al_cruzar_umbral)."""
+        with self._candado:
+            n = self._n
+            margen = self._cantidades[:n] - self._puntos[:n]
+            filas = np.flatnonzero(self._activos[:n] & (margen <= 0))
+            filas = filas[np.lexsort((self._ids[filas], margen[filas]))][:limite]
+            return [self._producto(i) for i in filas]
+
+    def aplicar_descuento(self, id, porcentaje):
+        with self._candado:
+            fila = self._fila.get(id)
+            if fila is not None and 0 <= porcentaje <= 100:
+                self._precios[fila] = self._originales[fila] * (1 - porcentaje/100)
+                self._persistir("precio", filas=[fila])
+                return f"✓ Descuento aplicado: {self._nombres[fila]} = ${self._precios[fila]:.2f}"
+        return "✗ Producto no encontrado" if fila is None else "✗ Porcentaje inválido"
+
+    def resetear_descuento(self, id):
+        with self._candado:
+            fila = self._fila.get(id)
+            if fila is not None:
+                if self._precios[fila] != self._originales[fila]:
+                    self._precios[fila] = self._originales[fila]
+                    self._persistir("precio", filas=[fila])
+                    return f"✓ Descuento removido: {self._nombres[fila]} = ${self._precios[fila]:.2f}"
+                return f"⚠️ {self._nombres[fila]} sin descuento"
+        return "✗ Producto no encontrado"
+
+    def eliminar_producto(self, id):
+        with self._candado:
+            fila = self._fila.get(id)
+            if fila is not None:
+                nombre = self._nombres[fila]
+                self._quitar_fila(fila)
+                self._persistir("eliminar", borrar=[id])
+                return f"✓ {nombre} eliminado"
+        return "✗ Producto no encontrado"
+
+    # ------------------------------------------------------------------ operaciones vectorizadas
+    def _mascara(self, id_desde=None, id_hasta=None, patron=None, precio_min=None, precio_max=None,
+                 stock_min=None, stock_max=None):
+        """Máscara booleana (sobre las filas ocupadas) de los productos que cumplen todos los
+        filtros de Almacen.filtrar, con la franja de precio sobre el precio original. patron
+        filtra por nombre (la única parte no vectorizada)."""
+        n = self._n
+        mascara = self._activos[:n].copy()
+        for columna, minimo, maximo in ((self._ids, id_desde, id_hasta), (self._originales, precio_min, precio_max),
+                                        (self._cantidades, stock_min, stock_max)):
+            if minimo is not None:
+                mascara &= columna[:n] >= minimo
+            if maximo is not None:
+                mascara &= columna[:n] <= maximo
+        if patron is not None:
+            patron = patron.casefold()
+            if not any(c in patron for c in "*?["):
+                patron = f"*{patron}*"
+            for i in np.flatnonzero(mascara):
+                mascara[i] = fnmatch.fnmatchcase(self._nombres[i].casefold(), patron)
+        return mascara
+
+    def ids_filtrados(self, **filtros):
+        with self._candado:
+            return self._ids[:self._n][self._mascara(**filtros)].tolist()
+
+    def filtrar(self, id_desde=None, id_hasta=None, patron=None, precio_min=None, precio_max=None,
+                stock_min=None, stock_max=None, por_bloque=4096):
+        """Como Almacen.filtrar: genera (copias de) los productos que cumplen los filtros, en
+        orden de id. Los ids se eligen de una vez y los productos se crean por bloques, así
+        que los eliminados mientras tanto no aparecen."""
+        ids = self.ids_filtrados(id_desde=id_desde, id_hasta=id_hasta, patron=patron, precio_min=precio_min,
+                                 precio_max=precio_max, stock_min=stock_min, stock_max=stock_max)
+        for inicio in range(0, len(ids), por_bloque):
+            with self._candado:
+                bloque = [self._producto(self._fila[id]) for id in ids[inicio:inicio + por_bloque] if id in self._fila]
+            yield from bloque
+
+    def actualizar_stock_masivo(self, cambios):
+        """Aplica de una vez cambios de stock {id: cantidad a sumar}; una sola persistencia."""
+        with self._candado:
+            faltan = [id for id in cambios if id not in self._fila]
+            if faltan:
+                return f"✗ Producto {faltan[0]} no encontrado"
+            filas = np.fromiter((self._fila[id] for id in cambios), np.int64, len(cambios))
+            np.add.at(self._cantidades, filas, np.fromiter(cambios.values(), np.int64, len(cambios)))
+            self._persistir("stock", filas=filas)
+            return f"✓ Stock actualizado en {len(filas)} producto(s)"
+
+    def aplicar_descuento_masivo(self, porcentaje, **filtros):
+        """Descuento vectorizado sobre los productos filtrados (franja de precio sobre el original).
+        Devuelve (nº de cambios, mensaje) como Almacen.aplicar_descuento_masivo."""
+        if not 0 <= porcentaje <= 100:
+            return (0, "✗ Porcentaje inválido")
+        with self._candado:
+            filas = np.flatnonzero(self._mascara(**filtros))
+            nuevos = self._originales[filas] * (1 - porcentaje/100)
+            filas = filas[self._precios[filas] != nuevos]
+            self._precios[filas] = self._originales[filas] * (1 - porcentaje/100)
+            if len(filas):
+                self._persistir("precio", filas=filas)
+        return (len(filas), f"✓ Descuento del {porcentaje:g}% aplicado a {len(filas)} producto(s)")
+
+    def resetear_descuento_masivo(self, **filtros):
+        with self._candado:
+            mascara = self._mascara(**filtros)
+            filas = np.flatnonzero(mascara & (self._precios[:self._n] != self._originales[:self._n]))
+            self._precios[filas] = self._originales[filas]
+            if len(filas):
+                self._persistir("precio", filas=filas)
+        return (len(filas), f"✓ Descuento removido de {len(filas)} producto(s)")
@@ -0,0 +1,857 @@
+# ============================================================================
+# ALMACENAMIENTO - Backends de persistencia intercambiables para el Almacen
+# ============================================================================
+# Todos los backends trabajan con filas compactas [id, nombre, precio, precio_original, cantidad,
+# punto_reorden] (las filas de 5 columnas de archivos anteriores se leen con PUNTO_REORDEN)
+# y con registros de operación {"op", "filas", "borrar", "monto"} generados por el Almacen.
+#
+# Interfaz común:
+#   cargar()                  -> (filas, dinero_vendido, registros a reproducir encima)
+#   registrar(registros)      -> persiste solo los cambios (backends incrementales)
+#   guardar(productos, dinero_vendido, proximo_id) -> vuelca el estado completo
+#   necesita_compactar(al_cerrar=False), cerrar()
+#   bytes_escritos            -> total acumulado escrito por el backend (para métricas)
+#   bloquear(), desbloquear() -> candado entre procesos (modo compartido del Almacen)
+#   cambios_ajenos()          -> (instantánea nueva o None, registros) escritos por otros procesos
+#   hay_cambios_ajenos()      -> comprobación barata, sin candado, de si los hay
+#
+# EscritorSegundoPlano envuelve cualquiera de ellos y hace las escrituras en otro hilo.
+import atexit, bisect, copy, json, mmap, os, struct, threading, time, zlib
+from array import array
+from itertools import islice
+from json.encoder import encode_basestring
+from pathlib import Path
+
+try:
+    import fcntl  # Unix
+except ImportError:
+    fcntl = None
+    import msvcrt  # Windows
+
+# Nº de registros que admite el diario antes de volcarse en una instantánea completa
+COMPACTAR_CADA = 500
+
+# Modos de persistencia seleccionables al crear un Almacen
+MODOS = ("completo", "diario", "sqlite", "binario")
+
+# Punto de reorden de los productos que no indican otro (y de los archivos anteriores a él):
+# con 0 unidades o menos el producto pasa a la lista de reposición
+PUNTO_REORDEN = 0
+
+
+def fila_desde_dict(data):
+    """Convierte un producto del JSON (diccionario) a fila compacta."""
+    return [data["id"], data["nombre"], data["precio"], data.get("precio_original", data["precio"]), data["cantidad"],
+            data.get("punto_reorden", PUNTO_REORDEN)]
+
+
+def fila_completa(fila):
+    """La fila con sus 6 columnas (las de diarios anteriores al punto de reorden tienen 5)."""
+    return fila if len(fila) > 5 else [*fila, PUNTO_REORDEN]
+
+
+# Orden de claves de cada producto en la instantánea JSON (el de Producto.to_dict)
+CLAVES_PRODUCTO = ("id", "nombre", "precio", "cantidad", "precio_original", "punto_reorden")
+
+
+def _fila_o_dict(pares):
+    """object_pairs_hook de json: los productos (claves en el orden que escribe el Almacen)
+    pasan directamente a fila compacta, sin crear un diccionario por producto."""
+    claves = tuple(clave for clave, _ in pares)
+    if claves == CLAVES_PRODUCTO:
+        (_, id), (_, nombre), (_, precio), (_, cantidad), (_, original), (_, punto) = pares
+        return [id, nombre, precio, original, cantidad, punto]
+    if claves == CLAVES_PRODUCTO[:5]:  # Archivos anteriores al punto de reorden
+        (_, id), (_, nombre), (_, precio), (_, cantidad), (_, original) = pares
+        return [id, nombre, precio, original, cantidad, PUNTO_REORDEN]
+    if claves == CLAVES_PRODUCTO[:4]:  # Archivos anteriores a los descuentos
+        (_, id), (_, nombre), (_, precio), (_, cantidad) = pares
+        return [id, nombre, precio, precio, cantidad, PUNTO_REORDEN]
+    return dict(pares)
+
+
+# Texto de un producto en la instantánea JSON, idéntico al de json.dump(..., indent=4)
+PRODUCTO_JSON = ('        {\n            "id": %r,\n            "nombre": %s,\n            "precio": %s,\n'
+                 '            "cantidad": %s,\n            "precio_original": %s,\n            "punto_reorden": %s\n        }')
+
+
+def numero_json(x):
+    """Un número como lo escribe json.dump: su repr, salvo inf y nan, que pasan a Infinity,
+    -Infinity y NaN (json.load los acepta; los tokens inf y nan no son JSON)."""
+    return repr(x) if x - x == 0 else json.dumps(x)
+
+
+def escribir_instantanea_json(f, productos, dinero_vendido, proximo_id, generacion, por_bloque=4096):
+    """Escribe la instantánea JSON producto a producto, por bloques de texto, sin construir
+    la lista de diccionarios que necesitaría json.dump."""
+    productos = iter(productos)
+    f.write('{\n    "productos": [')
+    separador = "\n"
+    while bloque := list(islice(productos, por_bloque)):
+        f.write(separador + ",\n".join([PRODUCTO_JSON % (p.id, encode_basestring(p.nombre), numero_json(p.precio),
+                                                          numero_json(p.cantidad), numero_json(p.precio_original),
+                                                          numero_json(p.punto_reorden))
+                                         for p in bloque]))
+        separador = ",\n"
+    f.write("\n    ]" if separador == ",\n" else "]")
+    f.write(',\n    "proximo_id": %s,\n    "dinero_vendido": %s,\n    "generacion": %s\n}'
+            % (json.dumps(proximo_id), json.dumps(dinero_vendido), json.dumps(generacion)))
+
+
+def reemplazar_atomico(temporal, destino):
+    """Sustituye destino por temporal (ya escrito y sincronizado con os.fsync) de forma
+    atómica y sincroniza también el directorio, para que el renombrado sobreviva a un corte."""
+    os.replace(temporal, destino)
+    if hasattr(os, "O_DIRECTORY"):  # En Windows no se pueden abrir directorios
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(destino)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"Error al sincronizar el directorio: {e}")
+
+
+def _firma(ruta):
+    """(inodo, tamaño, fecha de modificación) de un archivo, o None si no existe. Cambia
+    cuando otro proceso lo sustituye, aunque el contenido mida lo mismo."""
+    try:
+        st = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class CandadoArchivo:
+    """Candado consultivo entre procesos sobre un archivo auxiliar: flock en Unix y
+    msvcrt.locking en Windows. Solo excluye a los procesos que también lo piden."""
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self._archivo = None
+
+    def adquirir(self):
+        if self._archivo is None:
+            self._archivo = open(self.ruta, 'a+b')
+        if fcntl:
+            fcntl.flock(self._archivo.fileno(), fcntl.LOCK_EX)
+            return
+        self._archivo.seek(0)
+        while True:  # LK_LOCK se rinde tras unos 10 s de reintentos: se sigue esperando
+            try:
+                msvcrt.locking(self._archivo.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                pass
+
+    def liberar(self):
+        if fcntl:
+            fcntl.flock(self._archivo.fileno(), fcntl.LOCK_UN)
+        else:
+            self._archivo.seek(0)
+            msvcrt.locking(self._archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def cerrar(self):
+        if self._archivo is not None:
+            self._archivo.close()  # Cerrarlo también suelta el candado
+            self._archivo = None
+
+
+class AlmacenamientoJSON:
+    """Instantánea JSON legible más, opcionalmente, un diario de operaciones.
+
+    - diario=False ("completo"): cada cambio reescribe el JSON entero.
+    - diario=True ("diario"): cada cambio añade una línea compacta al diario y, cada
+      COMPACTAR_CADA registros, se vuelca una instantánea completa y se vacía el diario.
+
+    La generación de la instantánea es el nº del último registro del diario que incluye
+    (en modo "completo", el nº de reescrituras). Para compartir el archivo entre procesos
+    se recuerda hasta dónde se ha leído el diario y la firma de la instantánea: así
+    cambios_ajenos() sabe si otro proceso ha añadido registros o ha compactado."""
+
+    def __init__(self, archivo, diario=False, compactar_cada=None):
+        self.archivo = Path(archivo)
+        self.archivo_diario = self.archivo.with_name(self.archivo.stem + "_diario.jsonl")
+        self.modo = "diario" if diario else "completo"
+        self.incremental = diario
+        self.compactar_cada = compactar_cada or COMPACTAR_CADA
+        self.generacion = 0  # Nº del último registro del diario incluido en memoria
+        self._diario = None  # Archivo del diario abierto en modo append
+        self._registros_diario = 0
+        self._posicion_diario = 0  # Bytes del diario ya leídos o escritos por este proceso
+        self._firma_instantanea = None  # Firma de la instantánea que refleja la memoria
+        self.candado = CandadoArchivo(self.archivo.with_name(self.archivo.name + ".lock"))
+        self.bytes_escritos = 0
+
+    def _ruta_instantanea(self):
+        return self.archivo
+
+    def cargar(self):
+        """Lee la instantánea y los registros del diario posteriores a su generación."""
+        self._firma_instantanea = _firma(self._ruta_instantanea())
+        filas, dinero_vendido = self._leer_instantanea()
+        self._posicion_diario = self._registros_diario = 0
+        return filas, dinero_vendido, self._leer_diario()
+
+    def bloquear(self):
+        self.candado.adquirir()
+
+    def desbloquear(self):
+        self.candado.liberar()
+
+    def hay_cambios_ajenos(self):
+        """Sin candado y sin leer nada (dos stat): si otro proceso puede haber escrito desde la
+        última lectura o escritura de este. cambios_ajenos() lo confirma con el candado."""
+        if _firma(self._ruta_instantanea()) != self._firma_instantanea:
+            return True
+        firma_diario = _firma(self.archivo_diario)
+        return firma_diario is not None and firma_diario[1] > self._posicion_diario
+
+    def cambios_ajenos(self):
+        """Con el candado tomado: lo escrito por otros procesos desde la última lectura o
+        escritura de este. Devuelve (None, registros nuevos del diario) o, si otro proceso ha
+        sustituido la instantánea al compactar, ((filas, dinero_vendido), registros del
+        diario posteriores a ella)."""
+        if _firma(self._ruta_instantanea()) == self._firma_instantanea:
+            firma_diario = _firma(self.archivo_diario)
+            if firma_diario is None or firma_diario[1] <= self._posicion_diario:
+                return None, []
+            return None, self._leer_diario()
+        if self._diario:  # Apunta al diario que el otro proceso vació al compactar
+            self._diario.close()
+            self._diario = None
+        filas, dinero_vendido, registros = self.cargar()
+        if getattr(filas, "perezosa", False):
+            tabla, filas = filas, list(filas)
+            tabla.cerrar()
+        return (filas, dinero_vendido), registros
+
+    def _leer_instantanea(self):
+        """Filas y dinero vendido de la instantánea (vacía si aún no existe). Si existe pero no
+        se puede leer lanza ValueError: arrancar con el catálogo vacío haría que la siguiente
+        escritura la sustituyera y se perdieran los datos."""
+        filas, dinero_vendido = [], 0
+        if os.path.exists(str(self.archivo)):
+            try:
+                with open(str(self.archivo), 'r', encoding='utf-8') as f:
+                    datos = json.load(f, object_pairs_hook=_fila_o_dict)
+                filas = [p if isinstance(p, list) else fila_desde_dict(p) for p in datos.get("productos", [])]
+                dinero_vendido = datos.get("dinero_vendido", 0)
+                self.generacion = datos.get("generacion", 0)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                raise ValueError(f"Error al cargar datos de {self.archivo}: {e}") from e
+        return filas, dinero_vendido
+
+    def _leer_diario(self):
+        """Devuelve los registros del diario con generación posterior a la instantánea.
+        Una última línea incompleta (corte durante la escritura) se descarta y se recorta."""
+        registros = []
+        if not self.archivo_diario.exists():
+            self._posicion_diario = 0
+            return registros
+        try:
+            if self.archivo_diario.stat().st_size < self._posicion_diario:  # Es otro diario
+                self._posicion_diario = self._registros_diario = 0
+            valido = self._posicion_diario
+            with open(self.archivo_diario, 'rb') as f:
+                f.seek(valido)
+                for linea in f:
+                    try:
+                        if not linea.endswith(b"\n"):
+                            raise ValueError("registro incompleto")
+                        reg = json.loads(linea)
+                    except ValueError:
+                        break
+                    valido += len(linea)
+                    self._registros_diario += 1
+                    if reg["n"] > self.generacion:
+                        registros.append(reg)
+                        self.generacion = reg["n"]
+            if valido < self.archivo_diario.stat().st_size:
+                os.truncate(self.archivo_diario, valido)
+            self._posicion_diario = valido
+        except Exception as e:
+            print(f"Error al leer el diario: {e}")
+        return registros
+
+    def registrar(self, registros):
+        """Añade los registros al diario con una única escritura."""
+        lineas = []
+        for reg in registros:
+            self.generacion += 1
+            lineas.append(json.dumps(dict(reg, n=self.generacion), ensure_ascii=False, separators=(",", ":")) + "\n")
+        datos = "".join(lineas).encode("utf-8")
+        try:
+            if self._diario is None:
+                self._diario = open(self.archivo_diario, 'ab')
+            self._diario.write(datos)
+            self._diario.flush()
+            self._posicion_diario = self._diario.tell()
+            self.bytes_escritos += len(datos)
+        except Exception as e:
+            print(f"Error al escribir en el diario: {e}")
+        self._registros_diario += len(lineas)
+
+    def guardar(self, productos, dinero_vendido, proximo_id):
+        """Vuelca la instantánea completa (temporal + renombrado) y vacía el diario,
+        cuyos registros ya quedan incluidos en ella."""
+        if not self.incremental:
+            self.generacion += 1
+        try:
+            self._escribir_instantanea(productos, dinero_vendido, proximo_id)
+        except Exception as e:
+            print(f"Error al guardar datos: {e}")
+            return False  # Sin instantánea nueva el diario sigue siendo necesario
+        self._firma_instantanea = _firma(self._ruta_instantanea())
+        if self._diario:
+            self._diario.close()
+            self._diario = None
+        try:
+            self.archivo_diario.unlink(missing_ok=True)
+        except Exception as e:
+            print(f"Error al vaciar el diario: {e}")
+        self._registros_diario = self._posicion_diario = 0
+        return True
+
+    def _escribir_instantanea(self, productos, dinero_vendido, proximo_id):
+        temporal = self.archivo.with_name(self.archivo.name + ".tmp")
+        with open(str(temporal), 'w', encoding='utf-8') as f:
+            escribir_instantanea_json(f, productos, dinero_vendido, proximo_id, self.generacion)
+            f.flush()
+            os.fsync(f.fileno())
+        self.bytes_escritos += os.path.getsize(temporal)
+        reemplazar_atomico(str(temporal), str(self.archivo))
+
+    def necesita_compactar(self, al_cerrar=False):
+        if not self.incremental:
+            return self._registros_diario > 0  # Diario heredado de una sesión en modo "diario"
+        return self._registros_diario >= (1 if al_cerrar else self.compactar_cada)
+
+    def cerrar(self):
+        if self._diario:
+            self._diario.close()
+            self._diario = None
+        self.candado.cerrar()
+
+
+def _bytes_fila(fila):
+    """Tamaño aproximado de una fila en SQLite: seis números de 8 bytes más el nombre."""
+    return 48 + len(fila[1].encode("utf-8"))
+
+
+class AlmacenamientoSQLite:
+    """Base de datos SQLite con columnas id (clave primaria) y nombre indexadas.
+    Cada operación escribe solo las filas que cambian, en una transacción.
+    Las sentencias son fijas y parametrizadas, así sqlite3 las prepara una vez y las
+    reutiliza desde su caché. Si la base está vacía y existe el JSON (y su diario)
+    de una versión anterior, se migra automáticamente al abrirla.
+
+    Cada transacción incrementa el contador meta.cambio y lo anota en las filas que
+    escribe (columna cambio) y en los ids que borra (tabla borrados). Así otro proceso
+    relee solo lo posterior al último cambio que vio. guardar() reescribe la tabla entera y
+    vacía borrados: quien no haya visto ese cambio (meta.purgado) la relee completa."""
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS productos (
+            id INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            precio REAL NOT NULL,
+            precio_original REAL NOT NULL,
+            cantidad INTEGER NOT NULL,
+            punto_reorden INTEGER NOT NULL DEFAULT 0,
+            cambio INTEGER NOT NULL DEFAULT 0);
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_productos_nombre ON productos(nombre COLLATE NOCASE);
+        CREATE TABLE IF NOT EXISTS borrados (id INTEGER PRIMARY KEY, cambio INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor);
+        INSERT OR IGNORE INTO meta VALUES ('dinero_vendido', 0);
+        INSERT OR IGNORE INTO meta VALUES ('cambio', 0);
+        INSERT OR IGNORE INTO meta VALUES ('purgado', 0);
+    """
+    SQL_GUARDAR_FILA = """INSERT INTO productos (id, nombre, precio, precio_original, cantidad, punto_reorden, cambio)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET nombre = excluded.nombre, precio = excluded.precio,
+        precio_original = excluded.precio_original, cantidad = excluded.cantidad,
+        punto_reorden = excluded.punto_reorden, cambio = excluded.cambio"""
+    SQL_BORRAR_FILA = "DELETE FROM productos WHERE id = ?"
+    SQL_ANOTAR_BORRADO = "INSERT OR REPLACE INTO borrados VALUES (?, ?)"
+    SQL_SUMAR_DINERO = "UPDATE meta SET valor = valor + ? WHERE clave = 'dinero_vendido'"
+    SQL_FILAS = "SELECT id, nombre, precio, precio_original, cantidad, punto_reorden FROM productos"
+
+    modo = "sqlite"
+    incremental = True
+
+    def __init__(self, ruta, migrar_desde=None):
+        self.ruta = Path(ruta)
+        self.migrar_desde = Path(migrar_desde) if migrar_desde else None
+        self._con = None
+        self._version = None  # PRAGMA data_version tras la última lectura de este proceso
+        self._cambio = 0  # Último meta.cambio leído o escrito por este proceso
+        self._dinero = 0  # dinero_vendido en ese momento
+        self.candado = CandadoArchivo(self.ruta.with_name(self.ruta.name + ".lock"))
+        self.bytes_escritos = 0  # Estimado: tamaño de los datos de fila enviados a SQLite
+
+    def _conexion(self):
+        if self._con is None:
+            import sqlite3  # Solo lo carga quien usa este backend: el resto arranca más rápido
+            # Sin transacciones implícitas: cada escritura abre la suya explícitamente
+            self._con = sqlite3.connect(str(self.ruta), isolation_level=None, check_same_thread=False)
+            self._con.execute("PRAGMA journal_mode = WAL")
+            self._con.executescript(self.ESQUEMA)
+            columnas = [c[1] for c in self._con.execute("PRAGMA table_info(productos)")]
+            if "punto_reorden" not in columnas:  # Base creada antes del punto de reorden
+                self._con.execute(f"ALTER TABLE productos ADD COLUMN punto_reorden INTEGER NOT NULL "
+                                  f"DEFAULT {PUNTO_REORDEN}")
+            if "cambio" not in columnas:  # Base creada antes de la relectura por cambios
+                self._con.execute("ALTER TABLE productos ADD COLUMN cambio INTEGER NOT NULL DEFAULT 0")
+            self._con.execute("CREATE INDEX IF NOT EXISTS idx_productos_cambio ON productos(cambio)")
+        return self._con
+
+    def _meta(self, con, clave):
+        return con.execute("SELECT valor FROM meta WHERE clave = ?", (clave,)).fetchone()[0]
+
+    def _nuevo_cambio(self, con):
+        """Dentro de una transacción: incrementa meta.cambio y devuelve su nuevo valor."""
+        con.execute("UPDATE meta SET valor = valor + 1 WHERE clave = 'cambio'")
+        return self._meta(con, "cambio")
+
+    def _migrar(self, con):
+        """Importa los datos del JSON (y su diario) si la base está recién creada."""
+        if not self.migrar_desde or not self.migrar_desde.exists():
+            return
+        if con.execute("SELECT 1 FROM productos LIMIT 1").fetchone() or \
+                con.execute("SELECT valor FROM meta WHERE clave = 'migrado'").fetchone():
+            return
+        origen = AlmacenamientoJSON(self.migrar_desde, diario=True)
+        filas, dinero_vendido, registros = origen.cargar()
+        origen.cerrar()
+        productos = {f[0]: f for f in filas}
+        for reg in registros:
+            productos.update((f[0], fila_completa(f)) for f in reg.get("filas", ()))
+            for id in reg.get("borrar", ()):
+                productos.pop(id, None)
+            dinero_vendido += reg.get("monto", 0)
+        con.execute("BEGIN")
+        cambio = self._nuevo_cambio(con)
+        con.executemany(self.SQL_GUARDAR_FILA, [(*fila_completa(f), cambio) for f in productos.values()])
+        con.execute("UPDATE meta SET valor = ? WHERE clave = 'dinero_vendido'", (dinero_vendido,))
+        con.execute("INSERT INTO meta VALUES ('migrado', ?)", (str(self.migrar_desde),))
+        con.execute("COMMIT")
+        print(f"Migrados {len(productos)} productos desde {self.migrar_desde.name}")
+
+    def cargar(self):
+        try:
+            con = self._conexion()
+            self._migrar(con)
+            con.execute("BEGIN")  # Filas y contadores de un mismo instante
+            try:
+                filas = [list(f) for f in con.execute(self.SQL_FILAS + " ORDER BY id")]
+                self._dinero = dinero_vendido = self._meta(con, "dinero_vendido")
+                self._cambio = self._meta(con, "cambio")
+                self._version = con.execute("PRAGMA data_version").fetchone()[0]
+            finally:
+                con.execute("COMMIT")
+            return filas, dinero_vendido, []
+        except Exception as e:  # Como en el JSON: mejor no abrir que partir de un catálogo vacío
+            raise ValueError(f"Error al cargar datos de {self.ruta}: {e}") from e
+
+    def bloquear(self):
+        self.candado.adquirir()
+
+    def desbloquear(self):
+        self.candado.liberar()
+
+    def hay_cambios_ajenos(self):
+        """Sin candado: data_version cambia cuando otra conexión confirma algo."""
+        return self._conexion().execute("PRAGMA data_version").fetchone()[0] != self._version
+
+    def cambios_ajenos(self):
+        """Con el candado tomado: si data_version indica que otra conexión ha confirmado algo,
+        un registro con las filas de cambio posterior al último visto, los ids borrados desde
+        entonces y la diferencia de dinero, como lo que el JSON lee de su diario. Si otro
+        proceso ha reescrito la tabla (guardar) después, se relee entera."""
+        con = self._conexion()
+        if con.execute("PRAGMA data_version").fetchone()[0] == self._version:
+            return None, []
+        con.execute("BEGIN")
+        try:
+            if self._cambio < self._meta(con, "purgado"):
+                con.execute("COMMIT")
+                filas, dinero_vendido, _ = self.cargar()
+                return (filas, dinero_vendido), []
+            filas = [list(f) for f in con.execute(self.SQL_FILAS + " WHERE cambio > ? ORDER BY id", (self._cambio,))]
+            borrar = [id for id, in con.execute("SELECT id FROM borrados WHERE cambio > ?", (self._cambio,))]
+            dinero_vendido = self._meta(con, "dinero_vendido")
+            self._cambio = self._meta(con, "cambio")
+            self._version = con.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            if con.in_transaction:
+                con.execute("COMMIT")
+        monto, self._dinero = dinero_vendido - self._dinero, dinero_vendido
+        return None, [{"filas": filas, "borrar": borrar, "monto": monto}] if filas or borrar or monto else []
+
+    def registrar(self, registros):
+        """Aplica los registros en una sola transacción tocando solo las filas afectadas."""
+        con = self._conexion()
+        try:
+            con.execute("BEGIN")
+            cambio = self._nuevo_cambio(con)
+            for reg in registros:
+                if reg.get("filas"):
+                    con.executemany(self.SQL_GUARDAR_FILA, [(*fila_completa(f), cambio) for f in reg["filas"]])
+                if reg.get("borrar"):
+                    con.executemany(self.SQL_BORRAR_FILA, [(id,) for id in reg["borrar"]])
+                    con.executemany(self.SQL_ANOTAR_BORRADO, [(id, cambio) for id in reg["borrar"]])
+                if reg.get("monto"):
+                    con.execute(self.SQL_SUMAR_DINERO, (reg["monto"],))
+            con.execute("COMMIT")
+            # Lo escrito ya está en memoria (en modo compartido se sincroniza antes de escribir)
+            self._cambio = cambio
+            self._dinero += sum(reg.get("monto", 0) for reg in registros)
+            self.bytes_escritos += sum(sum(map(_bytes_fila, reg.get("filas", ()))) + 8 * len(reg.get("borrar", ()))
+                                       for reg in registros)
+        except Exception as e:
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            print(f"Error al guardar datos: {e}")
+
+    def guardar(self, productos, dinero_vendido, proximo_id):
+        """Reescribe la tabla completa; solo se usa para volcados explícitos."""
+        con = self._conexion()
+        try:
+            con.execute("BEGIN")
+            cambio = self._nuevo_cambio(con)
+            con.execute("DELETE FROM productos")
+            con.execute("DELETE FROM borrados")
+            filas = [p.to_fila() for p in productos]
+            con.executemany(self.SQL_GUARDAR_FILA, [(*f, cambio) for f in filas])
+            con.execute("UPDATE meta SET valor = ? WHERE clave = 'dinero_vendido'", (dinero_vendido,))
+            con.execute("UPDATE meta SET valor = ? WHERE clave = 'purgado'", (cambio,))
+            con.execute("COMMIT")
+            self._cambio, self._dinero = cambio, dinero_vendido
+            self.bytes_escritos += sum(map(_bytes_fila, filas))
+            return True
+        except Exception as e:
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            print(f"Error al guardar datos: {e}")
+            return False
+
+    def necesita_compactar(self, al_cerrar=False):
+        return False
+
+    def cerrar(self):
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+        self.candado.cerrar()
+
+
+# Cabecera de la instantánea binaria: firma, versión, reservado, nº de productos, generación,
+# próximo id, dinero vendido, valor total, unidades, bytes de la tabla de nombres, CRC32 del cuerpo
+CABECERA_BINARIA = struct.Struct("<4sHHQqqddqQI4x")
+FIRMA_BINARIA = b"ALMB"
+VERSION_BINARIA = 2  # La 2 añade la columna de puntos de reorden; la 1 se sigue pudiendo leer
+
+
+class TablaBinaria:
+    """Vista de solo lectura, mediante mmap, de una instantánea binaria.
+
+    Tras la cabecera van columnas de ancho fijo (orden de bytes nativo) con los productos
+    ordenados por id: ids (int64), precios (float64), precios originales (float64),
+    cantidades (int64), puntos de reorden (int64, desde la versión 2), desplazamientos de
+    nombres (uint64, n+1) y la tabla de nombres UTF-8. Abrirla solo valida cabecera y
+    checksum: las filas se leen cuando se piden."""
+
+    perezosa = True  # El Almacen la recorre bajo demanda en lugar de crear todos los productos
+
+    def __init__(self, ruta):
+        self._archivo = open(ruta, 'rb')
+        self._mm = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (firma, version, _, n, self.generacion, self.proximo_id, self.dinero_vendido,
+             self.valor_total, self.unidades, bytes_nombres, crc) = CABECERA_BINARIA.unpack_from(self._mm)
+            if firma != FIRMA_BINARIA or version not in (1, VERSION_BINARIA):
+                raise ValueError(f"{ruta}: no es una instantánea binaria v{VERSION_BINARIA}")
+            self._vista = vista = memoryview(self._mm)
+            base = CABECERA_BINARIA.size
+            columnas = 4 if version == 1 else 5  # Columnas de 8 bytes antes de los desplazamientos
+            if zlib.crc32(vista[base:]) != crc or len(vista) != base + 8 * (columnas + 1) * n + 8 + bytes_nombres:
+                raise ValueError(f"{ruta}: checksum incorrecto, instantánea dañada")
+            self.n = n
+            self.ids = vista[base:base + 8*n].cast("q")
+            self.precios = vista[base + 8*n:base + 16*n].cast("d")
+            self.originales = vista[base + 16*n:base + 24*n].cast("d")
+            self.cantidades = vista[base + 24*n:base + 32*n].cast("q")
+            self.puntos = vista[base + 32*n:base + 40*n].cast("q") if version > 1 else None
+            base += 8 * columnas * n
+            self._desplazamientos = vista[base:base + 8*n + 8].cast("Q")
+            self._nombres = vista[base + 8*n + 8:]
+        except Exception:
+            self.cerrar()
+            raise
+
+    def __len__(self):
+        return self.n
+
+    def posicion(self, id):
+        """Nº de fila de un id (búsqueda binaria sobre la columna ordenada) o None."""
+        i = bisect.bisect_left(self.ids, id)
+        return i if i < self.n and self.ids[i] == id else None
+
+    def nombre(self, i):
+        return bytes(self._nombres[self._desplazamientos[i]:self._desplazamientos[i + 1]]).decode("utf-8")
+
+    def punto_reorden(self, i):
+        return self.puntos[i] if self.puntos is not None else PUNTO_REORDEN
+
+    def fila(self, i):
+        return [self.ids[i], self.nombre(i), self.precios[i], self.originales[i], self.cantidades[i],
+                self.punto_reorden(i)]
+
+    def __getitem__(self, i):
+        return self.fila(i)
+
+    def __iter__(self):
+        return (self.fila(i) for i in range(self.n))
+
+    def cerrar(self):
+        for campo in ("ids", "precios", "originales", "cantidades", "puntos", "_desplazamientos", "_nombres", "_vista"):
+            vista = self.__dict__.pop(campo, None)
+            if vista is not None:
+                vista.release()
+        if self._mm is not None:
+            self._mm.close()
+            self._archivo.close()
+            self._mm = None
+
+
+def escribir_instantanea_binaria(ruta, productos, dinero_vendido, proximo_id, generacion):
+    """Escribe una instantánea binaria (temporal + renombrado) con cabecera y CRC32 del cuerpo.
+    Devuelve los bytes escritos."""
+    productos = sorted(productos, key=lambda p: p.id)
+    nombres = [p.nombre.encode("utf-8") for p in productos]
+    desplazamientos = array("Q", [0])
+    for nombre in nombres:
+        desplazamientos.append(desplazamientos[-1] + len(nombre))
+    bloques = [array("q", [p.id for p in productos]).tobytes(),
+               array("d", [p.precio for p in productos]).tobytes(),
+               array("d", [p.precio_original for p in productos]).tobytes(),
+               array("q", [p.cantidad for p in productos]).tobytes(),
+               array("q", [p.punto_reorden for p in productos]).tobytes(),
+               desplazamientos.tobytes(), b"".join(nombres)]
+    crc = 0
+    for bloque in bloques:
+        crc = zlib.crc32(bloque, crc)
+    cabecera = CABECERA_BINARIA.pack(FIRMA_BINARIA, VERSION_BINARIA, 0, len(productos), generacion, proximo_id,
+                                     dinero_vendido, sum(p.precio * p.cantidad for p in productos),
+                                     sum(p.cantidad for p in productos), desplazamientos[-1], crc)
+    temporal = Path(ruta).with_name(Path(ruta).name + ".tmp")
+    with open(temporal, 'wb') as f:
+        f.write(cabecera)
+        for bloque in bloques:
+            f.write(bloque)
+        f.flush()
+        os.fsync(f.fileno())
+        escritos = f.tell()
+    reemplazar_atomico(temporal, ruta)
+    return escritos
+
+
+class AlmacenamientoBinario(AlmacenamientoJSON):
+    """Instantánea binaria compacta (abierta con mmap) más el diario de operaciones.
+    Comparte el diario con el modo "diario"; si aún no existe el .bin, la primera carga
+    parte del JSON y la siguiente compactación ya escribe el formato binario."""
+
+    def __init__(self, archivo, compactar_cada=None):
+        archivo = Path(archivo)
+        super().__init__(archivo.with_suffix(".json"), diario=True, compactar_cada=compactar_cada)
+        self.archivo_binario = archivo.with_suffix(".bin")
+        self.modo = "binario"
+        self._tabla = None
+
+    def _ruta_instantanea(self):
+        return self.archivo_binario if self.archivo_binario.exists() else self.archivo
+
+    def _leer_instantanea(self):
+        if not self.archivo_binario.exists():
+            return super()._leer_instantanea()  # Migración desde el JSON
+        self._tabla = TablaBinaria(self.archivo_binario)
+        self.generacion = self._tabla.generacion
+        return self._tabla, self._tabla.dinero_vendido
+
+    def _escribir_instantanea(self, productos, dinero_vendido, proximo_id):
+        self.bytes_escritos += escribir_instantanea_binaria(self.archivo_binario, productos, dinero_vendido,
+                                                            proximo_id, self.generacion)
+
+
+class EscritorSegundoPlano:
+    """Envuelve otro backend y hace sus escrituras en un hilo aparte, para que quien
+    modifica el almacén (la GUI) no espere nunca al disco.
+
+    Los registros que llegan durante una ráfaga se escriben juntos en una sola llamada, y
+    una instantánea nueva descarta lo que quedara pendiente de antes (ya va incluido en
+    ella). vaciar() espera a que todo esté en disco; se ejecuta también al salir del
+    programa (atexit).
+
+    En el modo compartido del Almacen, el candado del archivo no se suelta al acabar la
+    operación sino cuando el hilo ha escrito todo lo pendiente: los demás procesos no
+    pueden leer ni escribir hasta que los cambios están en disco, y las operaciones de
+    una ráfaga encuentran el candado ya tomado y no tienen nada que sincronizar."""
+
+    def __init__(self, backend, espera=0.05):
+        self.backend = backend
+        self.modo, self.incremental = backend.modo, backend.incremental
+        self.espera = espera  # Segundos que se deja crecer una ráfaga antes de escribirla
+        self.error = False  # La última escritura falló (los backends ya informan del motivo)
+        self._cola = []  # [("registrar", registros) | ("guardar", (productos, dinero, proximo_id))]
+        self._en_curso = None  # Lote que el hilo está escribiendo ahora mismo
+        self._con_prisa = 0  # Llamadas a vaciar() esperando: se escribe sin acumular
+        self._cerrado = False
+        self._secciones = 0  # Secciones compartidas del Almacen en curso (bloquear/desbloquear)
+        self._candado_tomado = False  # Este proceso tiene el candado del archivo
+        self._recien_tomado = False  # Tomado tras soltarlo: puede haber cambios ajenos
+        self._condicion = threading.Condition()
+        self._hilo = threading.Thread(target=self._trabajar, name="escritor-almacen", daemon=True)
+        self._hilo.start()
+        atexit.register(self.vaciar)
+
+    @property
+    def bytes_escritos(self):
+        return self.backend.bytes_escritos
+
+    @property
+    def guardando(self):
+        """True mientras haya cambios aún no escritos en disco."""
+        return bool(self._cola) or self._en_curso is not None
+
+    def _trabajar(self):
+        while True:
+            with self._condicion:
+                while not self._cola and not self._cerrado:
+                    self._condicion.wait()
+                if not self._cola:
+                    return
+                limite = time.monotonic() + self.espera
+                while not self._con_prisa and (resto := limite - time.monotonic()) > 0:
+                    self._condicion.wait(resto)
+                lote, self._cola = self._cola, []
+                self._en_curso = lote
+            error = False
+            for tipo, datos in lote:
+                try:
+                    if tipo == "guardar":
+                        error = not self.backend.guardar(*datos)
+                    else:
+                        self.backend.registrar(datos)
+                except Exception as e:
+                    print(f"Error al guardar datos en segundo plano: {e}")
+                    error = True
+            with self._condicion:
+                self.error = error
+                self._en_curso = None
+                self._soltar_si_libre()
+                self._condicion.notify_all()
+
+    def _pendiente(self, tipo):
+        lotes = self._cola + (self._en_curso or [])
+        return any(t == tipo for t, _ in lotes)
+
+    def cargar(self):
+        self.vaciar()
+        self._recien_tomado = False  # Lo que se carga ya incluye lo escrito por los demás
+        return self.backend.cargar()
+
+    def bloquear(self):
+        with self._condicion:
+            self._secciones += 1
+            if self._candado_tomado:  # Aún quedaban escrituras: nadie ha podido escribir después
+                return
+        self.backend.bloquear()
+        with self._condicion:
+            self._candado_tomado = self._recien_tomado = True
+
+    def desbloquear(self):
+        with self._condicion:
+            self._secciones -= 1
+            self._soltar_si_libre()
+
+    def _soltar_si_libre(self):
+        """Suelta el candado del archivo si no lo usa ninguna sección ni queda nada por
+        escribir (con la condición tomada)."""
+        if self._candado_tomado and not self._secciones and not self._cola and self._en_curso is None:
+            self._candado_tomado = False
+            self.backend.desbloquear()
+
+    def hay_cambios_ajenos(self):
+        with self._condicion:
+            if self._candado_tomado:
+                return False
+        return self.backend.hay_cambios_ajenos()
+
+    def cambios_ajenos(self):
+        """Solo si el candado se acaba de tomar: mientras no se suelta no escribe nadie más."""
+        if not self._recien_tomado:
+            return None, []
+        self._recien_tomado = False
+        self.vaciar()
+        return self.backend.cambios_ajenos()
+
+    def registrar(self, registros):
+        with self._condicion:
+            if self._cola and self._cola[-1][0] == "registrar":
+                self._cola[-1][1].extend(registros)
+            else:
+                self._cola.append(("registrar", list(registros)))
+            self._condicion.notify_all()
+
+    def guardar(self, productos, dinero_vendido, proximo_id):
+        """Encola la instantánea con una copia de los productos, que siguen cambiando."""
+        copia = [copy.copy(p) for p in productos]
+        with self._condicion:
+            self._cola = [("guardar", (copia, dinero_vendido, proximo_id))]
+            self._condicion.notify_all()
+        return True
+
+    def necesita_compactar(self, al_cerrar=False):
+        if al_cerrar:
+            self.vaciar()  # Los contadores del backend solo reflejan lo ya escrito
+        with self._condicion:
+            if self._pendiente("guardar"):
+                return False
+        return self.backend.necesita_compactar(al_cerrar)
+
+    def vaciar(self):
+        """Bloquea hasta que todo lo encolado esté escrito."""
+        with self._condicion:
+            self._con_prisa += 1
+            self._condicion.notify_all()
+            try:
+                while (self._cola or self._en_curso) and self._hilo.is_alive():
+                    self._condicion.wait()
+            finally:
+                self._con_prisa -= 1
+
+    def cerrar(self):
+        self.vaciar()
+        with self._condicion:
+            self._cerrado = True
+            self._condicion.notify_all()
+        self._hilo.join()
+        atexit.unregister(self.vaciar)
+        self.backend.cerrar()
+
+
+def crear_almacenamiento(modo, archivo):
+    """Crea el backend para un modo: "completo" y "diario" usan el JSON; "sqlite" una base
+    .db junto a él que migra automáticamente el JSON existente la primera vez; "binario"
+    una instantánea .bin de arranque rápido más el diario."""
+    if modo not in MODOS:
+        raise ValueError(f"Modo de persistencia desconocido: {modo}")
+    archivo = Path(archivo)
+    if modo == "binario":
+        return AlmacenamientoBinario(archivo)
+    if modo == "sqlite":
+        ruta = archivo if archivo.suffix == ".db" else archivo.with_suffix(".db")
+        return AlmacenamientoSQLite(ruta, migrar_desde=ruta.with_suffix(".json"))
+    return AlmacenamientoJSON(archivo, diario=(modo == "diario"))
@@ -0,0 +1,167 @@
+# ============================================================================
+# BENCHMARK - Rendimiento del Almacen con catálogos sintéticos
+# ============================================================================
+# Genera catálogos de 1k, 100k y 1M productos (reproducibles con --semilla) y
+# mide tiempo de carga y de guardado, rendimiento y percentiles de latencia de
+# las operaciones principales y el pico de memoria. Cada tamaño se ejecuta en
+# un proceso aparte para que el pico de memoria de uno no contamine al otro.
+# El resultado se escribe en JSON; con --comparar se contrasta con una ejecución
+# anterior y se marcan (y salen con código 1) las regresiones.
+#
+# Uso:  python benchmark.py [--tamanos 1000 100000] [--modo diario] [--salida r.json]
+#                           [--comparar anterior.json] [--tolerancia 0.10]
+import argparse, json, multiprocessing, platform, random, subprocess, sys, tempfile, time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from almacen import Almacen, Producto
+from almacenamiento import MODOS, crear_almacenamiento
+
+try:
+    import resource  # Solo en sistemas Unix
+except ImportError:
+    resource = None
+
+TAMANOS = (1_000, 100_000, 1_000_000)
+
+# Palabras con las que se forman los nombres sintéticos ("tornillo acero 123")
+PALABRAS = ("tornillo", "tuerca", "cable", "monitor", "teclado", "raton", "lampara", "silla", "mesa",
+            "cargador", "bateria", "altavoz", "cuaderno", "boligrafo", "mochila", "adaptador")
+MATERIALES = ("acero", "madera", "plastico", "aluminio", "cobre", "vidrio", "goma", "textil")
+
+# Métricas en las que un valor mayor es peor (en el resto, ops_s, es mejor)
+MAYOR_ES_PEOR = ("carga_s", "guardado_s", "memoria_pico_mb", "p50_us", "p90_us", "p99_us")
+
+# Diferencia de latencia (µs) por debajo de la cual no se marca regresión: es ruido de medida
+RUIDO_US = 1.0
+
+
+def generar_catalogo(archivo, modo, n, semilla):
+    """Escribe directamente en el backend un catálogo sintético de n productos."""
+    rng = random.Random(semilla)
+    productos = [Producto(i, f"{rng.choice(PALABRAS)} {rng.choice(MATERIALES)} {i}",
+                          round(rng.uniform(0.5, 500), 2), rng.randint(1_000, 100_000)) for i in range(1, n + 1)]
+    backend = crear_almacenamiento(modo, archivo)
+    backend.guardar(productos, 0.0, n + 1)
+    backend.cerrar()
+    return [p.nombre for p in productos]
+
+
+def _percentil(ordenadas, p):
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))]
+
+
+def medir(funcion, argumentos):
+    """Llama a funcion(*args) por cada args y resume el rendimiento y la latencia."""
+    latencias = []
+    inicio = time.perf_counter()
+    for args in argumentos:
+        t = time.perf_counter_ns()
+        funcion(*args)
+        latencias.append(time.perf_counter_ns() - t)
+    total = time.perf_counter() - inicio
+    latencias.sort()
+    return {"ops_s": round(len(latencias) / total, 1),
+            **{f"p{int(p * 100)}_us": round(_percentil(latencias, p) / 1000, 2) for p in (0.5, 0.9, 0.99)},
+            "max_us": round(latencias[-1] / 1000, 2)}
+
+
+def ejecutar_tamano(n, modo, operaciones, semilla):
+    """Benchmark completo de un tamaño (se ejecuta en su propio proceso)."""
+    with tempfile.TemporaryDirectory() as carpeta:
+        archivo = Path(carpeta) / "almacen_bench.json"
+        nombres = generar_catalogo(archivo, modo, n, semilla)
+        inicio = time.perf_counter()
+        almacen = Almacen(archivo, modo=modo)
+        carga = time.perf_counter() - inicio
+
+        rng = random.Random(semilla + 1)
+        ids = [(rng.randint(1, n),) for _ in range(operaciones)]
+        resultados = {"operaciones": {
+            "buscar_por_id": medir(almacen.buscar_por_id, ids),
+            "buscar_por_nombre": medir(almacen.buscar_por_nombre, [(nombres[rng.randrange(n)],) for _ in range(operaciones)]),
+            "vender": medir(almacen.vender, [(id, 1) for id, in ids]),
+            "aplicar_descuento": medir(almacen.aplicar_descuento, [(id, rng.choice((5, 10, 25))) for id, in ids]),
+            "valor_total_almacen": medir(almacen.valor_total_almacen, [()] * operaciones),
+        }}
+        inicio = time.perf_counter()
+        almacen.guardar_datos()
+        resultados["guardado_s"] = round(time.perf_counter() - inicio, 4)
+        resultados["carga_s"] = round(carga, 4)
+        almacen.cerrar()
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        resultados["memoria_pico_mb"] = round(pico / (2**20 if sys.platform == "darwin" else 2**10), 1)
+    return resultados
+
+
+def _version():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, anterior, tolerancia):
+    """Lista de regresiones (tamaño, métrica, antes, ahora, cambio relativo) por encima de la tolerancia."""
+    regresiones = []
+    for tamano, datos in actual["resultados"].items():
+        previos = anterior.get("resultados", {}).get(tamano)
+        if not previos:
+            continue
+        pares = [(m, datos.get(m), previos.get(m)) for m in ("carga_s", "guardado_s", "memoria_pico_mb")]
+        for op, metricas in datos["operaciones"].items():
+            pares += [(f"{op}.{m}", v, previos["operaciones"].get(op, {}).get(m)) for m, v in metricas.items()]
+        for metrica, ahora, antes in pares:
+            if ahora is None or not antes:
+                continue
+            cambio = (ahora - antes) / antes
+            peor = cambio if metrica.rsplit(".", 1)[-1] in MAYOR_ES_PEOR else -cambio
+            if metrica.endswith("max_us") or (metrica.endswith("_us") and abs(ahora - antes) < RUIDO_US):
+                continue  # El máximo y las diferencias submicrosegundo son ruido
+            if peor > tolerancia:
+                regresiones.append((tamano, metrica, antes, ahora, cambio))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del almacén con catálogos sintéticos")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS))
+    parser.add_argument("--modo", choices=MODOS, default="diario")
+    parser.add_argument("--operaciones", type=int, default=2000, help="Llamadas medidas por operación")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", default="benchmark_resultados.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Empeoramiento relativo admitido")
+    args = parser.parse_args()
+
+    informe = {"version": _version(), "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+               "python": platform.python_version(), "plataforma": platform.platform(), "modo": args.modo,
+               "semilla": args.semilla, "operaciones": args.operaciones, "resultados": {}}
+    contexto = multiprocessing.get_context("spawn")
+    for n in args.tamanos:
+        print(f"▶ {n:,} productos...", flush=True)
+        with contexto.Pool(1) as pool:
+            datos = pool.apply(ejecutar_tamano, (n, args.modo, args.operaciones, args.semilla))
+        informe["resultados"][str(n)] = datos
+        print(f"  carga {datos['carga_s']:.3f}s | guardado {datos['guardado_s']:.3f}s | "
+              f"memoria {datos.get('memoria_pico_mb', '?')} MB")
+        for op, m in datos["operaciones"].items():
+            print(f"  {op:<20} {m['ops_s']:>12,.0f} ops/s  p50 {m['p50_us']:>9.2f}µs  p99 {m['p99_us']:>9.2f}µs")
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=4, ensure_ascii=False)
+    print(f"✓ Resultados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            regresiones = comparar(informe, json.load(f), args.tolerancia)
+        for tamano, metrica, antes, ahora, cambio in regresiones:
+            print(f"✗ REGRESIÓN {tamano}: {metrica} {antes} -> {ahora} ({cambio:+.1%})")
+        if regresiones:
+            sys.exit(1)
+        print(f"✓ Sin regresiones respecto a {args.comparar}")
+
+
+if __name__ == "__main__":
+    main()
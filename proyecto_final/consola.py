@@ -0,0 +1,171 @@
+# ============================================================================
+# CONSOLA - Operaciones del almacén desde la terminal, sin interfaz gráfica
+# ============================================================================
+# Pensada para scripts y tareas programadas: solo importa la lógica de negocio
+# (almacen.py), nunca tkinter, y al terminar deja el diario sin compactar para
+# que cada orden cueste lo mínimo (se compacta solo al llegar a COMPACTAR_CADA
+# registros). Sale con código 0 si la operación tiene éxito y 1 si no. Abre el
+# almacén en modo compartido, así puede ejecutarse con la GUI abierta.
+#
+# Uso:  python -m consola [--archivo datos.json] [--modo diario] ORDEN ...
+#   vender ID CANTIDAD [ID CANTIDAD ...]  una venta, o un pedido atómico con varias líneas
+#   reponer ID CANTIDAD                   suma stock (resta si la cantidad es negativa)
+#   reorden [ID PUNTO] [--limite N]       lista lo que hay que reponer, o fija el punto de reorden
+#   buscar TEXTO [--limite N] [--aproximada] | buscar --id ID
+#   reporte [filtros] [--orden COL] [--desc] [--pagina N]
+#   exportar RUTA [filtros] [--orden COL] [--desc] [--formato csv|jsonl|texto]
+# Filtros: --patron, --id-desde, --id-hasta, --precio-min, --precio-max, --stock-min, --stock-max
+import argparse, sys
+
+from almacen import ARCHIVO_DATOS, MODOS, Almacen
+
+# Argumentos de la línea de órdenes que se pasan tal cual a Almacen.filtrar
+FILTROS = ("patron", "id_desde", "id_hasta", "precio_min", "precio_max", "stock_min", "stock_max")
+
+# Columnas por las que se puede ordenar (las de reportes.COLUMNAS_REPORTE, sin importar
+# reportes hasta que hace falta)
+COLUMNAS = ("id", "nombre", "precio", "cantidad", "valor")
+
+
+def _filtros(args):
+    return {clave: getattr(args, clave) for clave in FILTROS if getattr(args, clave) is not None}
+
+
+def _reporte(almacen, args):
+    from reportes import Reporte
+    return Reporte(almacen, args.orden, args.desc, **_filtros(args))
+
+
+# ---------------------------------------------------------------------- órdenes
+def vender(almacen, args):
+    if len(args.lineas) % 2:
+        return "✗ Cada venta necesita un ID y una CANTIDAD"
+    pedido = list(zip(args.lineas[::2], args.lineas[1::2]))
+    ok, msg, _ = almacen.vender(*pedido[0]) if len(pedido) == 1 else almacen.vender_lote(pedido)
+    return msg
+
+
+def reponer(almacen, args):
+    return almacen.actualizar_stock(args.id, args.cantidad)
+
+
+def reorden(almacen, args):
+    if args.id is not None:
+        if args.punto is None:
+            return "✗ Indica el ID y el PUNTO de reorden"
+        return almacen.fijar_punto_reorden(args.id, args.punto)
+    urgentes = almacen.productos_a_reponer(args.limite)
+    for p in urgentes:
+        print(f"{p}  (punto de reorden: {p.punto_reorden})")
+    return f"✓ {len(urgentes)} producto(s) a reponer" if urgentes else "✓ Nada que reponer"
+
+
+def buscar(almacen, args):
+    if args.id is not None:
+        encontrados = [p for p in (almacen.buscar_por_id(args.id),) if p]
+    elif args.texto and args.aproximada:
+        similares = almacen.buscar_similares(args.texto, args.limite or 10)
+        for p, similitud in similares:
+            print(f"{p}  ({similitud:.0%})")
+        return f"✓ {len(similares)} parecido(s)" if similares else "✗ Sin resultados"
+    elif args.texto:
+        encontrados = almacen.buscar_por_nombre(args.texto, args.limite)
+    else:
+        return "✗ Indica un texto o --id"
+    for p in encontrados:
+        print(p)
+    return f"✓ {len(encontrados)} producto(s)" if encontrados else "✗ Sin resultados"
+
+
+def reporte(almacen, args):
+    from reportes import ANCHO_TEXTO, CABECERA_TEXTO, linea_texto
+    consulta = _reporte(almacen, args)
+    filas = consulta.filas() if args.pagina is None else consulta.pagina(args.pagina - 1)
+    print(CABECERA_TEXTO)
+    print("-" * ANCHO_TEXTO)
+    n, valor = 0, 0
+    for fila in filas:
+        print(linea_texto(fila))
+        n += 1
+        valor += fila[4]
+    print("=" * ANCHO_TEXTO)
+    if args.pagina is not None:
+        return f"✓ Página {args.pagina}/{consulta.paginas()}: {n} producto(s) | ${valor:,.2f}"
+    return f"✓ TOTAL: {n} producto(s) | ${valor:,.2f} | Ganado: ${almacen.dinero_vendido:,.2f}"
+
+
+def exportar(almacen, args):
+    _, msg = _reporte(almacen, args).exportar(args.ruta, args.formato)
+    return msg
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(prog="python -m consola", description="Gestión del almacén desde la terminal")
+    parser.add_argument("--archivo", default=str(ARCHIVO_DATOS), help="Archivo de datos del almacén")
+    parser.add_argument("--modo", choices=MODOS, default="diario")
+    ordenes = parser.add_subparsers(dest="orden", required=True)
+
+    p = ordenes.add_parser("vender", help="Vende uno o varios productos (pedido atómico)")
+    p.add_argument("lineas", type=int, nargs="+", metavar="ID CANTIDAD")
+    p.set_defaults(funcion=vender)
+
+    p = ordenes.add_parser("reponer", help="Suma (o resta) stock a un producto")
+    p.add_argument("id", type=int)
+    p.add_argument("cantidad", type=int)
+    p.set_defaults(funcion=reponer)
+
+    p = ordenes.add_parser("reorden", help="Productos a reponer (o fija el punto de reorden de uno)")
+    p.add_argument("id", type=int, nargs="?")
+    p.add_argument("punto", type=int, nargs="?")
+    p.add_argument("--limite", type=int)
+    p.set_defaults(funcion=reorden)
+
+    p = ordenes.add_parser("buscar", help="Busca productos por nombre o por ID")
+    p.add_argument("texto", nargs="?")
+    p.add_argument("--id", type=int)
+    p.add_argument("--limite", type=int)
+    p.add_argument("--aproximada", action="store_true", help="Ordena por parecido y tolera erratas")
+    p.set_defaults(funcion=buscar)
+
+    for nombre, funcion, ayuda in (("reporte", reporte, "Muestra el inventario en columnas"),
+                                   ("exportar", exportar, "Exporta el inventario a CSV, JSON Lines o texto")):
+        p = ordenes.add_parser(nombre, help=ayuda)
+        if nombre == "exportar":
+            p.add_argument("ruta")
+            p.add_argument("--formato", choices=("csv", "jsonl", "texto"))
+        else:
+            p.add_argument("--pagina", type=int, help="Página de 50 filas (desde 1)")
+        p.add_argument("--orden", choices=COLUMNAS)
+        p.add_argument("--desc", action="store_true", help="Orden descendente")
+        p.add_argument("--patron", help="Texto o comodines (*, ?) sobre el nombre")
+        p.add_argument("--id-desde", type=int)
+        p.add_argument("--id-hasta", type=int)
+        p.add_argument("--precio-min", type=float)
+        p.add_argument("--precio-max", type=float)
+        p.add_argument("--stock-min", type=int)
+        p.add_argument("--stock-max", type=int)
+        p.set_defaults(funcion=funcion)
+    return parser.parse_args()
+
+
+def main():
+    args = _argumentos()
+    libro = None
+    if args.orden == "vender":  # Como en la GUI, cada venta se anota en el libro de ventas
+        from ventas import LibroVentas
+        libro = LibroVentas(args.archivo)
+    try:
+        almacen = Almacen(args.archivo, modo=args.modo, libro_ventas=libro, compartido=True)
+    except ValueError as e:  # Datos dañados: mejor no tocarlos
+        print(f"✗ {e}")
+        return 1
+    try:
+        msg = args.funcion(almacen, args)
+    finally:
+        almacen.cerrar(compactar=False)
+    print(msg)
+    return 0 if msg.startswith("✓") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
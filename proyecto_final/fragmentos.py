@@ -0,0 +1,322 @@
+# ============================================================================
+# ALMACÉN FRAGMENTADO - Productos repartidos por id entre varios procesos
+# ============================================================================
+# Cada fragmento es un proceso con su propio Almacen y su propio archivo
+# (almacen_datos_frag0.json, _frag1...). El producto con id X vive en el
+# fragmento X % N. El enrutador tiene la misma interfaz que Almacen: las
+# operaciones de un producto van a su fragmento y las del catálogo entero
+# (totales, búsquedas, filtros, reportes) se envían a todos a la vez y se
+# combinan. Los ids los asigna el enrutador para que sean únicos globalmente.
+import heapq, multiprocessing, threading
+from itertools import islice
+from pathlib import Path
+
+from almacen import ARCHIVO_DATOS, MODOS, UMBRAL_SIMILITUD, Almacen, orden_similar
+
+
+# ---------------------------------------------------------------------- proceso de cada fragmento
+def _crear_con_id(almacen, id, nombre, precio, cantidad):
+    with almacen._bloquear():
+        almacen.proximo_id = id
+        return almacen.crear_producto(nombre, precio, cantidad)
+
+
+def _crear_con_ids(almacen, filas):
+    """Alta masiva con los ids que asigna el enrutador (consecutivos en el total, no dentro
+    del fragmento) y una sola escritura. Devuelve los ids creados."""
+    creados = []
+    with almacen._bloquear(), almacen.persistencia_agrupada():
+        for id, nombre, precio, cantidad in filas:
+            almacen.proximo_id = id
+            if almacen.crear_producto(nombre, precio, cantidad)[0]:
+                creados.append(id)
+    return creados
+
+
+def _validar_lote(almacen, pedido):
+    """Primera fase de vender_lote: comprueba sin modificar nada (el enrutador mantiene
+    bloqueado el fragmento hasta la segunda fase). Devuelve (id, mensaje) del primer
+    error o None."""
+    for id, cantidad in pedido.items():
+        prod = almacen.buscar_por_id(id)
+        if not prod:
+            return (id, f"✗ Producto {id} no encontrado")
+        if prod.cantidad < cantidad:
+            return (id, f"✗ Stock insuficiente de {prod.nombre}: {prod.cantidad} < {cantidad}")
+    return None
+
+
+def _importar(almacen, filas, dinero_vendido):
+    with almacen._bloquear():
+        almacen._aplicar_registro({"filas": filas, "monto": dinero_vendido})
+        almacen.compactar()
+
+
+# Operaciones que no son una llamada directa a un método del Almacen
+OPERACIONES_FRAGMENTO = {
+    "crear_con_id": _crear_con_id,
+    "crear_con_ids": _crear_con_ids,
+    "nombres_existentes": lambda a, nombres: [n for n in nombres if a.existe_nombre(n)],
+    "validar_lote": _validar_lote,
+    "importar": _importar,
+    "filtrar": lambda a, **filtros: list(a.filtrar(**filtros)),
+    "productos": lambda a: list(a.productos),
+    "dinero_vendido": lambda a: a.dinero_vendido,
+    "proximo_id": lambda a: a.proximo_id,
+}
+
+
+def _trabajador(conexion, archivo, modo):
+    """Bucle del proceso de un fragmento: recibe (operación, args, kwargs) y responde
+    (True, resultado) o (False, excepción)."""
+    almacen = Almacen(archivo, modo=modo)
+    while True:
+        operacion, args, kwargs = conexion.recv()
+        try:
+            funcion = OPERACIONES_FRAGMENTO.get(operacion)
+            if funcion:
+                resultado = funcion(almacen, *args, **kwargs)
+            else:
+                resultado = getattr(almacen, operacion)(*args, **kwargs)
+            conexion.send((True, resultado))
+        except Exception as e:
+            conexion.send((False, e))
+        if operacion == "cerrar":
+            conexion.close()
+            return
+
+
+# ---------------------------------------------------------------------- enrutador
+class AlmacenFragmentado:
+    """Enrutador con la interfaz de Almacen sobre N procesos fragmento.
+
+    Cada fragmento tiene su candado en el enrutador: las llamadas a fragmentos distintos
+    avanzan en paralelo, y las que abarcan varios los toman en orden ascendente. Los
+    productos devueltos son copias. Si aún no existen los archivos de los fragmentos y sí
+    el JSON del almacén sin fragmentar, sus productos se reparten al arrancar."""
+
+    MODOS = MODOS
+
+    def __init__(self, fragmentos=4, archivo=None, modo="diario"):
+        archivo = Path(archivo or ARCHIVO_DATOS)
+        rutas = [archivo.with_name(f"{archivo.stem}_frag{i}{archivo.suffix}") for i in range(fragmentos)]
+        repartir = archivo.exists() and not any(r.exists() or r.with_suffix(".db").exists() or
+                                               r.with_suffix(".bin").exists() for r in rutas)
+        self.modo = modo
+        contexto = multiprocessing.get_context("spawn")
+        self._conexiones, self._procesos = [], []
+        for ruta in rutas:
+            nuestra, suya = contexto.Pipe()
+            proceso = contexto.Process(target=_trabajador, args=(suya, str(ruta), modo), daemon=True)
+            proceso.start()
+            suya.close()
+            self._conexiones.append(nuestra)
+            self._procesos.append(proceso)
+        self._candados = [threading.Lock() for _ in rutas]
+        self._candado_crear = threading.Lock()  # Serializa altas: ids y nombres únicos globalmente
+        if repartir:
+            self._repartir(archivo)
+        self.proximo_id = max(self._todos("proximo_id"))
+
+    def _repartir(self, archivo):
+        origen = Almacen(archivo)
+        filas = [[] for _ in self._conexiones]
+        for p in origen.productos:
+            filas[self._fragmento(p.id)].append(p.to_fila())
+        self._todos("importar", lambda i: (filas[i], origen.dinero_vendido if i == 0 else 0))
+        origen.cerrar()
+
+    def _fragmento(self, id):
+        return id % len(self._conexiones)
+
+    def _responder(self, i):
+        ok, resultado = self._conexiones[i].recv()
+        if not ok:
+            raise resultado
+        return resultado
+
+    def _llamar(self, id, operacion, *args):
+        """Ejecuta una operación en el fragmento dueño de un id."""
+        i = self._fragmento(id)
+        with self._candados[i]:
+            self._conexiones[i].send((operacion, args, {}))
+            return self._responder(i)
+
+    def _todos(self, operacion, args=(), kwargs=None):
+        """Envía la operación a todos los fragmentos a la vez y devuelve sus respuestas en
+        orden. args es una tupla común o una función índice -> tupla."""
+        for c in self._candados:
+            c.acquire()
+        try:
+            for i, conexion in enumerate(self._conexiones):
+                conexion.send((operacion, args(i) if callable(args) else args, kwargs or {}))
+            return [self._responder(i) for i in range(len(self._conexiones))]
+        finally:
+            for c in reversed(self._candados):
+                c.release()
+
+    # ------------------------------------------------------------------ operaciones de un producto
+    def crear_producto(self, nombre, precio, cantidad):
+        with self._candado_crear:
+            if nombre and any(self._todos("existe_nombre", (nombre,))):
+                return (False, "✗ Datos inválidos o producto existente")
+            id = self.proximo_id
+            ok, msg = self._llamar(id, "crear_con_id", id, nombre, precio, cantidad)
+            if ok:
+                self.proximo_id += 1
+            return (ok, msg)
+
+    def crear_productos(self, datos):
+        """Como Almacen.crear_productos: el enrutador valida y asigna ids consecutivos, y cada
+        fragmento crea los suyos de una vez. Devuelve (ids creados, [(posición, motivo)])."""
+        datos = list(datos)
+        with self._candado_crear:
+            nombres = [d[0] for d in datos if d[0]]
+            existentes = {n.casefold() for parcial in self._todos("nombres_existentes", (nombres,)) for n in parcial}
+            partes, rechazados = [[] for _ in self._conexiones], []
+            id = self.proximo_id
+            for i, (nombre, precio, cantidad) in enumerate(datos):
+                if not nombre or precio <= 0 or cantidad < 0:
+                    rechazados.append((i, "✗ Datos inválidos"))
+                elif nombre.casefold() in existentes:  # También detecta repetidos dentro del lote
+                    rechazados.append((i, "✗ Producto existente"))
+                else:
+                    existentes.add(nombre.casefold())
+                    partes[self._fragmento(id)].append((id, nombre, precio, cantidad))
+                    id += 1
+            self.proximo_id = id
+            creados = sorted(id for parcial in self._todos("crear_con_ids", lambda i: (partes[i],)) for id in parcial)
+        return (creados, rechazados)
+
+    def buscar_por_id(self, id):
+        return self._llamar(id, "buscar_por_id", id)
+
+    def vender(self, id, cantidad):
+        return self._llamar(id, "vender", id, cantidad)
+
+    def actualizar_stock(self, id, cantidad):
+        return self._llamar(id, "actualizar_stock", id, cantidad)
+
+    def aplicar_descuento(self, id, porcentaje):
+        return self._llamar(id, "aplicar_descuento", id, porcentaje)
+
+    def resetear_descuento(self, id):
+        return self._llamar(id, "resetear_descuento", id)
+
+    def eliminar_producto(self, id):
+        return self._llamar(id, "eliminar_producto", id)
+
+    def fijar_punto_reorden(self, id, punto):
+        return self._llamar(id, "fijar_punto_reorden", id, punto)
+
+    def vender_lote(self, lineas):
+        """Pedido atómico entre fragmentos en dos fases: con los fragmentos implicados
+        bloqueados, primero todos validan su parte y solo si ninguna falla se aplica."""
+        pedido = {}
+        for id, cantidad in lineas:
+            if cantidad <= 0:
+                return (False, f"✗ Cantidad inválida para ID {id}", 0)
+            pedido[id] = pedido.get(id, 0) + cantidad
+        if not pedido:
+            return (False, "✗ Pedido vacío", 0)
+        partes = {}
+        for id, cantidad in pedido.items():
+            partes.setdefault(self._fragmento(id), {})[id] = cantidad
+        implicados = sorted(partes)
+        for i in implicados:
+            self._candados[i].acquire()
+        try:
+            for i in implicados:
+                self._conexiones[i].send(("validar_lote", (partes[i],), {}))
+            errores = dict(e for e in (self._responder(i) for i in implicados) if e)
+            if errores:  # Se informa del primero en el orden del pedido, como en Almacen
+                return (False, errores[next(id for id in pedido if id in errores)], 0)
+            for i in implicados:
+                self._conexiones[i].send(("vender_lote", (list(partes[i].items()),), {}))
+            total = sum(self._responder(i)[2] for i in implicados)
+        finally:
+            for i in reversed(implicados):
+                self._candados[i].release()
+        return (True, f"✓ Pedido: {len(pedido)} producto(s), {sum(pedido.values())} unidades = ${total:.2f}", total)
+
+    # ------------------------------------------------------------------ consultas sobre todo el catálogo
+    @property
+    def dinero_vendido(self):
+        return sum(self._todos("dinero_vendido"))
+
+    @property
+    def productos(self):
+        return list(heapq.merge(*self._todos("productos"), key=lambda p: p.id))
+
+    def existe_nombre(self, nombre):
+        return any(self._todos("existe_nombre", (nombre,)))
+
+    def valor_total_almacen(self):
+        return sum(self._todos("valor_total_almacen"))
+
+    def unidades_totales(self):
+        return sum(self._todos("unidades_totales"))
+
+    def cantidad_productos(self):
+        return sum(self._todos("cantidad_productos"))
+
+    def listar_productos(self):
+        productos = self.productos
+        return "El almacén está vacío" if not productos else "\n--- INVENTARIO ---\n" + "\n".join(str(p) for p in productos)
+
+    def buscar_por_nombre(self, nombre, limite=None):
+        encontrados = heapq.merge(*self._todos("buscar_por_nombre", (nombre, limite)), key=lambda p: p.id)
+        return list(encontrados)[:limite] if limite is not None else list(encontrados)
+
+    def buscar_similares(self, texto, k=10, umbral=UMBRAL_SIMILITUD):
+        """Los k mejores de todos los fragmentos: la similitud solo depende del nombre, así que
+        basta con combinar los k mejores de cada uno."""
+        return heapq.nlargest(k, (r for parcial in self._todos("buscar_similares", (texto, k, umbral))
+                                  for r in parcial), key=lambda r: orden_similar(*r))
+
+    def productos_a_reponer(self, limite=None):
+        """Cada fragmento devuelve ya ordenada su lista de reposición: se mezclan por urgencia.
+        El aviso al cruzar el umbral (al_cruzar_umbral) no atraviesa los procesos."""
+        urgentes = heapq.merge(*self._todos("productos_a_reponer", (limite,)),
+                               key=lambda p: (p.cantidad - p.punto_reorden, p.id))
+        return list(urgentes)[:limite] if limite is not None else list(urgentes)
+
+    def por_rango(self, campo, minimo=None, maximo=None, desde=0, limite=None, descendente=False):
+        """Como Almacen.por_rango: cada fragmento devuelve ordenados sus desde + limite primeros
+        y se mezclan por (clave, id)."""
+        hasta = None if limite is None else desde + limite
+        clave = (lambda p: (p.precio * p.cantidad, p.id)) if campo == "valor" else \
+            (lambda p: (getattr(p, campo), p.id))
+        ordenados = heapq.merge(*self._todos("por_rango", (campo, minimo, maximo, 0, hasta, descendente)),
+                                key=clave, reverse=descendente)
+        return list(islice(ordenados, desde, hasta))
+
+    def contar_rango(self, campo, minimo=None, maximo=None):
+        return sum(self._todos("contar_rango", (campo, minimo, maximo)))
+
+    def mas_valiosos(self, n=10):
+        return self.por_rango("valor", limite=n, descendente=True)
+
+    def filtrar(self, **filtros):
+        """Como Almacen.filtrar (los fragmentos filtran en paralelo); genera copias en orden de id."""
+        yield from heapq.merge(*self._todos("filtrar", (), filtros), key=lambda p: p.id)
+
+    def aplicar_descuento_masivo(self, porcentaje, **filtros):
+        if not 0 <= porcentaje <= 100:
+            return (0, "✗ Porcentaje inválido")
+        n = sum(r[0] for r in self._todos("aplicar_descuento_masivo", (porcentaje,), filtros))
+        return (n, f"✓ Descuento del {porcentaje:g}% aplicado a {n} producto(s)")
+
+    def resetear_descuento_masivo(self, **filtros):
+        n = sum(r[0] for r in self._todos("resetear_descuento_masivo", (), filtros))
+        return (n, f"✓ Descuento removido de {n} producto(s)")
+
+    def compactar(self):
+        """Compacta cada fragmento. Como Almacen.compactar, no devuelve nada."""
+        self._todos("compactar")
+
+    def cerrar(self):
+        """Cierra cada fragmento (que compacta su diario) y espera a que terminen sus procesos."""
+        self._todos("cerrar")
+        for proceso in self._procesos:
+            proceso.join()
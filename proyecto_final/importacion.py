@@ -0,0 +1,208 @@
+# ============================================================================
+# IMPORTACIÓN - Alta masiva de productos desde CSV o JSON Lines
+# ============================================================================
+# El archivo se lee por bloques (nunca entero en memoria) y cada bloque se valida
+# en un proceso aparte mientras se lee el siguiente. Las filas válidas se depuran
+# contra el índice de nombres del almacén y contra las ya vistas en el archivo, y
+# al final se crean todas con Almacen.crear_productos: ids consecutivos y una
+# sola escritura. Las filas rechazadas se escriben, con su línea y el motivo y en
+# el orden del archivo, en un informe CSV (por defecto catalogo_rechazadas.csv
+# junto al archivo importado).
+#
+# Uso:  python importacion.py catalogo.csv [--modo diario] [--archivo datos.json]
+#                             [--procesos 4] [--bloque 10000] [--informe r.csv]
+import argparse, csv, json, math, os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from almacen import ARCHIVO_DATOS, MODOS, Almacen
+
+# Columnas obligatorias (cabecera del CSV o claves de cada objeto JSON)
+COLUMNAS_IMPORTACION = ("nombre", "precio", "cantidad")
+
+# Extensión de archivo -> formato de importación
+FORMATOS_IMPORTACION = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+# Filas que se validan juntas en un proceso
+TAM_BLOQUE = 10_000
+
+
+def _precio(valor):
+    if isinstance(valor, bool):
+        raise ValueError
+    precio = float(valor)
+    if not math.isfinite(precio) or precio <= 0:
+        raise ValueError
+    return precio
+
+
+def _cantidad(valor):
+    if isinstance(valor, bool):
+        raise ValueError
+    if isinstance(valor, float):
+        if not valor.is_integer():
+            raise ValueError
+        valor = int(valor)
+    cantidad = int(valor)
+    if cantidad < 0:
+        raise ValueError
+    return cantidad
+
+
+def validar_bloque(bloque, formato):
+    """Valida un bloque [(línea, datos)]: datos es la lista de campos de una fila CSV (en
+    el orden de COLUMNAS_IMPORTACION) o el texto de una línea JSON. Devuelve (válidas
+    [(línea, nombre, precio, cantidad)], rechazadas [(línea, motivo, datos)])."""
+    validas, rechazadas = [], []
+    for linea, datos in bloque:
+        if formato == "jsonl":
+            try:
+                objeto = json.loads(datos)
+            except ValueError as e:
+                rechazadas.append((linea, f"✗ JSON inválido: {e}", datos))
+                continue
+            if not isinstance(objeto, dict):
+                rechazadas.append((linea, "✗ La línea no es un objeto JSON", datos))
+                continue
+            nombre, precio, cantidad = (objeto.get(c) for c in COLUMNAS_IMPORTACION)
+        else:
+            nombre, precio, cantidad = datos
+        nombre = nombre.strip() if isinstance(nombre, str) else ""
+        if not nombre:
+            rechazadas.append((linea, "✗ Nombre vacío", datos))
+            continue
+        try:
+            precio = _precio(precio)
+        except (TypeError, ValueError):
+            rechazadas.append((linea, f"✗ Precio inválido: {precio!r}", datos))
+            continue
+        try:
+            cantidad = _cantidad(cantidad)
+        except (TypeError, ValueError):
+            rechazadas.append((linea, f"✗ Cantidad inválida: {cantidad!r}", datos))
+            continue
+        validas.append((linea, nombre, precio, cantidad))
+    return validas, rechazadas
+
+
+def leer_bloques(ruta, formato, tam_bloque=TAM_BLOQUE):
+    """Genera bloques de hasta tam_bloque filas sin validar [(línea, datos)]. En CSV la
+    cabecera indica dónde está cada columna; si falta alguna se lanza ValueError."""
+    with open(ruta, 'r', encoding='utf-8-sig', newline='') as f:
+        if formato == "jsonl":
+            filas = ((n, texto) for n, texto in enumerate(f, 1) if texto.strip())
+        else:
+            lector = csv.reader(f)
+            cabecera = [c.strip().casefold() for c in next(lector, [])]
+            faltan = [c for c in COLUMNAS_IMPORTACION if c not in cabecera]
+            if faltan:
+                raise ValueError(f"Faltan columnas en la cabecera: {', '.join(faltan)}")
+            posiciones = [cabecera.index(c) for c in COLUMNAS_IMPORTACION]
+            filas = ((lector.line_num, [campos[i] if i < len(campos) else None for i in posiciones])
+                     for campos in lector if campos)
+        while bloque := list(islice(filas, tam_bloque)):
+            yield bloque
+
+
+def _validados(bloques, formato, procesos):
+    """Resultados de validar_bloque en el orden de lectura. Con varios procesos se
+    mantienen como mucho 2 bloques por proceso en vuelo, así la memoria no crece con
+    el tamaño del archivo."""
+    primero = next(bloques, None)
+    if primero is None:
+        return
+    segundo = next(bloques, None)
+    if segundo is None or procesos <= 1:  # Un solo bloque: no compensa arrancar procesos
+        yield validar_bloque(primero, formato)
+        if segundo is not None:
+            yield validar_bloque(segundo, formato)
+            for bloque in bloques:
+                yield validar_bloque(bloque, formato)
+        return
+    with ProcessPoolExecutor(procesos) as pool:
+        en_vuelo = deque([pool.submit(validar_bloque, primero, formato), pool.submit(validar_bloque, segundo, formato)])
+        for bloque in bloques:
+            if len(en_vuelo) >= 2 * procesos:
+                yield en_vuelo.popleft().result()
+            en_vuelo.append(pool.submit(validar_bloque, bloque, formato))
+        while en_vuelo:
+            yield en_vuelo.popleft().result()
+
+
+def importar(almacen, ruta, formato=None, procesos=None, tam_bloque=TAM_BLOQUE, informe=None):
+    """Importa los productos de un CSV o JSON Lines (formato por defecto según la extensión).
+    Devuelve (nº de creados, nº de rechazados, mensaje)."""
+    ruta = Path(ruta)
+    formato = formato or FORMATOS_IMPORTACION.get(ruta.suffix.lower())
+    if formato not in FORMATOS_IMPORTACION.values():
+        return (0, 0, f"✗ Formato desconocido: {formato or ruta.suffix}")
+    informe = Path(informe) if informe else ruta.with_name(f"{ruta.stem}_rechazadas.csv")
+    procesos = procesos if procesos is not None else os.cpu_count() or 1
+
+    aceptadas, vistos, rechazadas = [], {}, []
+    def rechazar(linea, motivo, datos):
+        rechazadas.append((linea, motivo, datos if isinstance(datos, str) else json.dumps(datos, ensure_ascii=False)))
+
+    ids, error = [], None
+    try:
+        for validas, invalidas in _validados(leer_bloques(ruta, formato, tam_bloque), formato, procesos):
+            for linea, motivo, datos in invalidas:
+                rechazar(linea, motivo, datos.rstrip("\n") if isinstance(datos, str) else datos)
+            for linea, nombre, precio, cantidad in validas:
+                clave = nombre.casefold()
+                if clave in vistos:
+                    rechazar(linea, f"✗ Nombre repetido en el archivo (línea {vistos[clave]})", [nombre, precio, cantidad])
+                elif almacen.existe_nombre(nombre):
+                    rechazar(linea, "✗ Producto existente", [nombre, precio, cantidad])
+                else:
+                    vistos[clave] = linea
+                    aceptadas.append((linea, nombre, precio, cantidad))
+        ids, fallidas = almacen.crear_productos([fila[1:] for fila in aceptadas])
+        for posicion, motivo in fallidas:  # Solo si otro hilo creó el nombre entretanto
+            linea, nombre, precio, cantidad = aceptadas[posicion]
+            rechazar(linea, motivo, [nombre, precio, cantidad])
+    except (OSError, ValueError) as e:
+        error = e
+    if rechazadas:  # El informe solo se crea si hay algo que rechazar
+        # Los repetidos se detectan después de validar su bloque: se ordenan por línea
+        rechazadas.sort(key=lambda r: r[0])
+        try:
+            with open(informe, 'w', encoding='utf-8', newline='') as f:
+                escritor = csv.writer(f)
+                escritor.writerow(("linea", "motivo", "datos"))
+                escritor.writerows(rechazadas)
+        except OSError as e:
+            error = error or e
+    if error:
+        return (len(ids), len(rechazadas), f"✗ Error al importar {ruta.name}: {error}")
+    msg = f"✓ {len(ids)} producto(s) importados de {ruta.name}"
+    if rechazadas:
+        msg += f"; {len(rechazadas)} rechazado(s), detalle en {informe.name}"
+    return (len(ids), len(rechazadas), msg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa productos en bloque desde CSV o JSON Lines")
+    parser.add_argument("ruta", help="Archivo .csv o .jsonl con columnas nombre, precio y cantidad")
+    parser.add_argument("--archivo", default=str(ARCHIVO_DATOS), help="Archivo de datos del almacén")
+    parser.add_argument("--modo", choices=MODOS, default="diario")
+    parser.add_argument("--formato", choices=sorted(set(FORMATOS_IMPORTACION.values())))
+    parser.add_argument("--procesos", type=int, help="Procesos de validación (por defecto, uno por CPU)")
+    parser.add_argument("--bloque", type=int, default=TAM_BLOQUE, help="Filas por bloque")
+    parser.add_argument("--informe", help="CSV de filas rechazadas")
+    args = parser.parse_args()
+
+    almacen = Almacen(args.archivo, modo=args.modo, compartido=True)  # Puede ejecutarse con la GUI abierta
+    try:
+        _, _, msg = importar(almacen, args.ruta, args.formato, args.procesos, args.bloque, args.informe)
+    finally:
+        almacen.cerrar()
+    print(msg)
+    if msg.startswith("✗"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
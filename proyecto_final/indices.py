@@ -0,0 +1,215 @@
+# ============================================================================
+# ÍNDICES ORDENADOS - Precio, stock y valor de cada producto, siempre ordenados
+# ============================================================================
+# Cada índice es una lista ordenada de pares (clave, id) partida en bloques: se
+# inserta y se borra con bisect sobre el máximo de cada bloque y luego dentro
+# del bloque, sin desplazar millones de elementos. Un árbol de Fenwick con el
+# tamaño de los bloques da la posición global de un par y localiza la posición
+# n-ésima en O(log n), así una página de un rango (desde, limite) cuesta
+# O(log n + k) en lugar de recorrer y ordenar el catálogo.
+#
+# El Almacen los construye la primera vez que se consultan (Almacen.por_rango) y
+# desde entonces los mantiene en cada cambio de precio o de stock.
+from bisect import bisect_left, bisect_right, insort
+from math import inf
+
+# Campos indexados: precio, stock y valor del stock (precio · cantidad)
+CAMPOS_INDICE = ("precio", "cantidad", "valor")
+
+# Elementos por bloque al construir; un bloque se parte en dos al llegar al doble
+TAM_BLOQUE = 512
+
+
+def claves(precio, cantidad):
+    """Clave de un producto en cada índice, en el orden de CAMPOS_INDICE. Un precio NaN (que
+    el almacén admite) no es igual ni menor que nada y bisect no lo volvería a encontrar: en
+    los índices cuenta como +inf."""
+    valor = precio * cantidad
+    return (inf if precio != precio else precio, cantidad, inf if valor != valor else valor)
+
+
+class ListaOrdenada:
+    """Pares (clave, id) ordenados, en bloques de como mucho 2·TAM_BLOQUE elementos.
+    Los pares son únicos (el id desempata), así que quitar siempre encuentra el suyo."""
+
+    def __init__(self, pares=()):
+        """pares debe venir ya ordenado."""
+        pares = list(pares)
+        self._bloques = [pares[i:i + TAM_BLOQUE] for i in range(0, len(pares), TAM_BLOQUE)]
+        self._maximos = [b[-1] for b in self._bloques]
+        self._n = len(pares)
+        self._reconstruir_arbol()
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        for bloque in self._bloques:
+            yield from bloque
+
+    # ------------------------------------------------------------------ árbol de Fenwick
+    def _reconstruir_arbol(self):
+        """Árbol de Fenwick (1-indexado) con el tamaño de cada bloque, construido en O(bloques)."""
+        arbol = [0] + [len(b) for b in self._bloques]
+        for i in range(1, len(arbol)):
+            padre = i + (i & -i)
+            if padre < len(arbol):
+                arbol[padre] += arbol[i]
+        self._arbol = arbol
+
+    def _sumar(self, bloque, delta):
+        arbol, i, n = self._arbol, bloque + 1, len(self._arbol)
+        while i < n:
+            arbol[i] += delta
+            i += i & -i
+
+    def _antes_del_bloque(self, bloque):
+        """Nº de elementos en los bloques anteriores a uno."""
+        total, i = 0, bloque
+        while i > 0:
+            total += self._arbol[i]
+            i -= i & -i
+        return total
+
+    def _localizar(self, posicion):
+        """(bloque, desplazamiento) de la posición global indicada (0 <= posicion < n)."""
+        bloque, paso = 0, 1 << (len(self._arbol) - 1).bit_length()
+        while paso:
+            siguiente = bloque + paso
+            if siguiente < len(self._arbol) and self._arbol[siguiente] <= posicion:
+                bloque = siguiente
+                posicion -= self._arbol[siguiente]
+            paso >>= 1
+        return bloque, posicion
+
+    # ------------------------------------------------------------------ cambios
+    def anadir(self, par):
+        if not self._bloques:
+            self._bloques, self._maximos, self._n = [[par]], [par], 1
+            self._reconstruir_arbol()
+            return
+        i = min(bisect_left(self._maximos, par), len(self._bloques) - 1)
+        bloque = self._bloques[i]
+        insort(bloque, par)
+        self._maximos[i] = bloque[-1]
+        self._n += 1
+        if len(bloque) >= 2 * TAM_BLOQUE:  # Partir el bloque: cambia la forma del árbol
+            self._bloques[i:i + 1] = [bloque[:TAM_BLOQUE], bloque[TAM_BLOQUE:]]
+            self._maximos[i:i + 1] = [bloque[TAM_BLOQUE - 1], bloque[-1]]
+            self._reconstruir_arbol()
+        else:
+            self._sumar(i, 1)
+
+    def quitar(self, par):
+        i = bisect_left(self._maximos, par)
+        bloque = self._bloques[i] if i < len(self._bloques) else []
+        j = bisect_left(bloque, par)
+        if j == len(bloque) or bloque[j] != par:
+            raise KeyError(par)
+        del bloque[j]
+        self._n -= 1
+        if bloque:
+            self._maximos[i] = bloque[-1]
+            self._sumar(i, -1)
+        else:
+            del self._bloques[i], self._maximos[i]
+            self._reconstruir_arbol()
+
+    # ------------------------------------------------------------------ consultas
+    def posicion(self, par, derecha=False):
+        """Posición global donde se insertaría el par (bisect_left, o bisect_right con derecha)."""
+        buscar = bisect_right if derecha else bisect_left
+        i = buscar(self._maximos, par)
+        if i == len(self._bloques):
+            return self._n
+        return self._antes_del_bloque(i) + buscar(self._bloques[i], par)
+
+    def rango(self, minimo=None, maximo=None):
+        """Posiciones [inicio, fin) de las claves entre minimo y maximo, ambos incluidos."""
+        inicio = 0 if minimo is None else self.posicion((minimo,))
+        fin = self._n if maximo is None else self.posicion((maximo, inf), derecha=True)
+        return inicio, max(inicio, fin)
+
+    def entre(self, inicio, fin, descendente=False):
+        """Genera los pares de las posiciones [inicio, fin), de fin hacia atrás si descendente."""
+        inicio, fin = max(inicio, 0), min(fin, self._n)
+        if inicio >= fin:
+            return
+        if descendente:
+            bloque, j = self._localizar(fin - 1)
+            quedan = fin - inicio
+            while quedan:
+                parte = self._bloques[bloque][max(0, j + 1 - quedan):j + 1]
+                yield from reversed(parte)
+                quedan -= len(parte)
+                bloque -= 1
+                j = len(self._bloques[bloque]) - 1 if bloque >= 0 else 0
+        else:
+            bloque, j = self._localizar(inicio)
+            quedan = fin - inicio
+            while quedan:
+                parte = self._bloques[bloque][j:j + quedan]
+                yield from parte
+                quedan -= len(parte)
+                bloque, j = bloque + 1, 0
+
+
+class IndicesOrdenados:
+    """Los índices de CAMPOS_INDICE de un catálogo, con pares (clave, id)."""
+
+    def __init__(self, valores):
+        """valores: iterable de (id, precio, cantidad) de todos los productos."""
+        pares = [[] for _ in CAMPOS_INDICE]
+        for id, precio, cantidad in valores:
+            for lista, clave in zip(pares, claves(precio, cantidad)):
+                lista.append((clave, id))
+        self._listas = {campo: ListaOrdenada(sorted(lista)) for campo, lista in zip(CAMPOS_INDICE, pares)}
+
+    def lista(self, campo):
+        if campo not in self._listas:
+            raise ValueError(f"Campo sin índice: {campo}")
+        return self._listas[campo]
+
+    def anadir(self, id, precio, cantidad):
+        for lista, clave in zip(self._listas.values(), claves(precio, cantidad)):
+            lista.anadir((clave, id))
+
+    def quitar(self, id, precio, cantidad):
+        for lista, clave in zip(self._listas.values(), claves(precio, cantidad)):
+            lista.quitar((clave, id))
+
+    def mover(self, id, antes, despues):
+        """Recoloca un producto que pasa de (precio, cantidad) antes a despues; solo toca los
+        índices cuya clave cambia (una venta no mueve el de precio). Si falla, deshace lo
+        hecho: los índices quedan como antes."""
+        hechos = []
+        try:
+            for lista, vieja, nueva in zip(self._listas.values(), claves(*antes), claves(*despues)):
+                if vieja != nueva:
+                    lista.quitar((vieja, id))
+                    hechos.append((lista.anadir, (vieja, id)))
+                    lista.anadir((nueva, id))
+                    hechos.append((lista.quitar, (nueva, id)))
+        except Exception:
+            for deshacer, par in reversed(hechos):
+                deshacer(par)
+            raise
+
+    def contar(self, campo, minimo=None, maximo=None):
+        inicio, fin = self.lista(campo).rango(minimo, maximo)
+        return fin - inicio
+
+    def ids(self, campo, minimo=None, maximo=None, desde=0, limite=None, descendente=False):
+        """Ids con la clave entre minimo y maximo, en orden de (clave, id) (o el inverso), a
+        partir del desde-ésimo y como mucho limite."""
+        lista = self.lista(campo)
+        inicio, fin = lista.rango(minimo, maximo)
+        if descendente:
+            fin -= desde
+            if limite is not None:
+                inicio = max(inicio, fin - limite)
+        else:
+            inicio += desde
+            if limite is not None:
+                fin = min(fin, inicio + limite)
+        return [id for _, id in lista.entre(inicio, fin, descendente)]
@@ -0,0 +1,140 @@
+# ============================================================================
+# INSTRUMENTACIÓN - Contadores, errores e histogramas de latencia del Almacen
+# ============================================================================
+# Es opcional: Almacen(..., instrumentacion=Instrumentacion()) envuelve en esa
+# instancia cada método público, más guardar/registrar del backend. Sin ella no
+# se envuelve nada y el coste es nulo. Como se envuelve la instancia, también
+# cuentan las llamadas internas (vender llama a buscar_por_id). Los datos se
+# consultan con instantanea() o se vuelcan en formato de texto de Prometheus con
+# exportar_prometheus(ruta).
+import inspect, os, threading, time
+from bisect import bisect_left
+
+# Límites superiores (segundos) de las cubetas del histograma de latencia
+LIMITES_S = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Métodos públicos que no se envuelven: generadores y gestores de contexto, cuya
+# llamada solo crea el objeto y no mediría el trabajo real
+SIN_INSTRUMENTAR = ("filtrar", "persistencia_agrupada")
+
+
+def _fallo(resultado):
+    """Las operaciones del Almacen informan de un fallo de negocio con ✗ o (False, ...)."""
+    if isinstance(resultado, str):
+        return resultado.startswith("✗")
+    return isinstance(resultado, tuple) and bool(resultado) and resultado[0] is False
+
+
+class _Metrica:
+    __slots__ = ("llamadas", "errores", "fallos", "segundos", "cubetas")
+
+    def __init__(self):
+        self.llamadas = self.errores = self.fallos = 0
+        self.segundos = 0.0
+        self.cubetas = [0] * (len(LIMITES_S) + 1)  # La última es +Inf
+
+
+class Instrumentacion:
+    """Métricas de llamadas a un Almacen: por método, nº de llamadas, excepciones (errores),
+    fallos de negocio (✗), tiempo total e histograma de latencia; por tipo de escritura del
+    backend, nº de escrituras y bytes escritos."""
+
+    def __init__(self):
+        self._metricas = {}  # nombre del método -> _Metrica
+        self._escrituras = {}  # "guardar" | "registrar" -> [veces, bytes]
+        self._candado = threading.Lock()
+
+    def _anotar(self, nombre, segundos, error=False, fallo=False):
+        with self._candado:
+            m = self._metricas.get(nombre)
+            if m is None:
+                m = self._metricas[nombre] = _Metrica()
+            m.llamadas += 1
+            m.errores += error
+            m.fallos += fallo
+            m.segundos += segundos
+            m.cubetas[bisect_left(LIMITES_S, segundos)] += 1
+
+    def _medir(self, nombre, funcion):
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                resultado = funcion(*args, **kwargs)
+            except BaseException:
+                self._anotar(nombre, time.perf_counter() - inicio, error=True)
+                raise
+            self._anotar(nombre, time.perf_counter() - inicio, fallo=_fallo(resultado))
+            return resultado
+        medida.__wrapped__ = funcion
+        return medida
+
+    def _medir_escritura(self, backend, tipo, funcion):
+        def medida(*args, **kwargs):
+            antes = backend.bytes_escritos
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                with self._candado:
+                    contador = self._escrituras.setdefault(tipo, [0, 0])
+                    contador[0] += 1
+                    contador[1] += backend.bytes_escritos - antes
+        return self._medir(f"almacenamiento.{tipo}", medida)
+
+    def envolver(self, almacen):
+        """Sustituye, solo en esta instancia, sus métodos públicos por versiones medidas.
+        Con un EscritorSegundoPlano se mide el backend real, que es el que escribe."""
+        for nombre, funcion in inspect.getmembers(type(almacen), inspect.isfunction):
+            if nombre.startswith("_") or nombre in SIN_INSTRUMENTAR or inspect.isgeneratorfunction(funcion):
+                continue
+            setattr(almacen, nombre, self._medir(nombre, getattr(almacen, nombre)))
+        backend = getattr(almacen.almacenamiento, "backend", almacen.almacenamiento)
+        for tipo in ("guardar", "registrar"):
+            if hasattr(backend, tipo):
+                setattr(backend, tipo, self._medir_escritura(backend, tipo, getattr(backend, tipo)))
+        return almacen
+
+    def instantanea(self):
+        """Copia de todas las métricas como diccionarios (histograma acumulado por límite)."""
+        with self._candado:
+            metodos = {}
+            for nombre, m in sorted(self._metricas.items()):
+                acumulado, histograma = 0, {}
+                for limite, n in zip(LIMITES_S + (float("inf"),), m.cubetas):
+                    acumulado += n
+                    histograma[limite] = acumulado
+                metodos[nombre] = {"llamadas": m.llamadas, "errores": m.errores, "fallos": m.fallos,
+                                   "segundos": m.segundos, "histograma": histograma}
+            escrituras = {tipo: {"veces": veces, "bytes": n} for tipo, (veces, n) in sorted(self._escrituras.items())}
+        return {"metodos": metodos, "escrituras": escrituras}
+
+    def texto_prometheus(self):
+        datos = self.instantanea()
+        lineas = []
+        def familia(nombre, tipo, ayuda):
+            lineas.extend([f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"])
+        familia("almacen_llamadas_total", "counter", "Llamadas a cada método del almacén")
+        lineas += [f'almacen_llamadas_total{{metodo="{n}"}} {m["llamadas"]}' for n, m in datos["metodos"].items()]
+        familia("almacen_errores_total", "counter", "Llamadas que terminaron con una excepción")
+        lineas += [f'almacen_errores_total{{metodo="{n}"}} {m["errores"]}' for n, m in datos["metodos"].items()]
+        familia("almacen_fallos_total", "counter", "Llamadas rechazadas por la lógica de negocio (✗)")
+        lineas += [f'almacen_fallos_total{{metodo="{n}"}} {m["fallos"]}' for n, m in datos["metodos"].items()]
+        familia("almacen_duracion_segundos", "histogram", "Latencia de cada método del almacén")
+        for n, m in datos["metodos"].items():
+            for limite, acumulado in m["histograma"].items():
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                lineas.append(f'almacen_duracion_segundos_bucket{{metodo="{n}",le="{le}"}} {acumulado}')
+            lineas.append(f'almacen_duracion_segundos_sum{{metodo="{n}"}} {m["segundos"]!r}')
+            lineas.append(f'almacen_duracion_segundos_count{{metodo="{n}"}} {m["llamadas"]}')
+        familia("almacen_escrituras_total", "counter", "Escrituras del backend de persistencia")
+        lineas += [f'almacen_escrituras_total{{tipo="{t}"}} {e["veces"]}' for t, e in datos["escrituras"].items()]
+        familia("almacen_bytes_escritos_total", "counter", "Bytes escritos por el backend de persistencia")
+        lineas += [f'almacen_bytes_escritos_total{{tipo="{t}"}} {e["bytes"]}' for t, e in datos["escrituras"].items()]
+        return "\n".join(lineas) + "\n"
+
+    def exportar_prometheus(self, ruta):
+        """Escribe las métricas en formato de texto de Prometheus (temporal + renombrado, para
+        que un recolector nunca lea el archivo a medias)."""
+        temporal = f"{ruta}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(self.texto_prometheus())
+        os.replace(temporal, ruta)
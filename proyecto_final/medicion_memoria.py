@@ -0,0 +1,69 @@
+# ============================================================================
+# MEDICIÓN DE MEMORIA - Bytes por producto con y sin __slots__
+# ============================================================================
+# Compara el Producto actual (con __slots__) con el original (atributos en un
+# __dict__ por instancia) y el pico de memoria al guardar la instantánea JSON
+# con json.dump sobre diccionarios frente al volcado por filas.
+#
+# Uso:  python medicion_memoria.py [nº de productos, por defecto 1000000]
+import json, os, sys, tracemalloc
+
+from almacenamiento import escribir_instantanea_json
+from almacen import Producto
+
+
+class ProductoConDict:
+    """Producto tal como era antes de __slots__, solo para comparar."""
+
+    def __init__(self, id, nombre, precio, cantidad):
+        self.id = id
+        self.nombre = nombre
+        self.precio = precio
+        self.precio_original = precio
+        self.cantidad = cantidad
+
+    def to_dict(self):
+        return {"id": self.id, "nombre": self.nombre, "precio": self.precio, "cantidad": self.cantidad, "precio_original": self.precio_original}
+
+
+def medir_objetos(clase, nombres):
+    """Bytes asignados por producto al crear uno por nombre (los nombres ya existen y no cuentan)."""
+    tracemalloc.start()
+    productos = [clase(i, nombre, 1.5 + i % 7, i % 50) for i, nombre in enumerate(nombres, 1)]
+    usado = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return usado / len(nombres), productos
+
+
+def medir_guardado(productos, por_filas):
+    """Pico de memoria adicional al escribir la instantánea JSON (a os.devnull)."""
+    tracemalloc.start()
+    with open(os.devnull, 'w', encoding='utf-8') as f:
+        if por_filas:
+            escribir_instantanea_json(f, productos, 0.0, len(productos) + 1, 0)
+        else:
+            json.dump({"productos": [p.to_dict() for p in productos], "proximo_id": len(productos) + 1,
+                       "dinero_vendido": 0.0, "generacion": 0}, f, indent=4, ensure_ascii=False)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return pico
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    nombres = [f"producto {i}" for i in range(1, n + 1)]
+    print(f"{n:,} productos")
+
+    antes, productos = medir_objetos(ProductoConDict, nombres)
+    pico_antes = medir_guardado(productos, por_filas=False)
+    del productos
+    despues, productos = medir_objetos(Producto, nombres)
+    pico_despues = medir_guardado(productos, por_filas=True)
+
+    print(f"{'':24}{'antes':>12}{'después':>12}")
+    print(f"{'bytes por producto':24}{antes:12.1f}{despues:12.1f}")
+    print(f"{'pico al guardar (MB)':24}{pico_antes / 2**20:12.1f}{pico_despues / 2**20:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# ============================================================================
+# REPORTES - Generación por flujo, paginada y exportable del estado del almacén
+# ============================================================================
+# Las filas se generan una a una a partir de Almacen.filtrar y se escriben según
+# se producen, así exportar un catálogo de millones de productos no construye el
+# reporte completo en memoria. Ordenar por una columna distinta del ID sí necesita
+# una lista de pares (clave, id), pero nunca las filas ya formateadas; salvo al
+# ordenar por precio, stock o valor sin más filtros que el propio stock, que sale
+# de los índices ordenados del Almacen (indices.py) página a página.
+import csv, json
+from itertools import islice
+from pathlib import Path
+
+from indices import CAMPOS_INDICE
+
+# Columnas de cada fila del reporte
+COLUMNAS_REPORTE = ("id", "nombre", "precio", "cantidad", "valor")
+
+# Clave de orden de cada columna (la comparte la tabla de inventario de la GUI)
+CLAVES_ORDEN = {"id": lambda p: p.id, "nombre": lambda p: p.nombre.casefold(), "precio": lambda p: p.precio,
+                "cantidad": lambda p: p.cantidad, "valor": lambda p: p.precio * p.cantidad}
+
+# Extensión de archivo -> formato de exportación
+FORMATOS = {".csv": "csv", ".jsonl": "jsonl", ".txt": "texto"}
+
+# Filas por página en la vista previa
+POR_PAGINA = 50
+
+ANCHO_TEXTO = 60
+CABECERA_TEXTO = f"{'ID':<5} {'Nombre':<20} {'Precio':<12} {'Stock':<8} {'Valor':<12}"
+
+
+def _fila(p):
+    return (p.id, p.nombre, p.precio, p.cantidad, p.precio * p.cantidad)
+
+
+def linea_texto(fila):
+    """Formatea una fila del reporte en columnas de ancho fijo."""
+    id, nombre, precio, cantidad, valor = fila
+    return f"{id:<5} {nombre:<20} ${precio:<11.2f} {cantidad:<8} ${valor:<11,.2f}"
+
+
+class Reporte:
+    """Consulta de reporte sobre un Almacen: los filtros son los de Almacen.filtrar y, si
+    se indica ordenar_por (una de COLUMNAS_REPORTE), las filas salen en ese orden."""
+
+    def __init__(self, almacen, ordenar_por=None, descendente=False, **filtros):
+        if ordenar_por is not None and ordenar_por not in CLAVES_ORDEN:
+            raise ValueError(f"Columna de orden desconocida: {ordenar_por}")
+        self.almacen = almacen
+        self.ordenar_por = ordenar_por
+        self.descendente = descendente
+        self.filtros = filtros
+        self._orden = None  # Ids ya ordenados (se calcula una vez y se reutiliza entre páginas)
+        self._total = None
+        self._rango = self._rango_indexado()
+
+    def _rango_indexado(self):
+        """(mínimo, máximo) si la consulta se puede leer de un índice ordenado del Almacen
+        (por_rango): ordenada por precio, cantidad o valor y, como mucho, filtrada por stock
+        al ordenar por cantidad. None si hay que filtrar y ordenar."""
+        if self.ordenar_por not in CAMPOS_INDICE:
+            return None
+        filtros = {clave: valor for clave, valor in self.filtros.items() if valor is not None}
+        if self.ordenar_por == "cantidad" and set(filtros) <= {"stock_min", "stock_max"}:
+            return (filtros.get("stock_min"), filtros.get("stock_max"))
+        return None if filtros else (None, None)
+
+    def _productos(self):
+        if self._rango is not None:
+            desde = 0
+            while pagina := self.almacen.por_rango(self.ordenar_por, *self._rango, desde, 1000, self.descendente):
+                yield from pagina
+                desde += len(pagina)
+            return
+        if self.ordenar_por in (None, "id") and not self.descendente:
+            yield from self.almacen.filtrar(**self.filtros)  # El catálogo ya está en orden de id
+            return
+        if self._orden is None:
+            clave = CLAVES_ORDEN[self.ordenar_por or "id"]
+            pares = sorted(((clave(p), p.id) for p in self.almacen.filtrar(**self.filtros)),
+                           reverse=self.descendente)
+            self._orden = [id for _, id in pares]
+        for id in self._orden:
+            prod = self.almacen.buscar_por_id(id)
+            if prod is not None:  # Puede haberse eliminado entre dos páginas
+                yield prod
+
+    def filas(self):
+        """Genera las filas (id, nombre, precio, cantidad, valor) del reporte."""
+        return map(_fila, self._productos())
+
+    def contar(self):
+        """Nº de filas del reporte (una pasada sin guardar nada, o el índice ordenado)."""
+        if self._rango is not None:
+            return self.almacen.contar_rango(self.ordenar_por, *self._rango)
+        if self._total is None:
+            self._total = sum(1 for _ in self._productos())
+        return self._total
+
+    def paginas(self, por_pagina=POR_PAGINA):
+        return max(1, -(-self.contar() // por_pagina))
+
+    def pagina(self, numero, por_pagina=POR_PAGINA):
+        """Filas de la página indicada (empezando en 0)."""
+        if self._rango is not None:
+            return list(map(_fila, self.almacen.por_rango(self.ordenar_por, *self._rango, numero * por_pagina,
+                                                          por_pagina, self.descendente)))
+        return list(islice(self.filas(), numero * por_pagina, (numero + 1) * por_pagina))
+
+    def exportar(self, ruta, formato=None):
+        """Escribe el reporte en CSV, JSON Lines o texto de ancho fijo (por defecto según
+        la extensión) fila a fila. Devuelve (nº de filas, mensaje)."""
+        ruta = Path(ruta)
+        formato = formato or FORMATOS.get(ruta.suffix.lower())
+        if formato not in FORMATOS.values():
+            return (0, f"✗ Formato desconocido: {formato or ruta.suffix}")
+        n, valor_total = 0, 0
+        try:
+            with open(ruta, 'w', encoding='utf-8', newline='') as f:
+                if formato == "csv":
+                    escritor = csv.writer(f)
+                    escritor.writerow(COLUMNAS_REPORTE)
+                elif formato == "texto":
+                    f.write(f"{CABECERA_TEXTO}\n{'-' * ANCHO_TEXTO}\n")
+                for fila in self.filas():
+                    if formato == "csv":
+                        escritor.writerow(fila)
+                    elif formato == "jsonl":
+                        f.write(json.dumps(dict(zip(COLUMNAS_REPORTE, fila)), ensure_ascii=False) + "\n")
+                    else:
+                        f.write(linea_texto(fila) + "\n")
+                    n += 1
+                    valor_total += fila[4]
+                if formato == "texto":
+                    f.write(f"{'=' * ANCHO_TEXTO}\nTOTAL: {n} producto(s) | ${valor_total:,.2f}\n")
+        except OSError as e:
+            return (0, f"✗ Error al exportar: {e}")
+        return (n, f"✓ {n} producto(s) exportados a {ruta.name}")
@@ -0,0 +1,286 @@
+# ============================================================================
+# SERVICIO SIN INTERFAZ - Almacén compartido por socket local con asyncio
+# ============================================================================
+# Protocolo: una petición JSON por línea y una respuesta JSON por línea, en el
+# mismo orden (se admiten peticiones encadenadas sin esperar respuesta):
+#   -> {"id": 1, "op": "vender", "args": {"id": 2, "cantidad": 3}}
+#   <- {"id": 1, "ok": true, "mensaje": "✓ Venta: ...", "resultado": 75.0}
+#
+# Las peticiones de todas las conexiones pasan por una única cola. Se ejecutan
+# por lotes y cada lote se persiste con una sola escritura (group commit); las
+# respuestas se envían cuando su lote ya está en disco.
+#
+# Uso:  python servicio.py [--host 127.0.0.1] [--puerto 8765] [--unix RUTA] [--modo diario]
+#                          [--metricas almacen.prom]
+import argparse, asyncio, json
+
+from instrumentacion import Instrumentacion
+from almacen import ARCHIVO_DATOS, Almacen
+from indices import CAMPOS_INDICE
+from ventas import CRITERIOS_MAS_VENDIDOS, PERIODOS, LibroVentas
+
+# Máximo de peticiones que se ejecutan y confirman juntas en un mismo lote
+MAX_LOTE = 256
+
+# Segundos entre dos volcados del archivo de métricas (--metricas)
+INTERVALO_METRICAS = 10
+
+
+def _ok(msg):
+    """Las operaciones que devuelven solo un mensaje indican éxito con ✓ (igual que en la GUI)."""
+    return msg.startswith("✓")
+
+
+def _reporte(almacen, args):
+    datos = {"productos": almacen.cantidad_productos(), "unidades": almacen.unidades_totales(),
+             "valor_total": almacen.valor_total_almacen(), "dinero_vendido": almacen.dinero_vendido}
+    if args.get("detalle"):
+        datos["detalle"] = [p.to_dict() for p in list(almacen.productos)]
+    return True, "✓ Reporte", datos
+
+
+def _producto(almacen, args):
+    prod = almacen.buscar_por_id(args["id"])
+    return (True, "✓ Encontrado", prod.to_dict()) if prod else (False, "✗ Producto no encontrado", None)
+
+
+def _buscar(almacen, args):
+    enc = almacen.buscar_por_nombre(args["nombre"], args.get("limite"))
+    return bool(enc), f"{'✓' if enc else '✗'} {len(enc)} encontrado(s)", [p.to_dict() for p in enc]
+
+
+def _similares(almacen, args):
+    enc = almacen.buscar_similares(args["texto"], args.get("k", 10))
+    return bool(enc), f"{'✓' if enc else '✗'} {len(enc)} parecido(s)", [dict(p.to_dict(), similitud=s) for p, s in enc]
+
+
+def _a_reponer(almacen, args):
+    urgentes = almacen.productos_a_reponer(args.get("limite"))
+    return True, f"✓ {len(urgentes)} a reponer", [p.to_dict() for p in urgentes]
+
+
+def _rango(almacen, args):
+    campo = args.get("campo") or "precio"
+    enc = almacen.por_rango(campo, args.get("minimo"), args.get("maximo"), args.get("desde") or 0,
+                            args.get("limite"), bool(args.get("descendente")))
+    return True, f"✓ {len(enc)} de {almacen.contar_rango(campo, args.get('minimo'), args.get('maximo'))}", \
+        [p.to_dict() for p in enc]
+
+
+def _ventas(almacen, args):
+    libro = almacen.libro_ventas
+    if libro is None:
+        return False, "✗ Libro de ventas desactivado", None
+    periodo = args.get("periodo") or "hora"
+    return True, "✓ Ventas", {"ingresos": libro.ingresos(periodo, args.get("desde"), args.get("hasta")),
+                              "mas_vendidos": libro.mas_vendidos(args.get("n") or 10, periodo, args.get("desde"),
+                                                                 args.get("hasta"), args.get("por") or "unidades")}
+
+
+# Cada operación recibe (almacen, args) y devuelve (ok, mensaje, resultado)
+OPERACIONES = {
+    "crear": lambda a, x: a.crear_producto(x["nombre"], x["precio"], x["cantidad"]) + (None,),
+    "vender": lambda a, x: a.vender(x["id"], x["cantidad"]),
+    "vender_lote": lambda a, x: a.vender_lote(x["lineas"]),
+    "stock": lambda a, x: (lambda m: (_ok(m), m, None))(a.actualizar_stock(x["id"], x["cantidad"])),
+    "descuento": lambda a, x: (lambda m: (_ok(m), m, None))(a.aplicar_descuento(x["id"], x["porcentaje"])),
+    "quitar_descuento": lambda a, x: (lambda m: (_ok(m), m, None))(a.resetear_descuento(x["id"])),
+    "descuento_masivo": lambda a, x: (lambda n, m: (True, m, n))(*a.aplicar_descuento_masivo(
+        x["porcentaje"], **x.get("filtros", {}))),
+    "quitar_descuento_masivo": lambda a, x: (lambda n, m: (True, m, n))(*a.resetear_descuento_masivo(
+        **x.get("filtros", {}))),
+    "eliminar": lambda a, x: (lambda m: (_ok(m), m, None))(a.eliminar_producto(x["id"])),
+    "punto_reorden": lambda a, x: (lambda m: (_ok(m), m, None))(a.fijar_punto_reorden(x["id"], x["punto"])),
+    "a_reponer": _a_reponer,
+    "producto": _producto,
+    "buscar": _buscar,
+    "similares": _similares,
+    "rango": _rango,
+    "reporte": _reporte,
+    "ventas": _ventas,
+}
+
+
+# Tipos de los argumentos de cada operación, comprobados antes de llamar al Almacen: así una
+# petición mal formada falla sola en lugar de dejar un cambio a medias. Los que admiten None
+# son opcionales.
+ENTERO, NUMERO, TEXTO = (int,), (int, float), (str,)
+ENTERO_OPCIONAL, NUMERO_OPCIONAL, TEXTO_OPCIONAL = (int, type(None)), (int, float, type(None)), (str, type(None))
+BOOLEANO_OPCIONAL = (bool, type(None))
+ARGUMENTOS = {
+    "crear": {"nombre": TEXTO, "precio": NUMERO, "cantidad": ENTERO},
+    "vender": {"id": ENTERO, "cantidad": ENTERO},
+    "vender_lote": {"lineas": (list,)},
+    "stock": {"id": ENTERO, "cantidad": ENTERO},
+    "descuento": {"id": ENTERO, "porcentaje": NUMERO},
+    "quitar_descuento": {"id": ENTERO},
+    "descuento_masivo": {"porcentaje": NUMERO, "filtros": (dict, type(None))},
+    "quitar_descuento_masivo": {"filtros": (dict, type(None))},
+    "eliminar": {"id": ENTERO},
+    "punto_reorden": {"id": ENTERO, "punto": ENTERO},
+    "a_reponer": {"limite": ENTERO_OPCIONAL},
+    "producto": {"id": ENTERO},
+    "buscar": {"nombre": TEXTO, "limite": ENTERO_OPCIONAL},
+    "similares": {"texto": TEXTO, "k": ENTERO_OPCIONAL},
+    "rango": {"campo": TEXTO_OPCIONAL, "minimo": NUMERO_OPCIONAL, "maximo": NUMERO_OPCIONAL,
+              "desde": ENTERO_OPCIONAL, "limite": ENTERO_OPCIONAL, "descendente": BOOLEANO_OPCIONAL},
+    "ventas": {"n": ENTERO_OPCIONAL, "desde": NUMERO_OPCIONAL, "hasta": NUMERO_OPCIONAL,
+               "periodo": TEXTO_OPCIONAL, "por": TEXTO_OPCIONAL},
+}
+
+# Valores admitidos de los argumentos que son una opción de una lista
+OPCIONES = {
+    "rango": {"campo": CAMPOS_INDICE},
+    "ventas": {"periodo": tuple(PERIODOS), "por": CRITERIOS_MAS_VENDIDOS},
+}
+
+
+def _validar(op, args):
+    """Mensaje de error si args no es un objeto o algún argumento falta o es de otro tipo;
+    None si la petición se puede ejecutar."""
+    if not isinstance(args, dict):
+        return "✗ Argumentos inválidos: se esperaba un objeto"
+    for nombre, tipos in ARGUMENTOS.get(op, {}).items():
+        valor = args.get(nombre)
+        if (isinstance(valor, bool) and bool not in tipos) or not isinstance(valor, tipos):  # bool es un int
+            return f"✗ Argumentos inválidos: {nombre} = {valor!r}"
+    for nombre, opciones in OPCIONES.get(op, {}).items():
+        if args.get(nombre) is not None and args[nombre] not in opciones:
+            return f"✗ Argumentos inválidos: {nombre} debe ser uno de {', '.join(opciones)}"
+    if op == "vender_lote" and not all(isinstance(l, list) and len(l) == 2 and
+                                       all(type(x) is int for x in l) for l in args["lineas"]):
+        return "✗ Argumentos inválidos: lineas debe ser una lista de [id, cantidad]"
+    return None
+
+
+class ServicioAlmacen:
+    """Atiende conexiones concurrentes y ejecuta sus peticiones contra un único Almacen."""
+
+    def __init__(self, almacen, instrumentacion=None, archivo_metricas=None):
+        self.almacen = almacen
+        self.instrumentacion = instrumentacion
+        self.archivo_metricas = archivo_metricas
+        self._cola = None  # (peticion, futuro) de todas las conexiones
+
+    def _ejecutar(self, peticion):
+        """Ejecuta una petición ya decodificada y construye su respuesta. Nunca lanza: el error
+        de una petición no debe marcar como fallidas las demás de su lote, que sí se aplican."""
+        respuesta = {"id": peticion.get("id")}
+        operacion = OPERACIONES.get(peticion.get("op"))
+        if operacion is None:
+            return dict(respuesta, ok=False, mensaje=f"✗ Operación desconocida: {peticion.get('op')}")
+        args = peticion.get("args", {})
+        error = _validar(peticion["op"], args)
+        if error:
+            return dict(respuesta, ok=False, mensaje=error)
+        try:
+            ok, msg, resultado = operacion(self.almacen, args)
+            return dict(respuesta, ok=ok, mensaje=msg, resultado=resultado)
+        except (KeyError, TypeError, ValueError) as e:
+            return dict(respuesta, ok=False, mensaje=f"✗ Argumentos inválidos: {e}")
+        except Exception as e:
+            return dict(respuesta, ok=False, mensaje=f"✗ Error interno: {e}")
+
+    def _procesar_lote(self, lote):
+        """Ejecuta un lote de peticiones y lo persiste con una sola escritura (en un hilo aparte)."""
+        with self.almacen.persistencia_agrupada():
+            return [self._ejecutar(peticion) for peticion, _ in lote]
+
+    async def _confirmar(self):
+        """Toma todo lo que haya en la cola, lo ejecuta como un lote y responde tras persistirlo.
+        Mientras un lote se escribe en disco, el siguiente se va acumulando en la cola."""
+        while True:
+            lote = [await self._cola.get()]
+            while not self._cola.empty() and len(lote) < MAX_LOTE:
+                lote.append(self._cola.get_nowait())
+            try:
+                respuestas = await asyncio.to_thread(self._procesar_lote, lote)
+            except Exception as e:  # Solo la escritura del lote: _ejecutar responde a cada petición
+                respuestas = [{"id": p.get("id"), "ok": False, "mensaje": f"✗ Error interno: {e}"} for p, _ in lote]
+            for (_, futuro), respuesta in zip(lote, respuestas):
+                futuro.set_result(respuesta)
+
+    async def _atender(self, lector, escritor):
+        """Lee peticiones encadenadas de una conexión; otra tarea responde en el mismo orden."""
+        en_vuelo = asyncio.Queue()
+        respondedor = asyncio.create_task(self._responder(escritor, en_vuelo))
+        try:
+            while linea := await lector.readline():
+                if not linea.strip():
+                    continue
+                futuro = asyncio.get_running_loop().create_future()
+                try:
+                    peticion = json.loads(linea)
+                    if not isinstance(peticion, dict):
+                        raise ValueError("se esperaba un objeto JSON")
+                except ValueError as e:
+                    futuro.set_result({"id": None, "ok": False, "mensaje": f"✗ Petición inválida: {e}"})
+                else:
+                    await self._cola.put((peticion, futuro))
+                await en_vuelo.put(futuro)
+        finally:
+            await en_vuelo.put(None)
+            await respondedor
+
+    async def _responder(self, escritor, en_vuelo):
+        try:
+            while (futuro := await en_vuelo.get()) is not None:
+                respuesta = await futuro
+                escritor.write(json.dumps(respuesta, ensure_ascii=False).encode("utf-8") + b"\n")
+                if en_vuelo.empty():
+                    await escritor.drain()  # Solo se espera al socket cuando no hay más respuestas listas
+        except ConnectionError:
+            pass
+        finally:
+            escritor.close()
+
+    async def _volcar_metricas(self):
+        while True:
+            await asyncio.sleep(INTERVALO_METRICAS)
+            self.instrumentacion.exportar_prometheus(self.archivo_metricas)
+
+    async def servir(self, host="127.0.0.1", puerto=8765, unix=None):
+        """Arranca el servidor TCP (o de socket Unix) y atiende hasta que se cancele."""
+        self._cola = asyncio.Queue()
+        confirmador = asyncio.create_task(self._confirmar())
+        if self.instrumentacion and self.archivo_metricas:
+            metricas = asyncio.create_task(self._volcar_metricas())
+        if unix:
+            servidor = await asyncio.start_unix_server(self._atender, path=unix)
+        else:
+            servidor = await asyncio.start_server(self._atender, host, puerto)
+        print(f"Almacén escuchando en {unix or f'{host}:{puerto}'}")
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            confirmador.cancel()
+            if self.instrumentacion and self.archivo_metricas:
+                metricas.cancel()
+                self.instrumentacion.exportar_prometheus(self.archivo_metricas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio del almacén sin interfaz gráfica")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--unix", help="Ruta de un socket Unix en lugar de TCP")
+    parser.add_argument("--archivo", help="Archivo JSON de datos (por defecto almacen_datos.json)")
+    parser.add_argument("--modo", choices=Almacen.MODOS, default="diario")
+    parser.add_argument("--metricas", help="Archivo donde volcar las métricas en formato Prometheus")
+    parser.add_argument("--compartido", action="store_true",
+                        help="Permite que otros procesos (la GUI, la consola) usen el mismo archivo a la vez")
+    args = parser.parse_args()
+    instrumentacion = Instrumentacion() if args.metricas else None
+    almacen = Almacen(args.archivo, modo=args.modo, libro_ventas=LibroVentas(args.archivo or ARCHIVO_DATOS),
+                      instrumentacion=instrumentacion, compartido=args.compartido)
+    try:
+        asyncio.run(ServicioAlmacen(almacen, instrumentacion, args.metricas).servir(args.host, args.puerto, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        almacen.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,13 @@
 # SISTEMA DE GESTIÓN DE ALMACÉN - Importaciones y Configuración
 # ============================================================================
 import tkinter as tk
-from tkinter import ttk, messagebox
-import json, os
-from pathlib import Path
+from tkinter import ttk, messagebox, filedialog
+from bisect import bisect_left, insort
 
-# Ruta del archivo JSON que persiste los datos del almacén
-ARCHIVO_DATOS = Path(__file__).parent / "almacen_datos.json"
+from almacen import ARCHIVO_DATOS, MODOS, Almacen, Producto  # Reexportados: la lógica vive en almacen.py
+from importacion import importar
+from reportes import ANCHO_TEXTO, CABECERA_TEXTO, CLAVES_ORDEN, COLUMNAS_REPORTE, Reporte, linea_texto
+from ventas import LibroVentas
 
 # Paleta de colores centralizada para consistencia visual en toda la interfaz
 COLORES = {"fondo": "white", "grisel": "#ecf0f1", "texto": "#2c3e50", "grisT": "#7f8c8d",
@@ -18,140 +19,219 @@ COLORES = {"fondo": "white", "grisel": "#ecf0f1", "texto": "#2c3e50", "grisT": "
 FUENTES = {"titulo": ("Arial", 11, "bold"), "etiqueta": ("Arial", 10, "bold"), "normal": ("Arial", 10),
            "ayuda": ("Arial", 9, "italic"), "monoesp": ("Courier", 9)}
 
-# ============================================================================
-# CLASE MODELO - Representa un producto en el almacén
-# ============================================================================
-class Producto:
-    """Modelo que encapsula los datos de un producto (ID, nombre, precio, stock)."""
-    
-    def __init__(self, id, nombre, precio, cantidad):
-        self.id = id
-        self.nombre = nombre
-        self.precio = precio
-        self.precio_original = precio  # Se mantiene para restaurar después de descuentos
-        self.cantidad = cantidad
-    def __str__(self):
-        return f"ID: {self.id} | {self.nombre} | ${self.precio} | Stock: {self.cantidad}"
-    
-    def to_dict(self):
-        """Convierte el producto a diccionario para guardar en JSON."""
-        return {"id": self.id, "nombre": self.nombre, "precio": self.precio, "cantidad": self.cantidad, "precio_original": self.precio_original}
-    
-    @staticmethod
-    def from_dict(data):
-        """Factory method que crea un producto desde datos cargados del JSON."""
-        prod = Producto(data["id"], data["nombre"], data["precio"], data["cantidad"])
-        prod.precio_original = data.get("precio_original", data["precio"])
-        return prod
+# Alto en píxeles de cada fila de la tabla de inventario (fijo para calcular cuántas caben)
+ALTO_FILA = 20
 
 # ============================================================================
-# CLASE DE LÓGICA DE NEGOCIOS - Gestión del almacén
+# CLASE DE PRESENTACIÓN - Interfaz gráfica del almacén
 # ============================================================================
-class Almacen:
-    """Controla la lógica de operaciones del almacén: CRUD, búsquedas, descuentos y persistencia."""
-    
-    def __init__(self):
-        self.productos = []
-        self.proximo_id = 1
-        self.dinero_vendido = 0  # Acumula dinero total de todas las ventas
-        self.cargar_datos()  # Cargar datos existentes al inicializar
-    
-    def cargar_datos(self):
-        """Lee el JSON y carga todos los productos existentes, dinero acumulado y próximo ID."""
-        if os.path.exists(str(ARCHIVO_DATOS)):
-            try:
-                with open(str(ARCHIVO_DATOS), 'r', encoding='utf-8') as f:
-                    datos = json.load(f)
-                    self.productos = [Producto.from_dict(p) for p in datos.get("productos", [])]
-                    # Obtener el máximo ID y asignar el siguiente
-                    self.proximo_id = max((p.id for p in self.productos), default=0) + 1 if self.productos else 1
-                    # Cargar el dinero acumulado de ventas
-                    self.dinero_vendido = datos.get("dinero_vendido", 0)
-            except Exception as e:
-                print(f"Error al cargar datos: {e}")
-    
-    def guardar_datos(self):
-        """Persiste todos los productos, dinero acumulado y próximo ID en el JSON."""
+class PanelInventario:
+    """Tabla de inventario virtualizada: el Treeview solo tiene tantas filas como caben en
+    pantalla y se rellenan con la parte visible del catálogo.
+    
+    El orden se guarda como lista ascendente de (valor de la columna, id); el orden
+    descendente la recorre al revés. Al refrescar solo se recolocan los ids que el Almacen
+    marca como cambiados y solo se reescriben las filas visibles cuyo texto cambió."""
+    
+    COLUMNAS = (("id", "ID", 70), ("nombre", "Nombre", 420), ("precio", "Precio", 130),
+                ("cantidad", "Stock", 100), ("valor", "Valor", 150))
+    CLAVES = CLAVES_ORDEN
+    
+    def __init__(self, parent, almacen):
+        self.almacen = almacen
+        almacen.registrar_cambios()
+        self._columna, self._descendente = "id", False
+        self._claves = []  # (clave de orden, id) en orden ascendente
+        self._clave_de = {}  # id -> su entrada en _claves
+        self._desde = 0  # Posición, en el orden mostrado, de la primera fila visible
+        self._mostrado = []  # Valores pintados en cada fila del Treeview (() = fila oculta)
+        ttk.Style().configure("Inventario.Treeview", font=FUENTES["monoesp"], rowheight=ALTO_FILA)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self._desplazar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree = ttk.Treeview(parent, columns=[c for c, _, _ in self.COLUMNAS], show="headings",
+                                 height=10, selectmode="browse", style="Inventario.Treeview")
+        for col, titulo, ancho in self.COLUMNAS:
+            self.tree.heading(col, text=titulo, command=lambda c=col: self.ordenar(c))
+            self.tree.column(col, width=ancho, anchor="w" if col == "nombre" else "e")
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.tree.bind("<Configure>", lambda e: self._ajustar_filas(e.height))
+        for evento in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(evento, self._rueda)
+        self.tree.bind("<Prior>", lambda e: self._desplazar("scroll", -1, "pages") or "break")
+        self.tree.bind("<Next>", lambda e: self._desplazar("scroll", 1, "pages") or "break")
+        self._poner_titulos()
+    
+    def _ajustar_filas(self, alto):
+        """Crea o quita filas del Treeview para que haya exactamente las que caben."""
+        n = max(1, (alto - ALTO_FILA - 4) // ALTO_FILA)  # Se descuenta la cabecera
+        while len(self._mostrado) < n:
+            self.tree.insert("", "end", iid=f"f{len(self._mostrado)}")
+            self._mostrado.append(None)
+        while len(self._mostrado) > n:
+            self.tree.delete(f"f{len(self._mostrado) - 1}")
+            self._mostrado.pop()
+        self._pintar()
+    
+    def _id_en(self, pos):
+        return self._claves[-1 - pos if self._descendente else pos][1]
+    
+    def _valores(self, id):
+        p = self.almacen.buscar_por_id(id)
+        return (p.id, p.nombre, f"${p.precio:,.2f}", p.cantidad, f"${p.precio * p.cantidad:,.2f}") if p else ()
+    
+    def _pintar(self):
+        """Rellena las filas visibles; solo toca el Treeview donde el texto ha cambiado."""
+        total, visibles = len(self._claves), len(self._mostrado)
+        self._desde = max(0, min(self._desde, total - visibles))
+        for i in range(visibles):
+            pos = self._desde + i
+            valores = self._valores(self._id_en(pos)) if pos < total else ()
+            if valores == self._mostrado[i]:
+                continue
+            if not valores:
+                self.tree.detach(f"f{i}")  # Sobran filas: se ocultan en lugar de mostrarlas vacías
+            else:
+                if self._mostrado[i] == ():
+                    self.tree.move(f"f{i}", "", i)
+                self.tree.item(f"f{i}", values=valores)
+            self._mostrado[i] = valores
+        if total:
+            self.scrollbar.set(self._desde / total, min(1, (self._desde + visibles) / total))
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def _desplazar(self, accion, cantidad, unidad=None):
+        """Comando de la barra de desplazamiento ("moveto" fracción / "scroll" n units|pages)."""
+        if accion == "moveto":
+            self._desde = int(float(cantidad) * len(self._claves))
+        else:
+            self._desde += int(cantidad) * (len(self._mostrado) if unidad == "pages" else 1)
+        self._pintar()
+    
+    def _rueda(self, evento):
+        arriba = evento.num == 4 or (evento.num != 5 and evento.delta > 0)
+        self._desplazar("scroll", -3 if arriba else 3, "units")
+        return "break"
+    
+    def _ordenar_todo(self):
+        clave = self.CLAVES[self._columna]
+        self._claves = sorted((clave(p), p.id) for p in self.almacen.productos)
+        self._clave_de = {entrada[1]: entrada for entrada in self._claves}
+    
+    def _recolocar(self, id):
+        """Quita un id de su posición en el orden y, si el producto sigue existiendo, lo
+        vuelve a insertar según su valor actual (búsqueda binaria)."""
+        vieja = self._clave_de.pop(id, None)
+        if vieja is not None:
+            del self._claves[bisect_left(self._claves, vieja)]
+        prod = self.almacen.buscar_por_id(id)
+        if prod is not None:
+            nueva = (self.CLAVES[self._columna](prod), id)
+            insort(self._claves, nueva)
+            self._clave_de[id] = nueva
+    
+    def _poner_titulos(self):
+        for col, titulo, _ in self.COLUMNAS:
+            if col == self._columna:
+                titulo += " ▼" if self._descendente else " ▲"
+            self.tree.heading(col, text=titulo)
+    
+    def ordenar(self, columna):
+        """Ordena por una columna; pulsar de nuevo la misma invierte el sentido."""
+        if columna == self._columna:
+            self._descendente = not self._descendente
+        else:
+            self._columna, self._descendente = columna, False
+            self._ordenar_todo()
+        self._desde = 0
+        self._poner_titulos()
+        self._pintar()
+    
+    def refrescar(self):
+        """Aplica los cambios del almacén desde el último refresco y repinta lo visible."""
+        cambios = self.almacen.cambios_pendientes()
+        if cambios is None:
+            self._ordenar_todo()
+        else:
+            for id in cambios:
+                self._recolocar(id)
+        self._pintar()
+
+
+class VentanaReporte:
+    """Vista previa paginada del reporte con filtros, orden y exportación a archivo."""
+    
+    FILTROS = (("patron", "Nombre:", str), ("precio_min", "Precio ≥", float), ("precio_max", "Precio ≤", float),
+               ("stock_min", "Stock ≥", int), ("stock_max", "Stock ≤", int))
+    
+    def __init__(self, ventana, almacen):
+        self.almacen = almacen
+        self.reporte = Reporte(almacen)
+        self.numero = 0
+        self.top = tk.Toplevel(ventana, bg=COLORES["fondo"])
+        self.top.title("▣ REPORTE DEL ALMACÉN")
+        self.top.geometry("760x640")
+        
+        marco = tk.Frame(self.top, bg=COLORES["fondo"])
+        marco.pack(fill="x", padx=12, pady=(12,5))
+        self.entradas = {}
+        for col, (clave, texto, _) in enumerate(self.FILTROS):
+            tk.Label(marco, text=texto, font=FUENTES["ayuda"], bg=COLORES["fondo"], fg=COLORES["texto"]).grid(row=0, column=col, sticky="w", padx=4)
+            self.entradas[clave] = tk.Entry(marco, width=14 if clave == "patron" else 8, font=FUENTES["normal"], relief="solid", bd=1)
+            self.entradas[clave].grid(row=1, column=col, padx=4, pady=2, sticky="w")
+        tk.Label(marco, text="Ordenar por:", font=FUENTES["ayuda"], bg=COLORES["fondo"], fg=COLORES["texto"]).grid(row=0, column=len(self.FILTROS), sticky="w", padx=4)
+        self.orden = ttk.Combobox(marco, values=COLUMNAS_REPORTE, width=9, state="readonly")
+        self.orden.set("id")
+        self.orden.grid(row=1, column=len(self.FILTROS), padx=4)
+        self.descendente = tk.BooleanVar()
+        tk.Checkbutton(marco, text="↓", variable=self.descendente, bg=COLORES["fondo"]).grid(row=1, column=len(self.FILTROS) + 1)
+        tk.Button(marco, text="✓ APLICAR", command=self.aplicar, bg=COLORES["info"], fg="white",
+                 font=FUENTES["etiqueta"], relief="flat", cursor="hand2").grid(row=1, column=len(self.FILTROS) + 2, padx=6)
+        
+        self.texto = tk.Text(self.top, font=FUENTES["monoesp"], bg=COLORES["fondo_entrada"],
+                             fg=COLORES["texto"], relief="solid", bd=1, wrap="none")
+        self.texto.pack(fill="both", expand=True, padx=12, pady=5)
+        
+        barra = tk.Frame(self.top, bg=COLORES["grisel"])
+        barra.pack(fill="x", padx=12, pady=(5,12))
+        tk.Button(barra, text="◀ Anterior", command=lambda: self.mostrar(self.numero - 1),
+                 relief="flat", cursor="hand2").pack(side="left", padx=5, pady=5)
+        self.label_pagina = tk.Label(barra, text="", font=FUENTES["etiqueta"], bg=COLORES["grisel"], fg=COLORES["texto"])
+        self.label_pagina.pack(side="left", padx=10)
+        tk.Button(barra, text="Siguiente ▶", command=lambda: self.mostrar(self.numero + 1),
+                 relief="flat", cursor="hand2").pack(side="left", padx=5, pady=5)
+        tk.Button(barra, text="⤓ EXPORTAR", command=self.exportar, bg=COLORES["especial"], fg="white",
+                 font=FUENTES["etiqueta"], relief="flat", cursor="hand2").pack(side="right", padx=5, pady=5)
+        self.mostrar(0)
+    
+    def aplicar(self):
         try:
-            with open(str(ARCHIVO_DATOS), 'w', encoding='utf-8') as f:
-                json.dump({"productos": [p.to_dict() for p in self.productos], "proximo_id": self.proximo_id, 
-                          "dinero_vendido": self.dinero_vendido}, 
-                         f, indent=4, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error al guardar datos: {e}")
-    
-    def crear_producto(self, nombre, precio, cantidad):
-        """Valida y crea un nuevo producto con ID único. Persiste en JSON."""
-        if not nombre or precio <= 0 or cantidad < 0 or any(p.nombre.lower() == nombre.lower() for p in self.productos):
-            return (False, "✗ Datos inválidos o producto existente")
-        prod = Producto(self.proximo_id, nombre, precio, cantidad)
-        self.productos.append(prod)
-        self.proximo_id += 1
-        self.guardar_datos()
-        return (True, f"✓ Producto '{nombre}' creado con ID {prod.id}")
-    
-    def buscar_por_id(self, id):
-        return next((p for p in self.productos if p.id == id), None)
-    
-    def vender(self, id, cantidad):
-        """Reduce el stock de un producto e incrementa dinero acumulado por venta."""
-        prod = self.buscar_por_id(id)
-        if prod and prod.cantidad >= cantidad and cantidad > 0:
-            monto_venta = cantidad * prod.precio
-            prod.cantidad -= cantidad
-            self.dinero_vendido += monto_venta  # Acumular dinero de la venta
-            self.guardar_datos()
-            return (True, f"✓ Venta: {cantidad}x {prod.nombre} = ${monto_venta:.2f}", monto_venta)
-        return (False, "✗ Stock insuficiente o cantidad inválida", 0)
-    
-    def listar_productos(self):
-        return "El almacén está vacío" if not self.productos else "\n--- INVENTARIO ---\n" + "\n".join(str(p) for p in self.productos)
-    
-    def valor_total_almacen(self):
-        return sum(p.precio * p.cantidad for p in self.productos)
-    
-    def buscar_por_nombre(self, nombre):
-        return [p for p in self.productos if nombre.lower() in p.nombre.lower()]
-    
-    def actualizar_stock(self, id, cantidad):
-        prod = self.buscar_por_id(id)
-        if prod:
-            prod.cantidad += cantidad
-            self.guardar_datos()
-            return f"✓ Stock: {prod.nombre} -> {prod.cantidad} unidades"
-        return "✗ Producto no encontrado"
-    
-    def aplicar_descuento(self, id, porcentaje):
-        """Aplica un descuento porcentual al precio, manteniendo el precio original para restauración."""
-        prod = self.buscar_por_id(id)
-        if prod and 0 <= porcentaje <= 100:
-            prod.precio = prod.precio_original * (1 - porcentaje/100)
-            self.guardar_datos()
-            return f"✓ Descuento aplicado: {prod.nombre} = ${prod.precio:.2f}"
-        return "✗ Producto no encontrado" if not prod else "✗ Porcentaje inválido"
-    
-    def resetear_descuento(self, id):
-        """Restaura el precio original del producto removiendo cualquier descuento."""
-        prod = self.buscar_por_id(id)
-        if prod:
-            if prod.precio != prod.precio_original:
-                prod.precio = prod.precio_original
-                self.guardar_datos()
-                return f"✓ Descuento removido: {prod.nombre} = ${prod.precio:.2f}"
-            return f"⚠️ {prod.nombre} sin descuento"
-        return "✗ Producto no encontrado"
-    
-    def eliminar_producto(self, id):
-        prod = self.buscar_por_id(id)
-        if prod:
-            self.productos.remove(prod)
-            self.guardar_datos()
-            return f"✓ {prod.nombre} eliminado"
-        return "✗ Producto no encontrado"
+            filtros = {clave: tipo(v) for clave, _, tipo in self.FILTROS if (v := self.entradas[clave].get().strip())}
+        except ValueError:
+            messagebox.showerror("❌", "Valores inválidos", parent=self.top)
+            return
+        self.reporte = Reporte(self.almacen, ordenar_por=self.orden.get(), descendente=self.descendente.get(), **filtros)
+        self.mostrar(0)
+    
+    def mostrar(self, numero):
+        """Muestra una página; solo se formatean sus filas."""
+        self.numero = max(0, min(numero, self.reporte.paginas() - 1))
+        filas = self.reporte.pagina(self.numero)
+        self.texto.delete("1.0", tk.END)
+        self.texto.insert(tk.END, f"Total: {self.almacen.cantidad_productos()} | Valor: ${self.almacen.valor_total_almacen():,.2f}\n"
+                                  f"{'=' * ANCHO_TEXTO}\n{CABECERA_TEXTO}\n{'-' * ANCHO_TEXTO}\n")
+        self.texto.insert(tk.END, "\n".join(linea_texto(f) for f in filas) if filas else "Vacío")
+        self.label_pagina.config(text=f"Página {self.numero + 1} de {self.reporte.paginas()} ({self.reporte.contar()} productos)")
+    
+    def exportar(self):
+        ruta = filedialog.asksaveasfilename(parent=self.top, defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Texto", "*.txt")])
+        if not ruta:
+            return
+        n, msg = self.reporte.exportar(ruta)
+        (messagebox.showinfo if msg.startswith("✓") else messagebox.showerror)("▣", msg, parent=self.top)
+
 
-# ============================================================================
-# CLASE DE PRESENTACIÓN - Interfaz gráfica del almacén
-# ============================================================================
 class InterfazAlmacen:
     """Gestiona la interfaz gráfica Tkinter y la interacción del usuario con el almacén."""
     
@@ -159,9 +239,19 @@ class InterfazAlmacen:
         self.ventana = ventana
         self.ventana.title("▦ SISTEMA DE GESTIÓN DE ALMACÉN ▦")
         self.ventana.geometry("1300x900")
-        self.almacen = Almacen()  # Instancia del controlador de negocio
+        self.avisos_reorden = []  # Productos que acaban de llegar a su punto de reorden, por notificar
+        # Compartido: otras copias del programa, la consola o el servicio pueden usar el mismo archivo.
+        # En segundo plano: el hilo escritor guarda (y suelta el candado del archivo) sin frenar la ventana
+        self.almacen = Almacen(modo="diario", compartido=True, segundo_plano=True,  # Controlador de negocio
+                               libro_ventas=LibroVentas(ARCHIVO_DATOS), al_cruzar_umbral=self.avisos_reorden.append)
+        self.ventana.protocol("WM_DELETE_WINDOW", self.cerrar)
         self.crear_interfaz()
     
+    def cerrar(self):
+        """Termina de escribir los cambios pendientes y compacta el diario antes de cerrar la ventana."""
+        self.almacen.cerrar()
+        self.ventana.destroy()
+    
     def mostrar_resultado(self, text_widget, msg):
         """Actualiza un widget de texto con un mensaje (limpia anterior y inserta nuevo)."""
         text_widget.delete("1.0", tk.END)
@@ -174,21 +264,15 @@ class InterfazAlmacen:
            3. Panel de operaciones (tabs para cada operación)"""
         self.ventana.config(bg=COLORES["fondo"])
         
-        # Panel de inventario: muestra lista actualizada de todos los productos
+        # Panel de inventario: tabla ordenable que solo dibuja los productos visibles
         marco_inv = tk.Frame(self.ventana, bg=COLORES["fondo"], relief="solid", bd=1)
         marco_inv.pack(fill="both", expand=True, padx=12, pady=(12,5))
         tk.Label(marco_inv, text="▬ INVENTARIO ACTUAL", font=FUENTES["etiqueta"],
                 bg=COLORES["fondo"], fg=COLORES["texto"]).pack(anchor="w", padx=15, pady=(10,5))
         
-        marco_texto = tk.Frame(marco_inv, bg=COLORES["fondo"])
-        marco_texto.pack(fill="both", expand=True, padx=15, pady=10)
-        scrollbar = ttk.Scrollbar(marco_texto)
-        scrollbar.pack(side="right", fill="y")
-        self.text_inventario = tk.Text(marco_texto, height=10, width=110, yscrollcommand=scrollbar.set,
-                                       font=FUENTES["monoesp"], bg=COLORES["fondo_entrada"],
-                                       fg=COLORES["texto"], relief="solid", bd=1)
-        self.text_inventario.pack(side="left", fill="both", expand=True)
-        scrollbar.config(command=self.text_inventario.yview)
+        marco_tabla = tk.Frame(marco_inv, bg=COLORES["fondo"])
+        marco_tabla.pack(fill="both", expand=True, padx=15, pady=10)
+        self.panel_inventario = PanelInventario(marco_tabla, self.almacen)
         
         # Info
         marco_info = tk.Frame(self.ventana, bg=COLORES["grisel"], relief="solid", bd=1)
@@ -202,6 +286,9 @@ class InterfazAlmacen:
         self.label_dinero_vendido = tk.Label(marco_info, text="", font=FUENTES["etiqueta"],
                                             bg=COLORES["grisel"], fg=COLORES["especial"])
         self.label_dinero_vendido.pack(side="left", padx=30, pady=10)
+        self.label_guardado = tk.Label(marco_info, text="", font=FUENTES["ayuda"],
+                                      bg=COLORES["grisel"], fg=COLORES["grisT"])
+        self.label_guardado.pack(side="right", padx=20, pady=10)
         notebook = ttk.Notebook(self.ventana)
         notebook.pack(fill="both", expand=True, padx=12, pady=10)
         
@@ -224,8 +311,34 @@ class InterfazAlmacen:
                  bg=COLORES["trabajo"], fg="white", font=FUENTES["etiqueta"],
                  padx=15, pady=8, relief="flat", cursor="hand2",
                  activebackground=COLORES["trabajo"]).pack(side="left", padx=5)
+        tk.Button(marco_botones, text="⚠ A REPONER", command=self.mostrar_a_reponer,
+                 bg=COLORES["advertencia"], fg="white", font=FUENTES["etiqueta"],
+                 padx=15, pady=8, relief="flat", cursor="hand2",
+                 activebackground=COLORES["advertencia"]).pack(side="left", padx=5)
         
         self.actualizar_inventario()
+        self.vigilar_guardado()
+    
+    def vigilar_guardado(self):
+        """Incorpora lo guardado por otros procesos, avisa de los productos que han llegado a
+        su punto de reorden y muestra si quedan cambios por escribir en disco; se repite cada
+        200 ms. Sin cambios ajenos sincronizar() solo consulta el tamaño y la fecha de los
+        archivos, sin tomar su candado."""
+        if self.almacen.sincronizar():
+            self.actualizar_inventario()
+        if self.avisos_reorden:
+            avisos, self.avisos_reorden[:] = list(self.avisos_reorden), []
+            messagebox.showwarning("⚠️ Reponer", "Han llegado a su punto de reorden:\n\n" + "\n".join(
+                f"ID: {p.id} | {p.nombre} | Stock: {p.cantidad} (punto: {p.punto_reorden})" for p in avisos[:20])
+                + (f"\n... y {len(avisos) - 20} más" if len(avisos) > 20 else ""))
+        escritor = self.almacen.almacenamiento
+        if escritor.error:
+            self.label_guardado.config(text="✗ Error al guardar", fg=COLORES["error"])
+        elif escritor.guardando:
+            self.label_guardado.config(text="● Guardando…", fg=COLORES["advertencia"])
+        else:
+            self.label_guardado.config(text="✓ Guardado", fg=COLORES["exito"])
+        self.ventana.after(200, self.vigilar_guardado)
     
     def crear_seccion_crear(self, parent):
         parent.config(bg=COLORES["fondo"])
@@ -245,7 +358,10 @@ class InterfazAlmacen:
         marco.columnconfigure(1, weight=1)
         tk.Button(parent, text="✓ CREAR", command=self.crear_producto, bg=COLORES["exito"],
                  fg="white", font=FUENTES["etiqueta"], padx=25, pady=12, relief="flat",
-                 cursor="hand2", activebackground=COLORES["exito"]).pack(pady=20)
+                 cursor="hand2", activebackground=COLORES["exito"]).pack(pady=(20,5))
+        tk.Button(parent, text="⇪ IMPORTAR CSV/JSONL", command=self.importar_catalogo, bg=COLORES["grisT"],
+                 fg="white", font=FUENTES["etiqueta"], padx=15, pady=6, relief="flat",
+                 cursor="hand2", activebackground=COLORES["grisT"]).pack()
         tk.Label(parent, text="► Resultado:", font=FUENTES["ayuda"], bg=COLORES["fondo"], fg=COLORES["grisT"]).pack(pady=(20,5))
         self.text_resultado_crear = tk.Text(parent, height=6, width=90, font=FUENTES["monoesp"],
                                             bg=COLORES["fondo_entrada"], fg=COLORES["texto"], relief="solid", bd=1)
@@ -284,10 +400,18 @@ class InterfazAlmacen:
         tk.Label(marco, text="◈ Cambio:", font=FUENTES["etiqueta"], bg=COLORES["fondo"], fg=COLORES["texto"]).grid(row=1, column=0, sticky="w", padx=15, pady=10)
         self.entry_cantidad_stock = tk.Entry(marco, width=25, font=FUENTES["normal"], relief="solid", bd=1)
         self.entry_cantidad_stock.grid(row=1, column=1, padx=10, pady=10, sticky="ew")
+        tk.Label(marco, text="⚠ Punto de reorden:", font=FUENTES["etiqueta"], bg=COLORES["fondo"], fg=COLORES["texto"]).grid(row=2, column=0, sticky="w", padx=15, pady=10)
+        self.entry_punto_reorden = tk.Entry(marco, width=25, font=FUENTES["normal"], relief="solid", bd=1)
+        self.entry_punto_reorden.grid(row=2, column=1, padx=10, pady=10, sticky="ew")
         marco.columnconfigure(1, weight=1)
-        tk.Button(parent, text="✓ ACTUALIZAR", command=self.actualizar_stock, bg=COLORES["trabajo"],
+        marco_b = tk.Frame(parent, bg=COLORES["fondo"])
+        marco_b.pack(pady=20)
+        tk.Button(marco_b, text="✓ ACTUALIZAR", command=self.actualizar_stock, bg=COLORES["trabajo"],
+                 fg="white", font=FUENTES["etiqueta"], padx=25, pady=12, relief="flat",
+                 cursor="hand2", activebackground=COLORES["trabajo"]).pack(side="left", padx=5)
+        tk.Button(marco_b, text="⚠ FIJAR PUNTO", command=self.fijar_punto_reorden, bg=COLORES["advertencia"],
                  fg="white", font=FUENTES["etiqueta"], padx=25, pady=12, relief="flat",
-                 cursor="hand2", activebackground=COLORES["trabajo"]).pack(pady=20)
+                 cursor="hand2", activebackground=COLORES["advertencia"]).pack(side="left", padx=5)
         tk.Label(parent, text="► Resultado:", font=FUENTES["ayuda"], bg=COLORES["fondo"], fg=COLORES["grisT"]).pack(pady=(20,5))
         self.text_resultado_stock = tk.Text(parent, height=6, width=90, font=FUENTES["monoesp"],
                                             bg=COLORES["fondo_entrada"], fg=COLORES["texto"], relief="solid", bd=1)
@@ -314,6 +438,28 @@ class InterfazAlmacen:
         tk.Button(mb, text="↩ QUITAR", command=self.quitar_descuento, bg=COLORES["error"],
                  fg="white", font=FUENTES["etiqueta"], padx=20, pady=10, relief="flat",
                  cursor="hand2", activebackground=COLORES["error"]).pack(side="left", padx=5)
+        # Descuento masivo: mismo porcentaje para todos los productos que cumplan los filtros
+        mm = tk.Frame(parent, bg=COLORES["fondo"], relief="solid", bd=1)
+        mm.pack(fill="x", padx=20, pady=10)
+        tk.Label(mm, text="▣ Masivo (campos vacíos = sin filtro)", font=FUENTES["etiqueta"], bg=COLORES["fondo"],
+                fg=COLORES["texto"]).grid(row=0, column=0, columnspan=6, sticky="w", padx=15, pady=(10,5))
+        self.entradas_masivo = {}
+        campos = [("% :", "porcentaje"), ("ID desde:", "id_desde"), ("ID hasta:", "id_hasta"),
+                  ("Nombre (*):", "patron"), ("Precio mín:", "precio_min"), ("Precio máx:", "precio_max"),
+                  ("Stock mín:", "stock_min"), ("Stock máx:", "stock_max")]
+        for i, (texto, clave) in enumerate(campos):
+            fila, col = 1 + i // 4, (i % 4) * 2
+            tk.Label(mm, text=texto, font=FUENTES["normal"], bg=COLORES["fondo"], fg=COLORES["texto"]).grid(row=fila, column=col, sticky="w", padx=(15,5), pady=5)
+            self.entradas_masivo[clave] = tk.Entry(mm, width=12, font=FUENTES["normal"], relief="solid", bd=1)
+            self.entradas_masivo[clave].grid(row=fila, column=col + 1, padx=(0,10), pady=5, sticky="ew")
+        mbm = tk.Frame(mm, bg=COLORES["fondo"])
+        mbm.grid(row=3, column=0, columnspan=8, sticky="w", padx=10, pady=(5,10))
+        tk.Button(mbm, text="✓ APLICAR A TODOS", command=self.aplicar_descuento_masivo, bg=COLORES["advertencia"],
+                 fg="white", font=FUENTES["etiqueta"], padx=15, pady=6, relief="flat",
+                 cursor="hand2", activebackground=COLORES["advertencia"]).pack(side="left", padx=5)
+        tk.Button(mbm, text="↩ QUITAR A TODOS", command=self.quitar_descuento_masivo, bg=COLORES["error"],
+                 fg="white", font=FUENTES["etiqueta"], padx=15, pady=6, relief="flat",
+                 cursor="hand2", activebackground=COLORES["error"]).pack(side="left", padx=5)
         tk.Label(parent, text="► Resultado:", font=FUENTES["ayuda"], bg=COLORES["fondo"], fg=COLORES["grisT"]).pack(pady=(20,5))
         self.text_resultado_desc = tk.Text(parent, height=6, width=90, font=FUENTES["monoesp"],
                                            bg=COLORES["fondo_entrada"], fg=COLORES["texto"], relief="solid", bd=1)
@@ -347,10 +493,9 @@ class InterfazAlmacen:
         self.text_resultado_busqueda.pack(fill="both", expand=True, padx=20, pady=5)
     
     def actualizar_inventario(self):
-        self.text_inventario.delete("1.0", tk.END)
-        self.text_inventario.insert(tk.END, self.almacen.listar_productos())
+        self.panel_inventario.refrescar()
         v = self.almacen.valor_total_almacen()
-        c = len(self.almacen.productos)
+        c = self.almacen.cantidad_productos()
         d = self.almacen.dinero_vendido
         self.label_valor_total.config(text=f"◈ Valor Total: ${v:,.2f}")
         self.label_cantidad_productos.config(text=f"◻ Total: {c}")
@@ -376,6 +521,16 @@ class InterfazAlmacen:
             self.mostrar_resultado(self.text_resultado_crear, msg)
             messagebox.showerror("❌", msg)
     
+    def importar_catalogo(self):
+        ruta = filedialog.askopenfilename(parent=self.ventana, title="Importar productos",
+                                          filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Todos", "*.*")])
+        if not ruta:
+            return
+        _, _, msg = importar(self.almacen, ruta)
+        self.mostrar_resultado(self.text_resultado_crear, msg)
+        (messagebox.showinfo if msg.startswith("✓") else messagebox.showerror)("⇪", msg)
+        self.actualizar_inventario()
+    
     def realizar_venta(self):
         try:
             id_p = int(self.entry_id_venta.get())
@@ -414,6 +569,30 @@ class InterfazAlmacen:
             self.mostrar_resultado(self.text_resultado_stock, msg)
             messagebox.showerror("❌", msg)
     
+    def fijar_punto_reorden(self):
+        try:
+            id_p = int(self.entry_id_stock.get())
+            punto = int(self.entry_punto_reorden.get())
+            msg = self.almacen.fijar_punto_reorden(id_p, punto)
+            self.mostrar_resultado(self.text_resultado_stock, msg)
+            if "✓" in msg:
+                messagebox.showinfo("✅", msg)
+                self.entry_punto_reorden.delete(0, tk.END)
+            else:
+                messagebox.showerror("❌", msg)
+        except ValueError:
+            msg = "❌ Valores inválidos"
+            self.mostrar_resultado(self.text_resultado_stock, msg)
+            messagebox.showerror("❌", msg)
+    
+    def mostrar_a_reponer(self):
+        urgentes = self.almacen.productos_a_reponer(50)
+        if urgentes:
+            messagebox.showwarning("⚠ A REPONER", "Del más urgente al que menos:\n\n" + "\n".join(
+                f"ID: {p.id} | {p.nombre} | Stock: {p.cantidad} (punto: {p.punto_reorden})" for p in urgentes))
+        else:
+            messagebox.showinfo("⚠ A REPONER", "✓ Nada que reponer")
+    
     def aplicar_descuento(self):
         try:
             id_p = int(self.entry_id_desc.get())
@@ -451,6 +630,52 @@ class InterfazAlmacen:
             self.mostrar_resultado(self.text_resultado_desc, msg)
             messagebox.showerror("❌", msg)
     
+    def leer_filtros_masivo(self):
+        """Lee los filtros del descuento masivo; los campos vacíos no filtran. Lanza ValueError."""
+        tipos = {"id_desde": int, "id_hasta": int, "patron": str, "precio_min": float,
+                 "precio_max": float, "stock_min": int, "stock_max": int}
+        filtros = {}
+        for clave, tipo in tipos.items():
+            valor = self.entradas_masivo[clave].get().strip()
+            if valor:
+                filtros[clave] = tipo(valor)
+        return filtros
+    
+    def aplicar_descuento_masivo(self):
+        try:
+            porc = float(self.entradas_masivo["porcentaje"].get())
+            if not (0 <= porc <= 100):
+                raise ValueError("0-100")
+            filtros = self.leer_filtros_masivo()
+        except ValueError:
+            msg = "❌ Valores inválidos"
+            self.mostrar_resultado(self.text_resultado_desc, msg)
+            messagebox.showerror("❌", msg)
+            return
+        alcance = "los productos filtrados" if filtros else "TODOS los productos"
+        if not messagebox.askyesno("⚠️", f"¿Aplicar {porc:g}% a {alcance}?"):
+            return
+        n, msg = self.almacen.aplicar_descuento_masivo(porc, **filtros)
+        self.mostrar_resultado(self.text_resultado_desc, msg)
+        messagebox.showinfo("✅", msg)
+        self.actualizar_inventario()
+    
+    def quitar_descuento_masivo(self):
+        try:
+            filtros = self.leer_filtros_masivo()
+        except ValueError:
+            msg = "❌ Valores inválidos"
+            self.mostrar_resultado(self.text_resultado_desc, msg)
+            messagebox.showerror("❌", msg)
+            return
+        alcance = "los productos filtrados" if filtros else "TODOS los productos"
+        if not messagebox.askyesno("⚠️", f"¿Quitar el descuento a {alcance}?"):
+            return
+        n, msg = self.almacen.resetear_descuento_masivo(**filtros)
+        self.mostrar_resultado(self.text_resultado_desc, msg)
+        messagebox.showinfo("✅" if n else "⚠️", msg)
+        self.actualizar_inventario()
+    
     def buscar_producto(self):
         n = self.entry_buscar.get().strip()
         if not n:
@@ -461,6 +686,9 @@ class InterfazAlmacen:
             res = f"✅ {len(enc)} encontrado(s):\n\n" + "\n".join(f"ID: {p.id} | {p.nombre} | ${p.precio:.2f} | {p.cantidad}" for p in enc)
             self.mostrar_resultado(self.text_resultado_busqueda, res)
             messagebox.showinfo("✅", f"{len(enc)} hallado(s)")
+        elif similares := self.almacen.buscar_similares(n, 10):  # Sin coincidencia exacta: tolera erratas
+            res = "❓ Quizás buscabas:\n\n" + "\n".join(f"ID: {p.id} | {p.nombre} | ${p.precio:.2f} | {p.cantidad} ({s:.0%})" for p, s in similares)
+            self.mostrar_resultado(self.text_resultado_busqueda, res)
         else:
             res = "❌ No encontrado"
             self.mostrar_resultado(self.text_resultado_busqueda, res)
@@ -488,16 +716,7 @@ class InterfazAlmacen:
             messagebox.showerror("❌", msg)
     
     def generar_reporte(self):
-        r = "╔════════════════════════════════════╗\n║    REPORTE DEL ALMACÉN\n╚════════════════════════════════════╝\n\n"
-        r += f"Total: {len(self.almacen.productos)} | Valor: ${self.almacen.valor_total_almacen():,.2f}\n{'='*60}\n"
-        if self.almacen.productos:
-            r += f"{'ID':<5} {'Nombre':<20} {'Precio':<12} {'Stock':<8} {'Valor':<12}\n{'-'*60}\n"
-            for p in self.almacen.productos:
-                r += f"{p.id:<5} {p.nombre:<20} ${p.precio:<11.2f} {p.cantidad:<8} ${p.precio * p.cantidad:<11,.2f}\n"
-            r += f"{'='*60}\nTOTAL: ${self.almacen.valor_total_almacen():,.2f}\n"
-        else:
-            r += "Vacío"
-        messagebox.showinfo("▣ REPORTE", r)
+        VentanaReporte(self.ventana, self.almacen)
     
     def mostrar_ayuda(self):
         a = """╔════════════════════════════════════════╗
@@ -507,6 +726,8 @@ class InterfazAlmacen:
 1. CREAR PRODUCTO
    - Nombre, precio, cantidad inicial
    - ID automático
+   - Importar: CSV o JSON Lines con columnas
+     nombre, precio, cantidad
 
 2. VENDER
    - ID del producto y cantidad
@@ -514,18 +735,25 @@ class InterfazAlmacen:
 
 3. STOCK
    - Modifica cantidad (+/-)
+   - Punto de reorden: con ese stock o menos
+     el producto pasa a A REPONER y se avisa
 
 4. DESCUENTOS
    - ID y porcentaje
    - Quitar descuento
+   - Masivo: por rango de ID, nombre,
+     precio o stock
 
 5. BUSCAR/ELIMINAR
    - Por nombre o ID
    - Con confirmación
 
 BOTONES
-   - VER REPORTE
+   - VER REPORTE: por páginas, con filtros y orden;
+     exporta a CSV, JSON Lines o texto
    - REFRESCAR
+   - A REPONER: productos en su punto de reorden,
+     del más urgente al que menos
 """
         messagebox.showinfo("❓ AYUDA", a)
 
@@ -534,5 +762,10 @@ BOTONES
 # ============================================================================
 if __name__ == "__main__":
     ventana = tk.Tk()
-    app = InterfazAlmacen(ventana)
-    ventana.mainloop()
\ No newline at end of file
+    try:
+        app = InterfazAlmacen(ventana)
+    except ValueError as e:  # Instantánea dañada: no se abre, para no sobrescribirla con un almacén vacío
+        messagebox.showerror("❌", f"No se puede abrir el almacén:\n{e}")
+        ventana.destroy()
+    else:
+        ventana.mainloop()
\ No newline at end of file
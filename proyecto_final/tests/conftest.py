@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Los módulos del proyecto se importan por nombre (from almacen import ...), como al ejecutarlos
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
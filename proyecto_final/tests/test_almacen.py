@@ -0,0 +1,228 @@
+import pytest
+
+from almacen import Almacen
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    almacen = Almacen(tmp_path / "datos.json", modo="diario", depurar=True)
+    almacen.crear_producto("Tornillo", 2.0, 5)
+    yield almacen
+    almacen.cerrar()
+
+
+@pytest.mark.parametrize("operacion, args", [
+    ("actualizar_stock", (1, "3")),
+    ("actualizar_stock", (1, None)),
+    ("fijar_punto_reorden", (1, "2")),
+    ("aplicar_descuento", (1, "10")),
+])
+def test_un_cambio_que_falla_no_descuadra_los_totales(almacen, operacion, args):
+    with pytest.raises(TypeError):
+        getattr(almacen, operacion)(*args)
+    assert almacen.buscar_por_id(1).cantidad == 5
+    assert almacen.valor_total_almacen() == 10.0
+    assert almacen.unidades_totales() == 5
+    almacen._verificar_totales()
+
+
+@pytest.mark.parametrize("modo", ["diario", "binario", "sqlite"])
+def test_sincronizar_sin_cambios_no_toma_el_candado(tmp_path, modo, monkeypatch):
+    archivo = tmp_path / "datos.json"
+    uno = Almacen(archivo, modo=modo, compartido=True)
+    uno.crear_producto("Tornillo", 2.0, 5)
+    otro = Almacen(archivo, modo=modo, compartido=True)
+    uno.vender(1, 2)
+    assert otro.sincronizar()
+    assert otro.buscar_por_id(1).cantidad == 3
+
+    def bloquear():
+        raise AssertionError("sincronizar tomó el candado sin haber cambios")
+    monkeypatch.setattr(otro.almacenamiento, "bloquear", bloquear)
+    assert not otro.sincronizar()
+    monkeypatch.undo()
+    uno.vender(1, 1)
+    uno.cerrar()  # Compacta: en diario y binario sustituye la instantánea
+    assert otro.sincronizar()
+    assert otro.buscar_por_id(1).cantidad == 2
+    otro.cerrar()
+
+
+@pytest.mark.parametrize("modo", ["diario", "sqlite", "binario"])
+def test_ventas_concurrentes(tmp_path, modo):
+    import random
+    import threading
+
+    hilos, productos, intentos = 8, 20, 300
+    archivo = tmp_path / "datos.json"
+    almacen = Almacen(archivo, modo=modo)
+    precios = {}
+    for i in range(productos):
+        almacen.crear_producto(f"Producto {i}", 1.0 + i / 4, 50)
+        precios[i + 1] = 1.0 + i / 4
+    vendidas = [dict.fromkeys(precios, 0) for _ in range(hilos)]
+    salida = threading.Barrier(hilos)
+
+    def comprar(n):
+        azar, mias = random.Random(n), vendidas[n]
+        salida.wait()
+        for _ in range(intentos):
+            if azar.random() < 0.5:
+                id, cantidad = azar.randint(1, productos), azar.randint(1, 4)
+                if almacen.vender(id, cantidad)[0]:
+                    mias[id] += cantidad
+            else:
+                lineas = [(azar.randint(1, productos), azar.randint(1, 3)) for _ in range(3)]
+                if almacen.vender_lote(lineas)[0]:
+                    for id, cantidad in lineas:
+                        mias[id] += cantidad
+
+    trabajos = [threading.Thread(target=comprar, args=(n,)) for n in range(hilos)]
+    for t in trabajos:
+        t.start()
+    for t in trabajos:
+        t.join()
+
+    total = {id: sum(v[id] for v in vendidas) for id in precios}
+    for id, unidades in total.items():
+        prod = almacen.buscar_por_id(id)
+        assert prod.cantidad >= 0
+        assert prod.cantidad == 50 - unidades
+    assert almacen.dinero_vendido == pytest.approx(sum(u * precios[id] for id, u in total.items()))
+    assert almacen.unidades_totales() == sum(p.cantidad for p in almacen.productos)
+    almacen._verificar_totales()
+    en_memoria = (sorted(p.to_fila() for p in almacen.productos), almacen.dinero_vendido)
+    almacen.cerrar()
+
+    recargado = Almacen(archivo, modo=modo)
+    assert sorted(p.to_fila() for p in recargado.productos) == en_memoria[0]
+    assert recargado.dinero_vendido == pytest.approx(en_memoria[1])
+    recargado.cerrar()
+
+
+NOMBRES_ERRATAS = ["Teclado mecánico retroiluminado RGB", "Monitor LED 27 pulgadas curvo", "Mochila escolar impermeable",
+                   "Ratón inalámbrico ergonómico", "Cable HDMI 2 metros", "Tecla de repuesto", "Monedero de piel",
+                   "Mochilero: guía de viaje", "Lámpara de escritorio"]
+
+
+@pytest.mark.parametrize("modo", ["diario", "binario"])
+@pytest.mark.parametrize("texto, esperado", [("teclaod", "Teclado mecánico retroiluminado RGB"),
+                                             ("monitr", "Monitor LED 27 pulgadas curvo"),
+                                             ("mochla", "Mochila escolar impermeable"),
+                                             ("raton inalambrico", "Ratón inalámbrico ergonómico"),
+                                             ("lampara escritoro", "Lámpara de escritorio")])
+def test_buscar_similares_con_erratas(tmp_path, modo, texto, esperado):
+    archivo = tmp_path / "datos.json"
+    almacen = Almacen(archivo, modo=modo)
+    for i, nombre in enumerate(NOMBRES_ERRATAS):
+        almacen.crear_producto(nombre, 1.0 + i, 5)
+    for i in range(200):
+        almacen.crear_producto(f"Tornillo {i} de acero", 0.1, 100)
+    almacen.cerrar()
+
+    almacen = Almacen(archivo, modo=modo)  # En binario, perezoso: busca en los nombres del archivo
+    similares = almacen.buscar_similares(texto, 5)
+    assert esperado in [p.nombre for p, _ in similares[:2]]  # Junto a algún parecido igual de cercano
+    assert (almacen._tabla is not None) == (modo == "binario")  # Sigue perezoso: no cargó el catálogo
+    if modo == "binario":  # Solo se han creado los productos devueltos
+        assert set(almacen._por_id) == {p.id for p, _ in similares}
+    assert [s for _, s in similares] == sorted((s for _, s in similares), reverse=True)
+    indexado = Almacen(archivo, modo=modo)
+    indexado.productos  # Sale del modo perezoso: usa el índice de trigramas
+    assert [(p.id, s) for p, s in indexado.buscar_similares(texto, 5)] == [(p.id, s) for p, s in similares]
+    almacen.cerrar()
+    indexado.cerrar()
+
+
+def test_reorden_perezoso_no_recorre_el_catalogo_hasta_consultarlo(tmp_path):
+    archivo = tmp_path / "datos.json"
+    almacen = Almacen(archivo, modo="binario")
+    for i in range(1, 11):
+        almacen.crear_producto(f"Producto {i}", 1.0, 10 * i)
+    almacen.fijar_punto_reorden(2, 20)  # Ya a reponer en la instantánea
+    almacen.fijar_punto_reorden(5, 40)
+    almacen.cerrar()
+
+    cruzados = []
+    almacen = Almacen(archivo, modo="binario", al_cruzar_umbral=cruzados.append)
+    almacen.vender(3, 25)              # 5 unidades, por encima de su punto (0)
+    almacen.fijar_punto_reorden(3, 5)  # Cruza: 5 <= 5
+    almacen.vender(2, 1)               # Ya estaba a reponer: no vuelve a avisar
+    almacen.actualizar_stock(5, 100)   # Sale de la lista
+    assert almacen._a_reponer is None and almacen._tabla is not None
+    assert [p.id for p in cruzados] == [3]
+    assert [p.id for p in almacen.productos_a_reponer()] == [2, 3]
+    almacen.vender(4, 40)              # Con la lista ya calculada
+    assert [p.id for p in cruzados] == [3, 4]
+    assert [p.id for p in almacen.productos_a_reponer()] == [2, 3, 4]
+    almacen.productos  # Sale del modo perezoso
+    almacen._verificar_totales()
+    almacen.cerrar()
+
+
+@pytest.mark.parametrize("modo", ["diario", "binario"])
+def test_eliminar_mantiene_el_orden_de_id(tmp_path, modo):
+    archivo = tmp_path / "datos.json"
+    almacen = Almacen(archivo, modo=modo)
+    for i in range(1, 21):
+        almacen.crear_producto(f"Producto {i}", 1.0, i)
+    almacen.cerrar()
+
+    almacen = Almacen(archivo, modo=modo, depurar=True)
+    for id in (7, 1, 20, 8):
+        almacen.eliminar_producto(id)
+    almacen.crear_producto("Nuevo", 1.0, 1)
+    quedan = [i for i in range(1, 21) if i not in (7, 1, 20, 8)] + [21]
+    assert [p.id for p in almacen.productos] == quedan
+    assert len(almacen.productos) == almacen.cantidad_productos() == 17
+    assert [p.id for p in almacen.filtrar(id_hasta=9)] == [2, 3, 4, 5, 6, 9]
+    almacen.cerrar()
+
+
+@pytest.mark.parametrize("modo", ["diario", "sqlite", "binario"])
+def test_compartido_con_segundo_plano(tmp_path, modo):
+    import threading
+
+    archivo = tmp_path / "datos.json"
+    inicial = Almacen(archivo, modo=modo)
+    inicial.crear_producto("Tornillo", 1.0, 300)
+    inicial.cerrar()
+    rapido = Almacen(archivo, modo=modo, compartido=True, segundo_plano=True)
+    lento = Almacen(archivo, modo=modo, compartido=True)  # Como si fuera otro proceso
+    vendidas = []
+
+    def comprar(almacen):
+        for _ in range(60):
+            if almacen.vender(1, 2)[0]:
+                vendidas.append(2)
+
+    trabajos = [threading.Thread(target=comprar, args=(a,)) for a in (rapido, lento, rapido, lento)]
+    for t in trabajos:
+        t.start()
+    for t in trabajos:
+        t.join()
+    assert sum(vendidas) == 300  # Nadie vende sobre un stock que el otro aún no ha escrito
+    rapido.almacenamiento.vaciar()
+    assert not rapido.almacenamiento._candado_tomado  # Escrito todo, el candado queda libre
+    rapido.sincronizar()
+    lento.sincronizar()
+    assert rapido.buscar_por_id(1).cantidad == lento.buscar_por_id(1).cantidad == 0
+    assert rapido.dinero_vendido == lento.dinero_vendido == pytest.approx(300.0)
+    rapido.cerrar()
+    lento.cerrar()
+    recargado = Almacen(archivo, modo=modo)
+    assert recargado.buscar_por_id(1).cantidad == 0
+    recargado.cerrar()
+
+
+def test_buscar_por_nombre_con_limite_da_los_primeros_ids(tmp_path):
+    almacen = Almacen(tmp_path / "datos.json", modo="diario")
+    almacen.crear_productos([(f"Tornillo {i}", 1.0, 5) for i in range(2000)]
+                            + [("Tuerca", 1.0, 5), ("Destornillador", 3.0, 2)])
+    almacen.eliminar_producto(2)
+    todos = [p.id for p in almacen.buscar_por_nombre("tor")]
+    assert len(todos) == 2000 and todos == sorted(todos)
+    assert [p.id for p in almacen.buscar_por_nombre("tor", limite=5)] == [1, 3, 4, 5, 6]
+    assert [p.id for p in almacen.buscar_por_nombre("TORNILLO 19", limite=3)] == [20, 191, 192]
+    assert [p.id for p in almacen.buscar_por_nombre("destor", limite=5)] == [2002]
+    almacen.cerrar()
@@ -0,0 +1,70 @@
+import math
+
+import pytest
+
+from almacen import Almacen
+
+
+@pytest.mark.parametrize("modo", ["completo", "diario"])
+def test_instantanea_json_con_precios_no_finitos(tmp_path, modo):
+    archivo = tmp_path / "datos.json"
+    almacen = Almacen(archivo, modo=modo)
+    almacen.crear_producto("Infinito", float("inf"), 3)
+    almacen.crear_producto("Normal", 2.5, 4)
+    almacen.crear_producto("Indefinido", float("nan"), 1)
+    almacen.aplicar_descuento(2, 10)
+    almacen.cerrar()  # Compacta: escribe la instantánea completa
+
+    almacen = Almacen(archivo, modo=modo)
+    assert almacen.cantidad_productos() == 3
+    assert almacen.buscar_por_id(1).precio == math.inf
+    assert almacen.buscar_por_id(2).precio == pytest.approx(2.25)
+    assert almacen.buscar_por_id(2).precio_original == 2.5
+    assert math.isnan(almacen.buscar_por_id(3).precio)
+    almacen.cerrar()
+
+
+def test_instantanea_danada_no_se_abre(tmp_path):
+    archivo = tmp_path / "datos.json"
+    almacen = Almacen(archivo, modo="diario")
+    almacen.crear_producto("Tornillo", 1.0, 10)
+    almacen.cerrar()
+    contenido = archivo.read_text(encoding="utf-8")
+    archivo.write_text(contenido[:len(contenido) // 2], encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        Almacen(archivo, modo="diario")
+    assert archivo.read_text(encoding="utf-8") == contenido[:len(contenido) // 2]
+
+
+def _estado(almacen):
+    return sorted(p.to_fila() for p in almacen.productos), almacen.dinero_vendido
+
+
+def test_sqlite_compartido_relee_solo_lo_cambiado(tmp_path, monkeypatch):
+    archivo = tmp_path / "datos.json"
+    uno = Almacen(archivo, modo="sqlite", compartido=True)
+    for i in range(5):
+        uno.crear_producto(f"Producto {i}", 1.0 + i, 10)
+    otro = Almacen(archivo, modo="sqlite", compartido=True)
+    uno.vender(2, 3)
+    uno.eliminar_producto(4)
+    uno.crear_producto("Nuevo", 9.5, 1)
+    uno.aplicar_descuento(1, 20)
+
+    def cargar():
+        raise AssertionError("se ha releído la tabla entera")
+    monkeypatch.setattr(otro.almacenamiento, "cargar", cargar)
+    assert otro.sincronizar()
+    assert _estado(otro) == _estado(uno)
+    monkeypatch.undo()
+
+    uno.almacenamiento.guardar(uno.productos, uno.dinero_vendido, uno.proximo_id)  # Reescribe la tabla
+    uno.vender(1, 1)
+    assert otro.sincronizar()
+    assert _estado(otro) == _estado(uno)
+    otro.vender(3, 2)
+    assert uno.sincronizar()
+    assert _estado(otro) == _estado(uno)
+    uno.cerrar()
+    otro.cerrar()
@@ -0,0 +1,64 @@
+import pytest
+
+from almacen import Almacen
+from fragmentos import AlmacenFragmentado
+
+
+def _repartido(tmp_path):
+    origen = Almacen(tmp_path / "datos.json", modo="diario")  # Se reparte entre los fragmentos al abrir
+    for nombre, precio, cantidad in [("Tornillo", 0.5, 100), ("Tuerca", 0.25, 50), ("Martillo", 12.0, 7)]:
+        origen.crear_producto(nombre, precio, cantidad)
+    origen.vender(1, 10)
+    origen.cerrar()
+    return AlmacenFragmentado(fragmentos=2, archivo=tmp_path / "datos.json")
+
+
+@pytest.fixture
+def fragmentado(tmp_path):
+    almacen = _repartido(tmp_path)
+    yield almacen
+    almacen.cerrar()
+
+
+def test_reparto_y_totales_combinados(fragmentado, tmp_path):
+    assert [p.id for p in fragmentado.productos] == [1, 2, 3]
+    assert fragmentado.dinero_vendido == 5.0
+    assert fragmentado.unidades_totales() == 90 + 50 + 7
+    assert fragmentado.valor_total_almacen() == pytest.approx(45 + 12.5 + 84)
+    assert (tmp_path / "datos_frag0.json").exists() and (tmp_path / "datos_frag1.json").exists()
+
+
+def test_crear_productos_entre_fragmentos(fragmentado):
+    ids, rechazados = fragmentado.crear_productos([("Llave", 8.0, 4), ("tuerca", 1.0, 1), ("", 1.0, 1),
+                                                   ("Broca", 2.0, 30), ("Llave", 9.0, 1), ("Lija", -1, 5)])
+    assert ids == [4, 5]
+    assert rechazados == [(1, "✗ Producto existente"), (2, "✗ Datos inválidos"),
+                          (4, "✗ Producto existente"), (5, "✗ Datos inválidos")]
+    assert fragmentado.crear_producto("Sierra", 20.0, 2)[0]
+    assert [(p.id, p.nombre) for p in fragmentado.productos][3:] == [(4, "Llave"), (5, "Broca"), (6, "Sierra")]
+    assert fragmentado.cantidad_productos() == 6
+
+
+def test_vender_lote_entre_fragmentos_todo_o_nada(fragmentado):
+    ok, mensaje, _ = fragmentado.vender_lote([(1, 5), (2, 10), (3, 8)])  # El 3 solo tiene 7
+    assert not ok and "Martillo" in mensaje
+    assert [p.cantidad for p in fragmentado.productos] == [90, 50, 7]
+    assert fragmentado.dinero_vendido == 5.0
+
+    ok, _, monto = fragmentado.vender_lote([(1, 5), (2, 10), (3, 2), (1, 1)])
+    assert ok and monto == pytest.approx(6 * 0.5 + 10 * 0.25 + 2 * 12.0)
+    assert [p.cantidad for p in fragmentado.productos] == [84, 40, 5]
+    assert fragmentado.dinero_vendido == pytest.approx(5.0 + monto)
+    assert fragmentado.unidades_totales() == 84 + 40 + 5
+
+
+def test_reabrir_no_vuelve_a_repartir(tmp_path):
+    fragmentado = _repartido(tmp_path)
+    fragmentado.vender(2, 5)
+    fragmentado.cerrar()
+    reabierto = AlmacenFragmentado(fragmentos=2, archivo=tmp_path / "datos.json")
+    try:
+        assert [(p.id, p.cantidad) for p in reabierto.productos] == [(1, 90), (2, 45), (3, 7)]
+        assert reabierto.proximo_id == 4
+    finally:
+        reabierto.cerrar()
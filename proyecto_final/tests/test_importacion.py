@@ -0,0 +1,60 @@
+import csv
+
+import pytest
+
+from almacen import Almacen
+from importacion import importar
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    almacen = Almacen(tmp_path / "datos.json", modo="diario")
+    almacen.crear_producto("Existente", 1.0, 1)
+    yield almacen
+    almacen.cerrar()
+
+
+@pytest.mark.parametrize("procesos", [1, 2])
+def test_importar_csv_con_repetidos_y_filas_malas(almacen, tmp_path, procesos):
+    catalogo = tmp_path / "catalogo.csv"
+    catalogo.write_text("nombre,precio,cantidad\n"
+                        "Tornillo,0.5,10\n"
+                        "Tuerca,abc,5\n"
+                        "tornillo,1,1\n"
+                        "Martillo,12,-3\n"
+                        "Existente,1,1\n"
+                        "Llave,8,2\n", encoding="utf-8")
+    creados, rechazados, msg = importar(almacen, catalogo, procesos=procesos, tam_bloque=2)
+    assert (creados, rechazados) == (2, 4) and msg.startswith("✓")
+    assert [(p.id, p.nombre, p.precio, p.cantidad) for p in almacen.productos][1:] == \
+        [(2, "Tornillo", 0.5, 10), (3, "Llave", 8.0, 2)]
+    with open(tmp_path / "catalogo_rechazadas.csv", encoding="utf-8", newline="") as f:
+        filas = list(csv.reader(f))
+    assert filas[0] == ["linea", "motivo", "datos"]
+    assert [(linea, motivo) for linea, motivo, _ in filas[1:]] == [
+        ("3", "✗ Precio inválido: 'abc'"),
+        ("4", "✗ Nombre repetido en el archivo (línea 2)"),
+        ("5", "✗ Cantidad inválida: '-3'"),
+        ("6", "✗ Producto existente"),
+    ]
+
+
+def test_importar_jsonl(almacen, tmp_path):
+    catalogo = tmp_path / "catalogo.jsonl"
+    catalogo.write_text('{"nombre": "Broca", "precio": 2, "cantidad": 30}\n'
+                        'no es json\n'
+                        '\n'
+                        '{"nombre": "Lija", "precio": 0.3, "cantidad": 2.5}\n', encoding="utf-8")
+    creados, rechazados, _ = importar(almacen, catalogo, procesos=1)
+    assert (creados, rechazados) == (1, 2)
+    assert almacen.buscar_por_id(2).nombre == "Broca"
+    with open(tmp_path / "catalogo_rechazadas.csv", encoding="utf-8", newline="") as f:
+        assert [fila[0] for fila in csv.reader(f)] == ["linea", "2", "4"]
+
+
+def test_sin_rechazos_no_hay_informe(almacen, tmp_path):
+    catalogo = tmp_path / "catalogo.csv"
+    catalogo.write_text("cantidad,nombre,precio\n3,Sierra,20\n", encoding="utf-8")
+    assert importar(almacen, catalogo)[:2] == (1, 0)
+    assert almacen.buscar_por_id(2).cantidad == 3
+    assert not (tmp_path / "catalogo_rechazadas.csv").exists()
@@ -0,0 +1,88 @@
+import math
+import random
+
+import pytest
+
+import indices
+from almacen import Almacen
+from indices import IndicesOrdenados, ListaOrdenada
+
+
+def test_lista_ordenada_frente_a_una_lista(monkeypatch):
+    monkeypatch.setattr(indices, "TAM_BLOQUE", 4)  # Muchos bloques: se parten y se vacían
+    azar = random.Random(7)
+    pares = sorted((azar.randint(0, 50), id) for id in range(40))
+    lista, esperado = ListaOrdenada(pares), list(pares)
+    for id in range(40, 400):
+        if esperado and azar.random() < 0.45:
+            par = esperado.pop(azar.randrange(len(esperado)))
+            lista.quitar(par)
+        else:
+            par = (azar.randint(0, 50), id)
+            lista.anadir(par)
+            esperado.append(par)
+            esperado.sort()
+        assert len(lista) == len(esperado)
+    assert list(lista) == esperado
+    for minimo, maximo in [(None, None), (10, 20), (20, 10), (None, 5), (45, None), (13, 13)]:
+        inicio, fin = lista.rango(minimo, maximo)
+        dentro = [p for p in esperado if (minimo is None or p[0] >= minimo) and (maximo is None or p[0] <= maximo)]
+        assert list(lista.entre(inicio, fin)) == dentro
+        assert list(lista.entre(inicio, fin, descendente=True)) == dentro[::-1]
+    with pytest.raises(KeyError):
+        lista.quitar((99, 0))
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    almacen = Almacen(tmp_path / "datos.json", modo="diario", depurar=True)
+    for nombre, precio, cantidad in [("A", 5.0, 10), ("B", 1.0, 100), ("C", 5.0, 1), ("D", 20.0, 3), ("E", 2.0, 0)]:
+        almacen.crear_producto(nombre, precio, cantidad)
+    yield almacen
+    almacen.cerrar()
+
+
+def test_por_rango_contar_rango_y_mas_valiosos(almacen):
+    ids = lambda productos: [p.id for p in productos]
+    assert ids(almacen.por_rango("precio")) == [2, 5, 1, 3, 4]
+    assert ids(almacen.por_rango("precio", 2.0, 5.0)) == [5, 1, 3]
+    assert ids(almacen.por_rango("precio", 2.0, 5.0, desde=1, limite=1)) == [1]
+    assert ids(almacen.por_rango("cantidad", descendente=True, limite=2)) == [2, 1]
+    assert almacen.contar_rango("cantidad", 1, 10) == 3
+    assert almacen.contar_rango("valor", minimo=50) == 3
+    assert ids(almacen.mas_valiosos(3)) == [2, 4, 1]
+    almacen.vender(2, 95)            # Valor 5: pasa detrás de D (60) y A (50)
+    almacen.aplicar_descuento(4, 50)  # Precio 10, valor 30
+    assert ids(almacen.mas_valiosos(3)) == [1, 4, 3]
+    assert ids(almacen.por_rango("precio", minimo=6)) == [4]
+    almacen.eliminar_producto(1)
+    assert almacen.contar_rango("precio") == 4
+    with pytest.raises(ValueError):
+        almacen.por_rango("nombre")
+
+
+def test_precio_nan_en_los_indices(almacen):
+    almacen.crear_producto("Indefinido", float("nan"), 3)
+    assert almacen.contar_rango("precio") == 6
+    assert almacen.vender(6, 1)[0]
+    assert almacen.buscar_por_id(6).cantidad == 2
+    assert [p.id for p in almacen.por_rango("precio", minimo=10)] == [4, 6]  # NaN cuenta como +inf
+    assert math.isnan(almacen.buscar_por_id(6).precio)
+
+
+def test_si_falla_el_indice_se_deshace_el_cambio(almacen, monkeypatch):
+    almacen.por_rango("precio")
+    mover = IndicesOrdenados.mover
+
+    def fallar(self, id, antes, despues):
+        if antes != despues:
+            raise KeyError(id)
+        mover(self, id, antes, despues)
+
+    monkeypatch.setattr(IndicesOrdenados, "mover", fallar)
+    with pytest.raises(KeyError):
+        almacen.vender(1, 4)
+    assert almacen.buscar_por_id(1).cantidad == 10
+    assert almacen.dinero_vendido == 0
+    assert almacen.unidades_totales() == 114
+    almacen._verificar_totales()
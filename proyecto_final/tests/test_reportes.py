@@ -0,0 +1,53 @@
+import pytest
+
+from almacen import Almacen
+from reportes import Reporte
+
+np = pytest.importorskip("numpy")  # La variante columnar es opcional
+from almacen_columnar import AlmacenColumnar  # noqa: E402
+
+PRODUCTOS = [("Tornillo acero", 0.5, 100), ("Tuerca", 0.25, 0), ("Martillo", 12.0, 7),
+             ("Destornillador", 6.5, 3), ("Tornillo madera", 0.4, 40), ("Llave inglesa", 15.0, 2)]
+
+
+@pytest.fixture(params=[Almacen, AlmacenColumnar])
+def almacen(request, tmp_path):
+    almacen = request.param(tmp_path / "datos.json", modo="diario")
+    for nombre, precio, cantidad in PRODUCTOS:
+        almacen.crear_producto(nombre, precio, cantidad)
+    almacen.aplicar_descuento(3, 50)  # Martillo a 6.0: la franja de precio mira el original
+    almacen.eliminar_producto(5)
+    yield almacen
+    almacen.cerrar()
+
+
+@pytest.mark.parametrize("orden, filtros, esperado", [
+    (None, {}, [1, 2, 3, 4, 6]),
+    (None, {"patron": "tornillo"}, [1]),
+    (None, {"precio_min": 10}, [3, 6]),
+    (None, {"stock_min": 1, "stock_max": 10}, [3, 4, 6]),
+    ("precio", {}, [2, 1, 3, 4, 6]),
+    ("valor", {"patron": "*o*"}, [4, 3, 1]),
+])
+def test_reporte_igual_en_ambos_almacenes(almacen, orden, filtros, esperado):
+    reporte = Reporte(almacen, ordenar_por=orden, **filtros)
+    assert [fila[0] for fila in reporte.filas()] == esperado
+    assert reporte.contar() == len(esperado)
+    assert [fila[0] for fila in reporte.pagina(0, 2)] == esperado[:2]
+
+
+def test_filtrar_genera_productos(almacen):
+    assert [(p.id, p.precio) for p in almacen.filtrar(precio_min=10)] == [(3, 6.0), (6, 15.0)]
+
+
+@pytest.mark.parametrize("consulta, esperado", [
+    (("precio",), [2, 1, 3, 4, 6]),
+    (("precio", 1.0, 10.0), [3, 4]),
+    (("cantidad", None, 7, 1, 2), [6, 4]),
+    (("valor", None, None, 0, 3, True), [1, 3, 6]),
+])
+def test_consultas_por_rango_en_ambos_almacenes(almacen, consulta, esperado):
+    assert [p.id for p in almacen.por_rango(*consulta)] == esperado
+    assert almacen.contar_rango(*consulta[:3]) == len(almacen.por_rango(*consulta[:3]))
+    assert [p.id for p in almacen.mas_valiosos(2)] == [1, 3]
+    assert not almacen.sincronizar()
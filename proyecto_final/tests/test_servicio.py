@@ -0,0 +1,77 @@
+import pytest
+
+import servicio
+from almacen import Almacen
+from servicio import ServicioAlmacen
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    almacen = Almacen(tmp_path / "datos.json", modo="diario")
+    almacen.crear_producto("Tornillo", 2.0, 10)
+    yield almacen
+    almacen.cerrar()
+
+
+def _lote(servicio_almacen, *peticiones):
+    return servicio_almacen._procesar_lote([(p, None) for p in peticiones])
+
+
+def test_un_error_inesperado_solo_falla_su_peticion(almacen, monkeypatch):
+    def fallar(a, x):
+        raise AttributeError("fallo")
+    monkeypatch.setitem(servicio.OPERACIONES, "producto", fallar)
+    respuestas = _lote(ServicioAlmacen(almacen),
+                       {"id": 1, "op": "crear", "args": {"nombre": "Tuerca", "precio": 1.0, "cantidad": 5}},
+                       {"id": 2, "op": "producto", "args": {"id": 1}},
+                       {"id": 3, "op": "vender", "args": {"id": 1, "cantidad": 3}})
+    assert [r["ok"] for r in respuestas] == [True, False, True]
+    assert "Error interno" in respuestas[1]["mensaje"]
+    assert almacen.buscar_por_id(1).cantidad == 7
+    assert almacen.dinero_vendido == 6.0
+
+
+@pytest.mark.parametrize("peticion", [
+    {"op": "stock", "args": {"id": 1, "cantidad": "5"}},
+    {"op": "vender", "args": {"id": 1, "cantidad": 2.5}},
+    {"op": "vender", "args": {"id": 1}},
+    {"op": "descuento", "args": {"id": 1, "porcentaje": True}},
+    {"op": "vender_lote", "args": {"lineas": [[1, "2"]]}},
+    {"op": "crear", "args": ["Tuerca", 1.0, 5]},
+])
+def test_argumentos_de_otro_tipo_no_tocan_el_almacen(almacen, peticion):
+    respuesta, = _lote(ServicioAlmacen(almacen), dict(peticion, id=1))
+    assert not respuesta["ok"] and "Argumentos inválidos" in respuesta["mensaje"]
+    assert almacen.buscar_por_id(1).cantidad == 10
+    assert almacen.valor_total_almacen() == 20.0
+    assert almacen.unidades_totales() == 10
+
+
+@pytest.mark.parametrize("args, valido", [
+    ({"periodo": "semana"}, False),
+    ({"por": "precio"}, False),
+    ({"periodo": 3600}, False),
+    ({"periodo": "dia", "por": "ingresos", "n": 3}, True),
+    ({}, True),
+])
+def test_validar_ventas(args, valido):
+    assert (servicio._validar("ventas", args) is None) == valido
+
+
+@pytest.mark.parametrize("args, valido", [
+    ({"campo": "precio", "descendente": True}, True),
+    ({"campo": "valor", "descendente": None, "limite": 5}, True),
+    ({"descendente": "si"}, False),
+    ({"descendente": 1}, False),
+    ({"campo": "nombre"}, False),
+    ({"limite": True}, False),
+])
+def test_validar_rango(args, valido):
+    assert (servicio._validar("rango", args) is None) == valido
+
+
+def test_rango_descendente(almacen):
+    almacen.crear_producto("Tuerca", 1.0, 3)
+    respuesta, = _lote(ServicioAlmacen(almacen), {"id": 1, "op": "rango",
+                                                  "args": {"campo": "precio", "descendente": True}})
+    assert respuesta["ok"] and [p["id"] for p in respuesta["resultado"]] == [1, 2]
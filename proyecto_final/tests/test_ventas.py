@@ -0,0 +1,56 @@
+import pytest
+
+from ventas import LibroVentas
+
+HORA = 1_699_999_200  # Inicio de una hora (UTC)
+DIA = 1_700_006_400   # Inicio del día siguiente
+
+
+@pytest.fixture
+def libro(tmp_path):
+    libro = LibroVentas(tmp_path / "datos.json")
+    libro.registrar([(1, 2, 5.0, 10.0)], ts=HORA - 10)
+    libro.registrar([(2, 1, 20.0, 20.0), (1, 1, 5.0, 5.0)], ts=HORA + 10)
+    libro.registrar([(3, 10, 1.0, 10.0)], ts=DIA + 5)
+    yield libro
+    libro.cerrar()
+
+
+def _consultas(libro):
+    return (libro.ingresos("hora"), libro.ingresos("dia"), libro.ingresos("hora", desde=HORA, hasta=DIA),
+            libro.mas_vendidos(periodo="dia"), libro.mas_vendidos(periodo="dia", por="ingresos"),
+            libro.mas_vendidos(periodo="hora", hasta=HORA))
+
+
+def test_resumenes_a_ambos_lados_de_un_cambio_de_periodo(libro):
+    horas, dias, ventana, por_unidades, por_ingresos, hasta_la_hora = _consultas(libro)
+    assert horas == [(HORA - 3600, 10.0, 2), (HORA, 25.0, 2), (DIA, 10.0, 10)]
+    assert dias == [(DIA - 86400, 35.0, 4), (DIA, 10.0, 10)]
+    assert ventana == [(HORA, 25.0, 2)]
+    assert por_unidades == [(3, 10, 10.0), (1, 3, 15.0), (2, 1, 20.0)]
+    assert por_ingresos == [(2, 1, 20.0), (1, 3, 15.0), (3, 10, 10.0)]
+    assert hasta_la_hora == [(1, 2, 10.0)]
+    assert libro.mas_vendidos(1, periodo="minuto") == [(3, 10, 10.0)]
+
+
+def test_reabrir_y_reconstruir_el_resumen(libro, tmp_path):
+    esperado = _consultas(libro)
+    libro.cerrar()
+    assert _consultas(LibroVentas(tmp_path / "datos.json")) == esperado
+    (tmp_path / "datos_ventas_resumen.json").unlink()  # Se rehace recorriendo el libro
+    assert _consultas(LibroVentas(tmp_path / "datos.json")) == esperado
+
+
+def test_ventas_de_otro_proceso(libro, tmp_path):
+    otro = LibroVentas(tmp_path / "datos.json")
+    otro.registrar([(2, 4, 20.0, 80.0)], ts=DIA + 60)
+    otro.cerrar()
+    assert libro.ingresos("dia", desde=DIA) == [(DIA, 90.0, 14)]
+    assert libro.mas_vendidos(1, periodo="dia", por="ingresos") == [(2, 5, 100.0)]
+
+
+def test_periodo_o_criterio_desconocido(libro):
+    with pytest.raises(ValueError):
+        libro.ingresos("semana")
+    with pytest.raises(ValueError):
+        libro.mas_vendidos(por="precio")
@@ -0,0 +1,196 @@
+# ============================================================================
+# LIBRO DE VENTAS - Registro binario de cada venta y resúmenes por periodo
+# ============================================================================
+# Cada venta añade un registro de tamaño fijo al libro (almacen_datos_ventas.bin):
+#   marca de tiempo (float64), id (int64), cantidad (int64), precio unitario y monto (float64)
+# Al registrarla se acumula también en los resúmenes por minuto, hora y día, que se
+# guardan aparte (almacen_datos_ventas_resumen.json) junto con la posición del libro
+# que ya incluyen. Las consultas leen los resúmenes, nunca el libro completo; al
+# abrirlo solo se reprocesa lo escrito después del último resumen guardado. Si
+# otro proceso comparte el libro, sus ventas se acumulan antes de escribir o de
+# consultar, así el resumen de cada proceso siempre cubre el libro hasta su posición.
+import heapq, json, os, struct, threading, time
+from pathlib import Path
+
+from almacenamiento import reemplazar_atomico
+
+# Formato de cada registro del libro: ts, id, cantidad, precio unitario, monto
+REGISTRO_VENTA = struct.Struct("<dqqdd")
+
+# Segundos de cada periodo de resumen
+PERIODOS = {"minuto": 60, "hora": 3600, "dia": 86400}
+
+# Antigüedad máxima (segundos) de los resúmenes finos; None = se conservan siempre
+RETENCION = {"minuto": 2 * 86400, "hora": 90 * 86400, "dia": None}
+
+# Criterios de orden de mas_vendidos
+CRITERIOS_MAS_VENDIDOS = ("unidades", "ingresos")
+
+# Ventas registradas entre dos guardados automáticos del resumen
+GUARDAR_RESUMEN_CADA = 1000
+
+
+class LibroVentas:
+    """Libro de ventas de un almacén con resúmenes por minuto, hora y día.
+
+    Cada resumen es {inicio del periodo: [ingresos, unidades, {id: [unidades, ingresos]}]};
+    los periodos se alinean a múltiplos de su duración en hora UTC."""
+
+    def __init__(self, archivo_datos):
+        archivo_datos = Path(archivo_datos)
+        self.archivo = archivo_datos.with_name(archivo_datos.stem + "_ventas.bin")
+        self.archivo_resumen = archivo_datos.with_name(archivo_datos.stem + "_ventas_resumen.json")
+        self._resumenes = {periodo: {} for periodo in PERIODOS}
+        self._desplazamiento = 0  # Bytes del libro ya incluidos en los resúmenes
+        self._sin_guardar = 0
+        self._libro = None
+        self._candado = threading.Lock()
+        self._cargar()
+
+    # ------------------------------------------------------------------ persistencia
+    def _cargar(self):
+        if self.archivo_resumen.exists():
+            try:
+                with open(self.archivo_resumen, 'r', encoding='utf-8') as f:
+                    datos = json.load(f)
+                self._desplazamiento = datos["desplazamiento"]
+                for periodo in PERIODOS:
+                    self._resumenes[periodo] = {
+                        int(inicio): [ingresos, unidades, {int(id): v for id, v in por_id.items()}]
+                        for inicio, (ingresos, unidades, por_id) in datos[periodo].items()}
+            except Exception as e:
+                print(f"Error al cargar el resumen de ventas: {e}")
+                self._resumenes = {periodo: {} for periodo in PERIODOS}
+                self._desplazamiento = 0
+        if not self.archivo.exists():
+            self._desplazamiento = 0
+            return
+        tamano = self.archivo.stat().st_size
+        completo = tamano - tamano % REGISTRO_VENTA.size
+        if completo != tamano:  # Registro a medio escribir por un corte: se descarta
+            os.truncate(self.archivo, completo)
+        if self._desplazamiento > completo:  # El resumen no corresponde a este libro
+            self._resumenes = {periodo: {} for periodo in PERIODOS}
+            self._desplazamiento = 0
+        if self._desplazamiento < completo:
+            self._ponerse_al_dia()
+            self.guardar_resumen()
+
+    def guardar_resumen(self):
+        """Escribe los resúmenes y la posición del libro que cubren (temporal + renombrado)."""
+        with self._candado:
+            if self._libro:
+                self._libro.flush()
+            datos = {"desplazamiento": self._desplazamiento}
+            datos.update(self._resumenes)
+            # Temporal propio de cada proceso: varios pueden compartir el libro
+            temporal = self.archivo_resumen.with_name(f"{self.archivo_resumen.name}.{os.getpid()}.tmp")
+            try:
+                with open(temporal, 'w', encoding='utf-8') as f:
+                    json.dump(datos, f, separators=(",", ":"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                reemplazar_atomico(temporal, self.archivo_resumen)
+                self._sin_guardar = 0
+            except Exception as e:
+                print(f"Error al guardar el resumen de ventas: {e}")
+
+    def cerrar(self):
+        self.guardar_resumen()
+        with self._candado:
+            if self._libro:
+                self._libro.close()
+                self._libro = None
+
+    # ------------------------------------------------------------------ registro
+    def _ponerse_al_dia(self):
+        """Acumula las ventas del libro posteriores a la posición ya resumida: al abrirlo, o
+        las que haya añadido otro proceso. Solo registros completos."""
+        try:
+            tamano = self.archivo.stat().st_size
+        except FileNotFoundError:
+            return
+        completo = tamano - tamano % REGISTRO_VENTA.size
+        if completo > self._desplazamiento:
+            for venta in self.recorrer(self._desplazamiento, completo):
+                self._acumular(*venta)
+            self._desplazamiento = completo
+
+    def _acumular(self, ts, id, cantidad, precio, monto):
+        for periodo, segundos in PERIODOS.items():
+            resumen = self._resumenes[periodo]
+            inicio = int(ts // segundos) * segundos
+            cubo = resumen.get(inicio)
+            if cubo is None:
+                cubo = resumen[inicio] = [0.0, 0, {}]
+                if RETENCION[periodo] is not None:  # Al abrir un periodo nuevo se podan los viejos
+                    limite = inicio - RETENCION[periodo]
+                    for viejo in [k for k in resumen if k < limite]:
+                        del resumen[viejo]
+            cubo[0] += monto
+            cubo[1] += cantidad
+            por_id = cubo[2].setdefault(id, [0, 0.0])
+            por_id[0] += cantidad
+            por_id[1] += monto
+
+    def registrar(self, ventas, ts=None):
+        """Añade ventas (id, cantidad, precio unitario, monto) con una sola escritura."""
+        ts = time.time() if ts is None else ts
+        datos = b"".join(REGISTRO_VENTA.pack(ts, id, cantidad, precio, monto) for id, cantidad, precio, monto in ventas)
+        with self._candado:
+            try:
+                if self._libro is None:
+                    self._libro = open(self.archivo, 'ab')
+                self._ponerse_al_dia()
+                self._libro.write(datos)
+                self._libro.flush()
+            except Exception as e:
+                print(f"Error al escribir en el libro de ventas: {e}")
+                return
+            self._desplazamiento += len(datos)
+            for id, cantidad, precio, monto in ventas:
+                self._acumular(ts, id, cantidad, precio, monto)
+            self._sin_guardar += len(ventas)
+            guardar = self._sin_guardar >= GUARDAR_RESUMEN_CADA
+        if guardar:
+            self.guardar_resumen()
+
+    def recorrer(self, desde_byte=0, hasta_byte=None):
+        """Genera las ventas del libro (ts, id, cantidad, precio, monto) entre dos posiciones."""
+        with open(self.archivo, 'rb') as f:
+            f.seek(desde_byte)
+            resto = float("inf") if hasta_byte is None else hasta_byte - desde_byte
+            while resto > 0 and (bloque := f.read(int(min(REGISTRO_VENTA.size * 4096, resto)))):
+                resto -= len(bloque)
+                yield from REGISTRO_VENTA.iter_unpack(bloque[:len(bloque) - len(bloque) % REGISTRO_VENTA.size])
+
+    # ------------------------------------------------------------------ consultas
+    def _cubos(self, periodo, desde, hasta):
+        if periodo not in PERIODOS:
+            raise ValueError(f"Periodo desconocido: {periodo}")
+        for inicio, cubo in self._resumenes[periodo].items():
+            if (desde is None or inicio >= desde) and (hasta is None or inicio < hasta):
+                yield inicio, cubo
+
+    def ingresos(self, periodo="hora", desde=None, hasta=None):
+        """Lista ordenada de (inicio del periodo, ingresos, unidades) con inicio en [desde, hasta)."""
+        with self._candado:
+            self._ponerse_al_dia()
+            return sorted((inicio, cubo[0], cubo[1]) for inicio, cubo in self._cubos(periodo, desde, hasta))
+
+    def mas_vendidos(self, n=10, periodo="dia", desde=None, hasta=None, por="unidades"):
+        """Los n productos con más unidades (o ingresos, por="ingresos") en los periodos
+        cuyo inicio cae en [desde, hasta). Devuelve [(id, unidades, ingresos)]."""
+        if por not in CRITERIOS_MAS_VENDIDOS:
+            raise ValueError(f"Criterio desconocido: {por}")
+        totales = {}
+        with self._candado:
+            self._ponerse_al_dia()
+            for _, cubo in self._cubos(periodo, desde, hasta):
+                for id, (unidades, ingresos) in cubo[2].items():
+                    acumulado = totales.setdefault(id, [0, 0.0])
+                    acumulado[0] += unidades
+                    acumulado[1] += ingresos
+        indice = CRITERIOS_MAS_VENDIDOS.index(por)
+        mejores = heapq.nlargest(n, totales.items(), key=lambda par: (par[1][indice], -par[0]))
+        return [(id, unidades, ingresos) for id, (unidades, ingresos) in mejores]